@@ -0,0 +1,300 @@
+import os
+import json
+import datetime
+import itertools
+import threading
+import concurrent.futures
+import lib.aqi_aggregate as AQA
+import lib.json_stream as JS
+import lib.air_now_store as ANST
+from lib.air_quality import AirQuality
+from lib.air_quality_batch import AirQualityBatch
+
+CHUNK_HOURS = 24 # hours per BBOX request
+MAX_WORKERS = 4
+QUOTA_WAIT = 3600. # the most seconds a chunk waits for the budget of the API key
+CHECKPOINT_VERSION = 1
+
+class Backfill():
+    __doc__ = """
+    #!
+    # backfills the local store (see the module air_now_store) with historical BBOX data for many areas.
+    #   The range of hours is split into chunks of chunk_hours, and each chunk is requested as one date-range BBOX
+    #   request per merged box (overlapping boxes of the areas are merged, see AirQualityBatch.mergeBoxes(...)).
+    #   The requests run concurrently, in a bounded pool of workers. Each response is parsed while it is being
+    #   downloaded, its records are split by area and by hour (the record's 'UTC'), aggregated, and appended to
+    #   the store as soon as the chunk is complete. Completed chunks are recorded in the checkpoint file, so an
+    #   interrupted run resumes where it stopped.
+    #   Each request takes a token of the API key's budget, and is recorded in the metrics of the first area of its
+    #   merged box (the other areas count it as coalesced); the metrics of each area cover the whole run, and are
+    #   added to the metrics registry at its end (see startMetrics(...) and finishMetrics(...) of AirQuality).
+    #   The responses are streamed, so they are neither cached nor shared with concurrent identical requests.
+    # Args:
+    #   api_key : str
+    #   areas : iterable
+    #       The (zip_code, distance_from) pairs. See AirQuality(...).
+    #   start, end : str
+    #       The range of UTC hours (inclusive), formatted as e.g. '2021-09-01T00', or dates, e.g. '2021-09-01'
+    #       (start then begins at T00, and end stops at T23).
+    #   kwargs: typical keyword arguments
+    #       'chunk_hours' : int
+    #           The number of hours per request. Defaults to CHUNK_HOURS.
+    #       'max_workers' : int
+    #           The maximum number of concurrent requests. Defaults to MAX_WORKERS.
+    #       'checkpoint_path' : str or None
+    #           The JSON file with the completed chunks. None (the default) disables resuming.
+    #       'store' : ObservationStore
+    #           Defaults to the shared store (see getStore(...) in the module air_now_store).
+    #           ValueError is raised if there is no store.
+    #       Any other keyword arguments (e.g. 'ON_SCREEN', 'session', 'API_HOST', 'KERNEL', 'zip_index', 'limiter')
+    #       are passed to AirQuality(...). 'PRIORITY' defaults to 'background': each chunk waits (up to QUOTA_WAIT)
+    #       for the budget of the API key, leaving its reserve to interactive requests.
+    """
+    def __init__(self, api_key, areas, start, end, **kwargs):
+        self.chunk_hours = max(1, int(kwargs.pop('chunk_hours', CHUNK_HOURS)))
+        self.max_workers = int(kwargs.pop('max_workers', MAX_WORKERS))
+        self.checkpoint_path = kwargs.pop('checkpoint_path', None)
+        self.store = kwargs.pop('store', None) or ANST.getStore()
+        if self.store is None:
+            raise ValueError('no store to backfill')
+        self.ON_SCREEN = 'ON_SCREEN' in kwargs
+
+        self.start = Backfill.parseHour(start, end=False)
+        self.end = Backfill.parseHour(end, end=True)
+        if self.end < self.start:
+            raise ValueError(f'invalid range {start} ... {end}')
+
+        kwargs['store'] = None # rows are appended by the backfill, not by AirQuality.saveAirData(...)
+        kwargs.setdefault('PRIORITY', 'background')
+        self.api_key = api_key
+        self.air_qualities = dict()
+        for _zip_code, _distance_from in areas:
+            _key = (_zip_code, int(_distance_from))
+            if not (_key in self.air_qualities):
+                self.air_qualities[_key] = AirQuality(api_key, _zip_code, _distance_from, **kwargs)
+
+        self.__lock__ = threading.Lock()
+        self.__done__ = dict() # area key -> set of completed chunks
+        # end of __init__
+    #!
+    # returns the hour (or date) as datetime (UTC).
+    # Args:
+    #   hour : str
+    #       e.g. '2021-09-29T14' or '2021-09-29'
+    #   end : bool
+    #       If True, a date stands for its last hour (T23); otherwise for its first hour (T00).
+    # Returns: datetime.datetime
+    @staticmethod
+    def parseHour(hour, end=False):
+        hour = str(hour).strip()
+        if 'T' in hour:
+            return datetime.datetime.strptime(hour[:13], '%Y-%m-%dT%H')
+        return datetime.datetime.strptime(hour, '%Y-%m-%d') + datetime.timedelta(hours=23 if end else 0)
+        # end of function
+    #!
+    # returns the chunks of the range.
+    # Args: none.
+    # Returns: list of tuple (start : datetime.datetime, end : datetime.datetime), both inclusive.
+    def chunks(self):
+        chunks = list()
+        _start = self.start
+        while _start <= self.end:
+            _end = min(_start + datetime.timedelta(hours=self.chunk_hours - 1), self.end)
+            chunks.append((_start, _end))
+            _start = _end + datetime.timedelta(hours=1)
+        return chunks
+        # end of function
+    #!
+    # returns the key of the chunk as saved in the checkpoint file, e.g. '2021-09-29T00/24'.
+    def chunkKey(self, chunk):
+        return '{}/{}'.format(chunk[0].strftime('%Y-%m-%dT%H'), int((chunk[1] - chunk[0]).total_seconds()) // 3600 + 1)
+        # end of function
+    #!
+    # returns the key of the area as saved in the checkpoint file, e.g. '20500:25'.
+    @staticmethod
+    def areaKey(air_quality):
+        return f'{air_quality.zip_code}:{air_quality.distance_from}'
+        # end of function
+    #!
+    # loads the completed chunks from the checkpoint file (if any).
+    def loadCheckpoint(self):
+        self.__done__ = dict()
+        if (self.checkpoint_path is None) or not os.path.isfile(self.checkpoint_path):
+            return
+        try:
+            with open(self.checkpoint_path, 'r') as _file:
+                _checkpoint = json.load(_file)
+            if _checkpoint.get('version') == CHECKPOINT_VERSION:
+                self.__done__ = {_key : set(_chunks) for _key, _chunks in _checkpoint.get('done', dict()).items()}
+        except (OSError, ValueError, AttributeError):
+            self.__done__ = dict()
+        # end of function
+    #!
+    # saves the completed chunks to the checkpoint file (if any); the file is replaced atomically.
+    def saveCheckpoint(self):
+        if self.checkpoint_path is None:
+            return
+        with self.__lock__:
+            _checkpoint = {'version' : CHECKPOINT_VERSION,\
+                'done' : {_key : sorted(_chunks) for _key, _chunks in self.__done__.items()}}
+        _tmp_path = self.checkpoint_path + '.tmp'
+        with open(_tmp_path, 'w') as _file:
+            json.dump(_checkpoint, _file)
+        os.replace(_tmp_path, self.checkpoint_path)
+        # end of function
+    #!
+    # finds the location of each area: from the zip index if possible, otherwise by the current data request.
+    # Args:
+    #   timeout : int or float
+    # Returns: list of AirQuality
+    #   The areas whose location is known.
+    def locate(self, timeout=30):
+        located = list()
+        for _air_quality in self.air_qualities.values():
+            _centroid = None if (_air_quality.zip_index is None) else _air_quality.zip_index.lookup(_air_quality.zip_code)
+            try:
+                if _centroid is None:
+                    if _air_quality.getCurrentData(timeout=timeout) is None: # no current data (the error is recorded)
+                        if self.ON_SCREEN:
+                            print(f"Unable to locate {_air_quality.zip_code}: no current data")
+                        continue
+                else:
+                    _air_quality.latitude, _air_quality.longitude = _centroid
+                located.append(_air_quality)
+            except Exception as e:
+                if self.ON_SCREEN:
+                    print(f"Unable to locate {_air_quality.zip_code}: {e}")
+        return located
+        # end of function
+    #!
+    # runs the backfill.
+    # Args:
+    #   timeout : int or float
+    #       The timeout of each request in seconds.
+    # Returns: count : int
+    #   The number of rows appended to the store.
+    def run(self, timeout=60):
+        self.loadCheckpoint()
+        for _air_quality in self.air_qualities.values():
+            _air_quality.startMetrics()
+        _located = self.locate(timeout=timeout)
+
+        _tasks = list() # (chunk, box, members)
+        for _chunk in self.chunks():
+            _chunk_key = self.chunkKey(_chunk)
+            _pending = [_each for _each in _located\
+                if not (_chunk_key in self.__done__.get(Backfill.areaKey(_each), ()))]
+            _boxes = [_each.requestBBOX() for _each in _pending]
+            for _box, _members in AirQualityBatch.mergeBoxes(_boxes):
+                _tasks.append((_chunk, _box, [(_pending[_m], _boxes[_m]) for _m in _members]))
+
+        if self.ON_SCREEN:
+            print(f"*** {len(_located)} areas located; {len(_tasks)} BBOX requests to go ***")
+
+        count = 0
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as _executor:
+            _futures = {_executor.submit(self.__runTask__, _chunk, _box, _members, timeout) : (_chunk, _members)\
+                for _chunk, _box, _members in _tasks}
+            for _future in concurrent.futures.as_completed(_futures):
+                _chunk, _members = _futures[_future]
+                try:
+                    count += _future.result()
+                except Exception as e:
+                    if self.ON_SCREEN:
+                        print(f"Unable perform AirNowAPI request for {self.chunkKey(_chunk)}: {e}")
+                    continue
+
+                with self.__lock__:
+                    for _air_quality, _box in _members:
+                        self.__done__.setdefault(Backfill.areaKey(_air_quality), set()).add(self.chunkKey(_chunk))
+                self.saveCheckpoint()
+                if self.ON_SCREEN:
+                    print(f"{self.chunkKey(_chunk)}: done")
+
+        for _air_quality in self.air_qualities.values():
+            _air_quality.finishMetrics()
+        return count
+        # end of function
+    #!
+    # requests one chunk for one merged box, and appends the aggregated rows of its member areas to the store.
+    def __runTask__(self, chunk, box, members, timeout):
+        _air_quality = members[0][0]
+        _url = _air_quality.requestURLFull(chunk[0].strftime('%Y-%m-%d'), chunk[0].strftime('%H'),\
+            AirQualityBatch.boxToBBOX(box), end_date=chunk[1].strftime('%Y-%m-%d'), end_hour=chunk[1].strftime('%H'))
+
+        _columns = dict() # (member, hour) -> AqiColumns
+        _metrics = _air_quality.metrics
+        _air_quality.spendQuota('bbox', wait=QUOTA_WAIT)
+        for _member, _member_box in members[1:]:
+            _member.metrics.add('coalesced', 'bbox')
+            if not (_metrics.quota_remaining is None):
+                _member.metrics.setQuota(_metrics.quota_remaining)
+        try:
+            with _metrics.stage('bbox', 'request'):
+                data = _air_quality.session.get(_url, timeout=timeout, stream=True)
+        except Exception as e:
+            _metrics.addError('bbox', e)
+            raise
+        with data:
+            _air_quality.checkThrottle(data)
+            for _member, _member_box in members:
+                _member.metrics.setStatus('bbox', data.status_code)
+            if data.status_code != 200:
+                _metrics.addError('bbox', f'http_{data.status_code}')
+                raise ValueError(f'status code {data.status_code}')
+            try:
+                with _metrics.stage('bbox', 'stream'):
+                    _records = JS.iterJsonArray(_air_quality.__countBytes__(\
+                        data.iter_content(chunk_size=AirQuality.STREAM_CHUNK_SIZE)))
+                    while True:
+                        _batch = list(itertools.islice(_records, AirQuality.STREAM_BATCH_SIZE))
+                        if len(_batch) < 1:
+                            break
+                        _metrics.add('records', 'bbox', len(_batch))
+                        for _record in _batch:
+                            _hour = str(_record.get('UTC', ''))[:13]
+                            if len(_hour) < 13:
+                                continue
+                            for _m, (_member, _member_box) in enumerate(members):
+                                if AirQualityBatch.isInBox(_record, _member_box):
+                                    _columns.setdefault((_m, _hour), AQA.AqiColumns()).add(_record)
+            except Exception as e:
+                _metrics.addError('bbox', e)
+                raise
+
+        _rows = list()
+        for (_m, _hour), _each in sorted(_columns.items()):
+            _member = members[_m][0]
+            _stats = _member.statsColumns(_each)
+            for _parameter in _stats:
+                if _stats[_parameter]['count'] < 1:
+                    continue
+                _aqi = float(_stats[_parameter]['mean'])
+                _rows.append({'zip_code' : str(_member.zip_code), 'distance' : _member.distance_from,\
+                    'parameter' : _parameter, 'hour' : _hour, 'kind' : 'full',\
+                    'aqi' : _aqi, 'category' : _member.getAqiCategory(_aqi)[2],\
+                    'median' : _stats[_parameter]['median'], 'min' : _stats[_parameter]['min'],\
+                    'max' : _stats[_parameter]['max'], 'count' : _stats[_parameter]['count']})
+
+        return self.store.append(_rows)
+        # end of function
+    # end of class Backfill
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import collections
+import lib.air_now_clock as ANCL
+
+MAX_MEMORY_ENTRIES = 64
+MAX_DISK_ENTRIES = 256
+
+_CACHE = None
+_CACHE_LOCK = threading.Lock()
+
+class ResponseCache():
+    __doc__ = """
+    #!
+    # a two-tier (memory, then disk) cache of AirNow responses. Each entry expires at a given time,
+    #   by default at the next expected publication time of the hourly observations (see air_now_clock).
+    # Args:
+    #   max_entries : int
+    #       The maximum number of entries kept in memory. The least recently used entries are evicted first.
+    #   folder_path : str or None
+    #       The folder for the disk tier, one JSON file per entry. If None, there is no disk tier.
+    #   max_disk_entries : int
+    #       The maximum number of files in folder_path. The oldest files are evicted first.
+    #
+    # Keys are tuples of str, int, and float values, e.g. ('current', '20500', 25) or
+    #   ('bbox', '-77.4,38.5,-76.6,39.3', '2021-09-29', 14), scoped to the API host and key by scopeKey(...)
+    #   when they are shared by several hosts or keys. Values must be JSON serializable.
+    """
+    def __init__(self, max_entries=MAX_MEMORY_ENTRIES, folder_path=None, max_disk_entries=MAX_DISK_ENTRIES):
+        self.max_entries = int(max_entries)
+        self.folder_path = folder_path
+        self.max_disk_entries = int(max_disk_entries)
+
+        self.__memory__ = collections.OrderedDict() # key : (expires, value)
+        self.__lock__ = threading.Lock()
+
+        if not (self.folder_path is None):
+            try:
+                os.makedirs(self.folder_path, exist_ok=True)
+            except:
+                self.folder_path = None
+        # end of __init__
+    #!
+    # returns the cached value for key, or None if there is no such entry, or it has expired.
+    # Args:
+    #   key : tuple
+    #   now : float or None
+    #       The current time in seconds since the epoch. Defaults to time.time().
+    # Returns: value or None
+    def get(self, key, now=None):
+        if now is None:
+            now = time.time()
+
+        with self.__lock__:
+            if key in self.__memory__:
+                _expires, _value = self.__memory__[key]
+                if _expires > now:
+                    self.__memory__.move_to_end(key)
+                    return _value
+                del self.__memory__[key]
+
+        _entry = self.__readDisk__(key)
+        if _entry is None:
+            return None
+
+        _expires, _value = _entry
+        if _expires <= now:
+            self.__removeDisk__(key)
+            return None
+
+        self.__putMemory__(key, _expires, _value)
+        return _value
+        # end of function
+    #!
+    # stores value under key in both tiers.
+    # Args:
+    #   key : tuple
+    #   value : any JSON serializable value
+    #   expires : float or None
+    #       The expiry time in seconds since the epoch. Defaults to the next expected publication time.
+    # Returns: nothing.
+    def put(self, key, value, expires=None):
+        if expires is None:
+            expires = ANCL.nextPublicationTime()
+
+        self.__putMemory__(key, expires, value)
+        self.__writeDisk__(key, expires, value)
+        # end of function
+    #!
+    # removes all entries from both tiers.
+    # Args: none.
+    # Returns: nothing.
+    def clear(self):
+        with self.__lock__:
+            self.__memory__.clear()
+
+        for _file_name in self.__diskFiles__():
+            try:
+                os.remove(os.path.join(self.folder_path, _file_name))
+            except:
+                pass
+        # end of function
+    #!
+    def __putMemory__(self, key, expires, value):
+        with self.__lock__:
+            self.__memory__[key] = (expires, value)
+            self.__memory__.move_to_end(key)
+            while len(self.__memory__) > self.max_entries:
+                self.__memory__.popitem(last=False)
+        # end of function
+    #!
+    def __filePath__(self, key):
+        _digest = hashlib.sha1(json.dumps(list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.folder_path, _digest + '.json')
+        # end of function
+    #!
+    def __diskFiles__(self):
+        if self.folder_path is None:
+            return []
+        try:
+            return [_each for _each in os.listdir(self.folder_path) if _each.endswith('.json')]
+        except:
+            return []
+        # end of function
+    #!
+    def __readDisk__(self, key):
+        if self.folder_path is None:
+            return None
+        try:
+            with open(self.__filePath__(key), 'r') as _file:
+                _entry = json.load(_file)
+            # guards against (unlikely) digest collisions
+            if _entry['key'] != json.loads(json.dumps(list(key))):
+                return None
+            return (float(_entry['expires']), _entry['value'])
+        except:
+            return None
+        # end of function
+    #!
+    def __writeDisk__(self, key, expires, value):
+        if self.folder_path is None:
+            return
+
+        _file_path = self.__filePath__(key)
+        _tmp_path = '{}.{}.tmp'.format(_file_path, threading.get_ident())
+        try:
+            with open(_tmp_path, 'w') as _file:
+                json.dump({'key' : list(key), 'expires' : expires, 'value' : value}, _file)
+            os.replace(_tmp_path, _file_path)
+        except:
+            try:
+                os.remove(_tmp_path)
+            except:
+                pass
+            return
+
+        self.__evictDisk__()
+        # end of function
+    #!
+    def __removeDisk__(self, key):
+        try:
+            os.remove(self.__filePath__(key))
+        except:
+            pass
+        # end of function
+    #!
+    # removes the oldest files once there are more than self.max_disk_entries of them.
+    def __evictDisk__(self):
+        _file_names = self.__diskFiles__()
+        if len(_file_names) <= self.max_disk_entries:
+            return
+
+        _file_paths = [os.path.join(self.folder_path, _each) for _each in _file_names]
+        _mtimes = dict()
+        for _each in _file_paths:
+            try:
+                _mtimes[_each] = os.path.getmtime(_each)
+            except:
+                pass
+
+        _oldest_first = sorted(_mtimes, key=lambda _each: _mtimes[_each])
+        for _each in _oldest_first[:len(_oldest_first) - self.max_disk_entries]:
+            try:
+                os.remove(_each)
+            except:
+                pass
+        # end of function
+    # end of class ResponseCache
+
+#!
+# returns key scoped to the API host and key, so that responses of different hosts (e.g. a stand-in server,
+#   and AirNow) or keys do not share entries. The API key is hashed, so that it is not written to the disk tier.
+# Args:
+#   api_host : str
+#   api_key : str
+#   key : tuple
+# Returns: key : tuple
+#   e.g. ('https://www.airnowapi.org', '3f2a...', 'current', '20500', 25)
+def scopeKey(api_host, api_key, key):
+    return (str(api_host), hashlib.sha256(str(api_key).encode('utf-8')).hexdigest()[:16]) + tuple(key)
+    # end of function
+#!
+# returns the shared, process-wide cache. It is created (memory only) on the first call.
+# Args: none.
+# Returns: cache : ResponseCache
+def getCache():
+    global _CACHE
+
+    with _CACHE_LOCK:
+        if _CACHE is None:
+            _CACHE = ResponseCache()
+        return _CACHE
+    # end of function
+#!
+# (re)configures the shared, process-wide cache.
+# Args:
+#   kwargs: typical keyword arguments
+#       The same as those of ResponseCache(...).
+#       Example : configureCache(folder_path=os.path.join(HOME_DIR, 'shch_air_now_cfg', 'cache'))
+# Returns: cache : ResponseCache
+def configureCache(**kwargs):
+    global _CACHE
+
+    _new_cache = ResponseCache(**kwargs)
+    with _CACHE_LOCK:
+        _CACHE = _new_cache
+    return _new_cache
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
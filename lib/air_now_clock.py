@@ -0,0 +1,101 @@
+import time
+import datetime
+
+SECONDS_PER_HOUR = 3600
+PUBLICATION_MINUTE = 25 # AirNow hourly observations are expected to be published this many minutes past the hour
+# the UTC offsets (hours) of the LocalTimeZone values of AirNow's observations
+TIME_ZONE_OFFSETS = {
+    'UTC' : 0, 'GMT' : 0,
+    'AST' : -4, 'ADT' : -3,
+    'EST' : -5, 'EDT' : -4,
+    'CST' : -6, 'CDT' : -5,
+    'MST' : -7, 'MDT' : -6,
+    'PST' : -8, 'PDT' : -7,
+    'AKST' : -9, 'AKDT' : -8,
+    'HST' : -10,
+    'SST' : -11,
+    'CHST' : 10,
+    }
+
+#!
+# returns the next time when a new hourly observation is expected to be published by AirNow.
+#   That is the first moment after 'now' which is PUBLICATION_MINUTE minutes past an hour.
+# Args:
+#   now : float or None
+#       The time (in seconds since the epoch) to start from. Defaults to time.time().
+# Returns: next_publication_time : float
+#   The time in seconds since the epoch.
+def nextPublicationTime(now=None):
+    if now is None:
+        now = time.time()
+
+    _hour_start = (int(now) // SECONDS_PER_HOUR) * SECONDS_PER_HOUR
+    _publication_time = _hour_start + PUBLICATION_MINUTE * 60
+    if _publication_time <= now:
+        _publication_time += SECONDS_PER_HOUR
+    return float(_publication_time)
+    # end of function
+#!
+# returns the (UTC) date and hour of the latest hourly observation that is expected to be published by 'now'.
+#   The observation for the hour H is expected at H + 1 hour + PUBLICATION_MINUTE minutes.
+# Args:
+#   now : float or None
+#       The time (in seconds since the epoch). Defaults to time.time().
+# Returns: tuple (date : str, hour : int)
+#   Example : ('2021-09-29', 14), as expected by requestURLFull(...) of AirQuality.
+def latestObservationHour(now=None):
+    if now is None:
+        now = time.time()
+
+    _observation_time = now - SECONDS_PER_HOUR - PUBLICATION_MINUTE * 60
+    _hour_start = (int(_observation_time) // SECONDS_PER_HOUR) * SECONDS_PER_HOUR
+    _utc = datetime.datetime.fromtimestamp(_hour_start, tz=datetime.timezone.utc)
+    return (_utc.strftime('%Y-%m-%d'), _utc.hour)
+    # end of function
+#!
+# returns the UTC date and hour of a local observation hour (e.g. DateObserved, HourObserved, and LocalTimeZone
+#   of the current data).
+# Args:
+#   date : str
+#       e.g. '2021-09-29'
+#   hour : int or str
+#   time_zone : str or None
+#       A key of TIME_ZONE_OFFSETS (e.g. 'EST'). None means that date and hour are already UTC.
+# Returns: tuple (date : str, hour : int) or None
+#   None is returned if the time zone is not known.
+def localToUtcHour(date, hour, time_zone):
+    _offset = 0 if (time_zone is None) else TIME_ZONE_OFFSETS.get(str(time_zone).strip().upper())
+    if _offset is None:
+        return None
+    _utc = datetime.datetime.strptime(str(date).strip(), '%Y-%m-%d') + datetime.timedelta(hours=int(hour) - _offset)
+    return (_utc.strftime('%Y-%m-%d'), _utc.hour)
+    # end of function
+#!
+# returns the UTC date and hour before the given one.
+# Args:
+#   date : str
+#   hour : int or str
+# Returns: tuple (date : str, hour : int)
+def previousHour(date, hour):
+    _utc = datetime.datetime.strptime(str(date).strip(), '%Y-%m-%d') + datetime.timedelta(hours=int(hour) - 1)
+    return (_utc.strftime('%Y-%m-%d'), _utc.hour)
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,102 @@
+import threading
+
+_FLIGHT = None
+_FLIGHT_LOCK = threading.Lock()
+
+class _Call():
+    __slots__ = ('done', 'result', 'error', 'followers')
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+    # end of class _Call
+
+class SingleFlight():
+    __doc__ = """
+    #!
+    # coalesces concurrent calls with the same key: the first caller (the leader) runs the call, and the callers
+    #   that arrive while it is in flight (the followers) wait for it, and get the same result, or the same exception.
+    #   Nothing is kept once the call has returned; the next call with the key runs again (see ResponseCache
+    #   in the module air_now_cache for keeping results).
+    #
+    # Keys are hashable, e.g. (api_host, api_key, 'bbox', '-77.4,38.5,-76.6,39.3', '2021-09-29', 14).
+    """
+    def __init__(self):
+        self.__lock__ = threading.Lock()
+        self.__calls__ = dict() # key -> _Call
+        # end of __init__
+    #!
+    # runs fnc() once for all concurrent callers with the key.
+    # Args:
+    #   key : hashable
+    #   fnc : callable
+    #       Called without arguments, by the leader only.
+    # Returns: tuple (result, shared : bool)
+    #   result is what fnc() returned; shared is True for the followers. If fnc() raised an exception,
+    #   it is re-raised to the leader and to every follower.
+    def do(self, key, fnc):
+        with self.__lock__:
+            _call = self.__calls__.get(key)
+            _is_leader = _call is None
+            if _is_leader:
+                _call = _Call()
+                self.__calls__[key] = _call
+            else:
+                _call.followers += 1
+
+        if not _is_leader:
+            _call.done.wait()
+            if not (_call.error is None):
+                raise _call.error
+            return _call.result, True
+
+        try:
+            _call.result = fnc()
+        except BaseException as e:
+            _call.error = e
+            raise
+        finally:
+            with self.__lock__:
+                self.__calls__.pop(key, None)
+            _call.done.set()
+        return _call.result, False
+        # end of function
+    #!
+    # returns the number of calls in flight.
+    def __len__(self):
+        with self.__lock__:
+            return len(self.__calls__)
+    # end of class SingleFlight
+
+#!
+# returns the shared, process-wide SingleFlight. It is created on the first call.
+# Args: none.
+# Returns: flight : SingleFlight
+def getFlight():
+    global _FLIGHT
+
+    with _FLIGHT_LOCK:
+        if _FLIGHT is None:
+            _FLIGHT = SingleFlight()
+        return _FLIGHT
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,341 @@
+import json
+import time
+import threading
+import contextlib
+import http.server
+
+# the stages of a fetch. Each is timed per kind of request ('current', or 'bbox').
+#   'url_build' : building the request URL.
+#   'request' : from sending the request until the response headers have arrived. It includes connecting
+#       (if no keep-alive connection is available), the server's time to the first byte, and any retries;
+#       requests does not expose these separately.
+#   'download' : reading the response body.
+#   'parse' : decoding the JSON.
+#   'columns' : building the columns of the BBOX records (see AqiColumns in the module aqi_aggregate).
+#   'aggregate' : the statistics per parameter.
+#   'categorize' : the AQI categories of the means (see viewAirData(...) of AirQuality).
+#   'stream' : download, parse, and columns interleaved (the 'STREAMING' mode of AirQuality).
+#   'nowcast' : the NowCast per site and parameter (the 'NOWCAST' mode of AirQuality).
+STAGES = ('url_build', 'request', 'download', 'parse', 'columns', 'aggregate', 'categorize', 'stream', 'nowcast')
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1., 2.5, 5., 10., 30.) # seconds
+METRICS_PORT = 9108
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+
+class FetchMetrics():
+    __doc__ = """
+    #!
+    # the metrics of one fetch (e.g. one getAirData(...) of AirQuality): the time of each stage per kind of request,
+    #   the payload sizes, the record counts, the status codes, the cache hits, the requests coalesced with one already
+    #   in flight (see SingleFlight in the module air_now_flight), the remaining budget of the API key (see the module
+    #   air_now_quota), and the classified errors.
+    #   It is thread-safe, since the current and BBOX requests may run concurrently.
+    #   Error classes: 'timeout', 'connection', 'http_<status code>', 'decode' (invalid JSON),
+    #   'data' (missing or invalid fields), 'no_data' (no valid values), 'quota' (the budget of the API key is exhausted),
+    #   'other'.
+    """
+    def __init__(self):
+        self.started_at = time.time()
+        self.seconds = None # the total time, set by finish(...)
+        self.stages = dict() # (kind, stage) -> seconds
+        self.bytes = dict() # kind -> int
+        self.records = dict() # kind -> int
+        self.status = dict() # kind -> int
+        self.cache_hits = dict() # kind -> int
+        self.coalesced = dict() # kind -> int
+        self.quota_remaining = None # int, after the last request
+        self.errors = list() # dict(kind, class, message)
+        self.__lock__ = threading.Lock()
+        self.__recorded__ = set() # ids of the recorded exceptions
+        self.__t0__ = time.perf_counter()
+        # end of __init__
+    #!
+    # times the stage of the kind of request (a context manager); the time is added to the stage's total.
+    @contextlib.contextmanager
+    def stage(self, kind, stage):
+        _t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addTime(kind, stage, time.perf_counter() - _t0)
+        # end of function
+    #!
+    # adds seconds to the stage of the kind of request.
+    def addTime(self, kind, stage, seconds):
+        with self.__lock__:
+            self.stages[(kind, stage)] = self.stages.get((kind, stage), 0.) + seconds
+        # end of function
+    #!
+    # adds the value to the counter (the name of a dict attribute: 'bytes', 'records', 'cache_hits', or 'coalesced')
+    #   of the kind.
+    def add(self, counter, kind, value=1):
+        with self.__lock__:
+            _counter = getattr(self, counter)
+            _counter[kind] = _counter.get(kind, 0) + int(value)
+        # end of function
+    #!
+    # sets the status code of the kind of request.
+    def setStatus(self, kind, status_code):
+        with self.__lock__:
+            self.status[kind] = int(status_code)
+        # end of function
+    #!
+    # sets the remaining budget (whole requests) of the API key.
+    def setQuota(self, remaining):
+        with self.__lock__:
+            self.quota_remaining = int(remaining)
+        # end of function
+    #!
+    # records an error of the kind of request. An exception is recorded once, even if it is re-raised and caught again.
+    # Args:
+    #   kind : str
+    #   error : Exception or str
+    #       An exception is classified (see classify(...)); a str is the class itself.
+    #   message : str or None
+    def addError(self, kind, error, message=None):
+        with self.__lock__:
+            if isinstance(error, BaseException):
+                if id(error) in self.__recorded__:
+                    return
+                self.__recorded__.add(id(error))
+                _class = FetchMetrics.classify(error)
+                message = str(error) if (message is None) else message
+            else:
+                _class = str(error)
+            self.errors.append({'kind' : kind, 'class' : _class, 'message' : message})
+        # end of function
+    #!
+    # returns the error class of the exception.
+    @staticmethod
+    def classify(error):
+        _name = type(error).__name__
+        _response = getattr(error, 'response', None)
+        if not (_response is None) and not (getattr(_response, 'status_code', None) is None):
+            return f'http_{_response.status_code}'
+        if 'Timeout' in _name or isinstance(error, TimeoutError):
+            return 'timeout'
+        if 'Connection' in _name or isinstance(error, ConnectionError):
+            return 'connection'
+        if 'Quota' in _name:
+            return 'quota'
+        if isinstance(error, ValueError) and ('JSON' in _name or 'Decode' in _name):
+            return 'decode'
+        if isinstance(error, (KeyError, IndexError, TypeError, ValueError)):
+            return 'data'
+        return 'other'
+        # end of function
+    #!
+    # ends the fetch: sets self.seconds.
+    def finish(self):
+        self.seconds = time.perf_counter() - self.__t0__
+        # end of function
+    #!
+    # returns the metrics as a dictionary (JSON-serializable); the stages are keyed as 'kind.stage'.
+    def toDict(self):
+        with self.__lock__:
+            return {
+                'started_at' : self.started_at,
+                'seconds' : self.seconds,
+                'stages' : {f'{_kind}.{_stage}' : _seconds for (_kind, _stage), _seconds in self.stages.items()},
+                'bytes' : dict(self.bytes),
+                'records' : dict(self.records),
+                'status' : dict(self.status),
+                'cache_hits' : dict(self.cache_hits),
+                'coalesced' : dict(self.coalesced),
+                'quota_remaining' : self.quota_remaining,
+                'errors' : list(self.errors),
+                }
+        # end of function
+    # end of class FetchMetrics
+
+class MetricsRegistry():
+    __doc__ = """
+    #!
+    # the totals of many fetches (see FetchMetrics), for export: counters, and histograms of the stage times.
+    #   It can be rendered as Prometheus text (toPrometheus(...)), or as JSON (toJson(...)).
+    """
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.__lock__ = threading.Lock()
+        self.clear()
+        # end of __init__
+    #!
+    # clears all totals.
+    def clear(self):
+        with self.__lock__:
+            self.fetches = 0
+            self.failed_fetches = 0
+            self.last = None # the last FetchMetrics as dict
+            self.quota_remaining = None # the last known budget of the API key
+            self.histograms = dict() # (kind, stage) -> [counts per bucket..., +Inf count, sum]
+            self.fetch_histogram = [0] * (len(self.buckets) + 1) + [0.]
+            self.counters = {'bytes' : dict(), 'records' : dict(), 'cache_hits' : dict(), 'coalesced' : dict(),\
+                'errors' : dict()}
+        # end of function
+    #!
+    # adds the seconds to the histogram (a list, see clear(...)).
+    def __observe__(self, histogram, seconds):
+        for _index, _bound in enumerate(self.buckets):
+            if seconds <= _bound:
+                histogram[_index] += 1
+        histogram[len(self.buckets)] += 1
+        histogram[-1] += seconds
+        # end of function
+    #!
+    # adds one fetch.
+    # Args:
+    #   metrics : FetchMetrics
+    def record(self, metrics):
+        _metrics = metrics.toDict()
+        with self.__lock__:
+            self.fetches += 1
+            if len(_metrics['errors']) > 0:
+                self.failed_fetches += 1
+            self.last = _metrics
+            if not (_metrics['quota_remaining'] is None):
+                self.quota_remaining = _metrics['quota_remaining']
+            if not (metrics.seconds is None):
+                self.__observe__(self.fetch_histogram, metrics.seconds)
+            for (_kind, _stage), _seconds in metrics.stages.items():
+                if not ((_kind, _stage) in self.histograms):
+                    self.histograms[(_kind, _stage)] = [0] * (len(self.buckets) + 1) + [0.]
+                self.__observe__(self.histograms[(_kind, _stage)], _seconds)
+            for _counter in ('bytes', 'records', 'cache_hits', 'coalesced'):
+                for _kind, _value in _metrics[_counter].items():
+                    self.counters[_counter][_kind] = self.counters[_counter].get(_kind, 0) + _value
+            for _error in _metrics['errors']:
+                _key = (_error['kind'], _error['class'])
+                self.counters['errors'][_key] = self.counters['errors'].get(_key, 0) + 1
+        # end of function
+    #!
+    # returns the totals as a dictionary (JSON-serializable).
+    def toDict(self):
+        with self.__lock__:
+            return {
+                'fetches' : self.fetches,
+                'failed_fetches' : self.failed_fetches,
+                'fetch_seconds' : {'count' : self.fetch_histogram[len(self.buckets)], 'sum' : self.fetch_histogram[-1]},
+                'stages' : {f'{_kind}.{_stage}' : {'count' : _histogram[len(self.buckets)], 'sum' : _histogram[-1]}\
+                    for (_kind, _stage), _histogram in sorted(self.histograms.items())},
+                'bytes' : dict(self.counters['bytes']),
+                'records' : dict(self.counters['records']),
+                'cache_hits' : dict(self.counters['cache_hits']),
+                'coalesced' : dict(self.counters['coalesced']),
+                'quota_remaining' : self.quota_remaining,
+                'errors' : {f'{_kind}.{_class}' : _count for (_kind, _class), _count in sorted(self.counters['errors'].items())},
+                'last' : self.last,
+                }
+        # end of function
+    #!
+    # returns the totals as JSON.
+    def toJson(self, **kwargs):
+        return json.dumps(self.toDict(), **kwargs)
+        # end of function
+    #!
+    # returns the totals in the Prometheus text format.
+    def toPrometheus(self):
+        _lines = list()
+        def _histogram(name, labels, histogram):
+            _labels = ''.join(f'{_key}="{_value}",' for _key, _value in labels)
+            for _index, _bound in enumerate(self.buckets):
+                _lines.append(f'{name}_bucket{{{_labels}le="{_bound}"}} {histogram[_index]}')
+            _lines.append(f'{name}_bucket{{{_labels}le="+Inf"}} {histogram[len(self.buckets)]}')
+            _labels = f'{{{_labels.rstrip(",")}}}' if len(labels) > 0 else ''
+            _lines.append(f'{name}_sum{_labels} {histogram[-1]}')
+            _lines.append(f'{name}_count{_labels} {histogram[len(self.buckets)]}')
+
+        with self.__lock__:
+            _lines += ['# HELP air_now_fetches_total The number of fetches.', '# TYPE air_now_fetches_total counter',\
+                f'air_now_fetches_total {self.fetches}']
+            _lines += ['# HELP air_now_failed_fetches_total The number of fetches with errors.',\
+                '# TYPE air_now_failed_fetches_total counter', f'air_now_failed_fetches_total {self.failed_fetches}']
+            _lines += ['# HELP air_now_fetch_seconds The time of a fetch.', '# TYPE air_now_fetch_seconds histogram']
+            _histogram('air_now_fetch_seconds', (), self.fetch_histogram)
+            _lines += ['# HELP air_now_stage_seconds The time of a stage of a fetch.',\
+                '# TYPE air_now_stage_seconds histogram']
+            for (_kind, _stage), _each in sorted(self.histograms.items()):
+                _histogram('air_now_stage_seconds', (('kind', _kind), ('stage', _stage)), _each)
+            for _counter, _help in (('bytes', 'The size of the response payloads.'),\
+                    ('records', 'The number of records received.'), ('cache_hits', 'The number of cached responses used.'),\
+                    ('coalesced', 'The number of requests that shared a request already in flight.')):
+                _lines += [f'# HELP air_now_{_counter}_total {_help}', f'# TYPE air_now_{_counter}_total counter']
+                for _kind, _value in sorted(self.counters[_counter].items()):
+                    _lines.append(f'air_now_{_counter}_total{{kind="{_kind}"}} {_value}')
+            if not (self.quota_remaining is None):
+                _lines += ['# HELP air_now_quota_remaining The remaining budget of requests of the API key.',\
+                    '# TYPE air_now_quota_remaining gauge', f'air_now_quota_remaining {self.quota_remaining}']
+            _lines += ['# HELP air_now_errors_total The number of errors by kind of request and class.',\
+                '# TYPE air_now_errors_total counter']
+            for (_kind, _class), _value in sorted(self.counters['errors'].items()):
+                _lines.append(f'air_now_errors_total{{kind="{_kind}",class="{_class}"}} {_value}')
+        return '\n'.join(_lines) + '\n'
+        # end of function
+    # end of class MetricsRegistry
+
+#!
+# returns the shared, process-wide registry. It is created on the first call.
+# Args: none.
+# Returns: registry : MetricsRegistry
+def getRegistry():
+    global _REGISTRY
+
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = MetricsRegistry()
+        return _REGISTRY
+    # end of function
+#!
+# serves the registry over HTTP on a daemon thread: /metrics (Prometheus text), and /metrics.json (JSON).
+# Args:
+#   host : str
+#   port : int
+#       0 picks a free port (see server.server_port).
+#   registry : MetricsRegistry or None
+#       Defaults to the shared registry.
+# Returns: server : http.server.ThreadingHTTPServer
+#   server.shutdown() stops it.
+def serveMetrics(host='localhost', port=METRICS_PORT, registry=None):
+    _registry = getRegistry() if (registry is None) else registry
+
+    class _Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip('/') == '/metrics':
+                _body, _type = _registry.toPrometheus().encode('utf-8'), 'text/plain; version=0.0.4'
+            elif self.path.rstrip('/') == '/metrics.json':
+                _body, _type = _registry.toJson().encode('utf-8'), 'application/json'
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', _type)
+            self.send_header('Content-Length', str(len(_body)))
+            self.end_headers()
+            self.wfile.write(_body)
+        def log_message(self, format, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,261 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import contextlib
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+QUOTA_FILE = 'quota.json' # inside shch_air_now_cfg
+CAPACITY = 500 # AirNow's limit of requests per hour and API key
+PERIOD = 3600. # seconds to refill the whole capacity
+RESERVE = 0.2 # the share of the capacity that background requests leave to interactive ones
+RETRY_AFTER = 60. # seconds to stop for after a 429 without a Retry-After header
+PRIORITIES = ('interactive', 'background')
+
+_LIMITER = None
+_LIMITER_LOCK = threading.Lock()
+
+class QuotaExceeded(Exception):
+    __doc__ = """
+    #!
+    # raised when the budget of an API key does not allow a request.
+    # Args:
+    #   message : str
+    #   retry_after : float
+    #       The seconds until the request would be allowed.
+    #   remaining : int
+    #       The whole tokens left (see remaining(...) of QuotaLimiter).
+    """
+    def __init__(self, message, retry_after, remaining):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.remaining = remaining
+    # end of class QuotaExceeded
+
+class QuotaLimiter():
+    __doc__ = """
+    #!
+    # a token-bucket limiter of the requests per API key. Each request takes a token; the bucket refills
+    #   continuously at capacity tokens per period. Background requests cannot take the last reserve share
+    #   of the capacity, which is left to interactive ones (e.g. a refresh the user asked for).
+    #   After a 429, the key is blocked for the Retry-After time (see penalize(...)).
+    # Args:
+    #   path : str or None
+    #       The state file. If set, the budget is shared by all processes on the host that use the same file:
+    #       each update is done under an exclusive lock of path + '.lock'. If None, the budget is per process.
+    #   capacity : int
+    #   period : float
+    #       Seconds.
+    #   reserve : float
+    #       Within 0..1.
+    #
+    # The state file is JSON: {key : {'tokens', 'updated', 'blocked_until'}}, where key is a hash of the API key
+    #   (the keys themselves are not written).
+    """
+    def __init__(self, path=None, capacity=CAPACITY, period=PERIOD, reserve=RESERVE):
+        self.path = path
+        self.capacity = float(capacity)
+        self.period = float(period)
+        self.reserve = float(reserve)
+        self.__lock__ = threading.Lock()
+        self.__state__ = dict() # the state if there is no file
+        # end of __init__
+    #!
+    # returns the key of the API key in the state.
+    @staticmethod
+    def keyOf(api_key):
+        return hashlib.sha256(str(api_key).encode('utf-8')).hexdigest()[:16]
+        # end of function
+    #!
+    # locks the state (a context manager) for the threads of this process, and for the other processes.
+    @contextlib.contextmanager
+    def __locked__(self):
+        with self.__lock__:
+            if self.path is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a+') as _file:
+                if fcntl is None:
+                    _file.seek(0)
+                    msvcrt.locking(_file.fileno(), msvcrt.LK_LOCK, 1)
+                else:
+                    fcntl.flock(_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is None:
+                        _file.seek(0)
+                        msvcrt.locking(_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    else:
+                        fcntl.flock(_file.fileno(), fcntl.LOCK_UN)
+        # end of function
+    #!
+    # returns the state; the state must be locked.
+    def __read__(self):
+        if self.path is None:
+            return self.__state__
+        try:
+            with open(self.path, 'r') as _file:
+                _state = json.load(_file)
+            return _state if isinstance(_state, dict) else dict()
+        except (OSError, ValueError):
+            return dict()
+        # end of function
+    #!
+    # saves the state (atomically); the state must be locked.
+    def __write__(self, state):
+        if self.path is None:
+            self.__state__ = state
+            return
+        _temp_path = self.path + '.tmp'
+        with open(_temp_path, 'w') as _file:
+            json.dump(state, _file)
+        os.replace(_temp_path, self.path)
+        # end of function
+    #!
+    # returns the bucket of the key in the state, refilled up to now.
+    def __bucket__(self, state, key, now):
+        _bucket = state.get(key)
+        if not isinstance(_bucket, dict):
+            _bucket = {'tokens' : self.capacity, 'updated' : now, 'blocked_until' : 0.}
+        _elapsed = max(0., now - float(_bucket.get('updated', now)))
+        _bucket['tokens'] = min(self.capacity, float(_bucket.get('tokens', self.capacity)) + _elapsed * self.capacity / self.period)
+        _bucket['updated'] = now
+        _bucket['blocked_until'] = float(_bucket.get('blocked_until', 0.))
+        state[key] = _bucket
+        return _bucket
+        # end of function
+    #!
+    # takes tokens for a request of the API key.
+    # Args:
+    #   api_key : str
+    #   tokens : int
+    #   priority : str
+    #       One of PRIORITIES.
+    #   wait : float
+    #       The most seconds to wait for the tokens. 0 does not wait.
+    # Returns: remaining : int
+    #   The whole tokens left. QuotaExceeded is raised if the tokens are not available (within wait).
+    def acquire(self, api_key, tokens=1, priority='interactive', wait=0.):
+        if not (priority in PRIORITIES):
+            raise ValueError(f'invalid priority {priority}')
+        _floor = self.reserve * self.capacity if (priority == 'background') else 0.
+        _key = QuotaLimiter.keyOf(api_key)
+        _deadline = time.time() + float(wait)
+        while True:
+            with self.__locked__():
+                _now = time.time()
+                _state = self.__read__()
+                _bucket = self.__bucket__(_state, _key, _now)
+                if (_bucket['blocked_until'] <= _now) and (_bucket['tokens'] - tokens >= _floor):
+                    _bucket['tokens'] -= tokens
+                    self.__write__(_state)
+                    return int(_bucket['tokens'])
+                _retry_after = max(_bucket['blocked_until'] - _now,\
+                    (tokens + _floor - _bucket['tokens']) * self.period / self.capacity)
+                _remaining = max(0, int(_bucket['tokens']))
+
+            if _now + _retry_after > _deadline:
+                raise QuotaExceeded(f'the {priority} budget of the API key is exhausted; retry in {_retry_after:.0f} s',\
+                    _retry_after, _remaining)
+            time.sleep(min(_retry_after, max(0., _deadline - _now)))
+        # end of function
+    #!
+    # takes tokens of the API key for requests that have been sent anyway (e.g. the retries of a request);
+    #   the bucket may go below 0, and the debt is refilled first.
+    # Args:
+    #   api_key : str
+    #   tokens : int
+    def charge(self, api_key, tokens=1):
+        with self.__locked__():
+            _state = self.__read__()
+            _bucket = self.__bucket__(_state, QuotaLimiter.keyOf(api_key), time.time())
+            _bucket['tokens'] -= tokens
+            self.__write__(_state)
+        # end of function
+    #!
+    # blocks the API key after a 429 (too many requests) response, and empties its bucket.
+    # Args:
+    #   api_key : str
+    #   retry_after : float or None
+    #       Seconds; defaults to RETRY_AFTER.
+    def penalize(self, api_key, retry_after=None):
+        _retry_after = RETRY_AFTER if (retry_after is None) else float(retry_after)
+        with self.__locked__():
+            _now = time.time()
+            _state = self.__read__()
+            _bucket = self.__bucket__(_state, QuotaLimiter.keyOf(api_key), _now)
+            _bucket['tokens'] = 0.
+            _bucket['blocked_until'] = max(_bucket['blocked_until'], _now + _retry_after)
+            self.__write__(_state)
+        # end of function
+    #!
+    # returns the budget of the API key.
+    # Returns: dict
+    #   {'remaining' : int (whole tokens), 'capacity' : int, 'background' : int (the tokens background requests
+    #    may still take), 'blocked_seconds' : float, 'full_seconds' : float (until the bucket is full again)}
+    def remaining(self, api_key):
+        with self.__locked__():
+            _now = time.time()
+            _bucket = self.__bucket__(self.__read__(), QuotaLimiter.keyOf(api_key), _now)
+        return {
+            'remaining' : max(0, int(_bucket['tokens'])),
+            'capacity' : int(self.capacity),
+            'background' : max(0, int(_bucket['tokens'] - self.reserve * self.capacity)),
+            'blocked_seconds' : max(0., _bucket['blocked_until'] - _now),
+            'full_seconds' : (self.capacity - _bucket['tokens']) * self.period / self.capacity,
+            }
+        # end of function
+    # end of class QuotaLimiter
+
+#!
+# returns the shared, process-wide limiter. It is created (per process, without a state file) on the first call.
+# Args: none.
+# Returns: limiter : QuotaLimiter
+def getLimiter():
+    global _LIMITER
+
+    with _LIMITER_LOCK:
+        if _LIMITER is None:
+            _LIMITER = QuotaLimiter()
+        return _LIMITER
+    # end of function
+#!
+# (re)configures the shared, process-wide limiter.
+# Args:
+#   kwargs: typical keyword arguments
+#       The same as those of QuotaLimiter(...).
+#       Example : configureLimiter(path=os.path.join(HOME_DIR, 'shch_air_now_cfg', QUOTA_FILE))
+# Returns: limiter : QuotaLimiter
+def configureLimiter(**kwargs):
+    global _LIMITER
+
+    _new_limiter = QuotaLimiter(**kwargs)
+    with _LIMITER_LOCK:
+        _LIMITER = _new_limiter
+    return _new_limiter
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,132 @@
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+POOL_CONNECTIONS = 4 # the number of host pools to cache
+POOL_MAXSIZE = 8 # the number of keep-alive connections kept per host
+RETRY_TOTAL = 3
+RETRY_BACKOFF_FACTOR = 0.5 # sleeps 0.5, 1, 2, ... seconds between retries
+RETRY_STATUS_FORCELIST = (429, 500, 502, 503, 504)
+RETRY_AFTER_MAX = 10. # the most seconds a Retry-After header can make a retry sleep
+
+_SESSIONS = dict() # retry_429 -> requests.Session
+_SESSION_LOCK = threading.Lock()
+
+class CappedRetry(Retry):
+    __doc__ = """
+    #!
+    # Retry whose sleep for a Retry-After header is at most RETRY_AFTER_MAX seconds, and that retries a 429
+    #   only if it is in status_forcelist (Retry retries any 429 with a Retry-After header otherwise).
+    """
+    #!
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if (status_code == 429) and not (self.status_forcelist and (429 in self.status_forcelist)):
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+    #!
+    def get_retry_after(self, response):
+        _retry_after = super().get_retry_after(response)
+        return None if (_retry_after is None) else min(_retry_after, RETRY_AFTER_MAX)
+    # end of class CappedRetry
+
+#!
+# creates a new requests.Session with keep-alive connection pools, and retries with exponential backoff.
+#   Retries are done on connection errors, and on the status codes in RETRY_STATUS_FORCELIST
+#   (the Retry-After header of a 429 is respected, up to RETRY_AFTER_MAX seconds).
+# Args:
+#   pool_connections : int
+#       The number of host pools to cache.
+#   pool_maxsize : int
+#       The maximum number of connections to keep alive per host.
+#   retries : int
+#       The total number of retries; 0 disables retrying.
+#   backoff_factor : float
+#       The backoff factor; the n-th retry sleeps backoff_factor * 2**(n-1) seconds.
+#   retry_429 : bool
+#       If False, 429 (too many requests) is not retried, but returned, e.g. to a QuotaLimiter (see the module
+#       air_now_quota) that blocks the API key for the Retry-After time instead.
+# Returns: session : requests.Session
+def newSession(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE,\
+        retries=RETRY_TOTAL, backoff_factor=RETRY_BACKOFF_FACTOR, retry_429=True):
+    _retry = CappedRetry(
+        total= int(retries),
+        connect= int(retries),
+        read= int(retries),
+        status= int(retries),
+        backoff_factor= float(backoff_factor),
+        status_forcelist= RETRY_STATUS_FORCELIST if retry_429 else\
+            tuple(_each for _each in RETRY_STATUS_FORCELIST if _each != 429),
+        allowed_methods= frozenset(['GET']),
+        respect_retry_after_header= True,
+        raise_on_status= False,
+        )
+    _adapter = HTTPAdapter(
+        pool_connections= int(pool_connections),
+        pool_maxsize= int(pool_maxsize),
+        max_retries= _retry,
+        )
+
+    session = requests.Session()
+    session.mount('https://', _adapter)
+    session.mount('http://', _adapter)
+    return session
+    # end of function
+#!
+# returns the shared, process-wide session. It is created on the first call.
+# Args:
+#   retry_429 : bool
+#       See newSession(...); there is one shared session with, and one without, retries of 429.
+# Returns: session : requests.Session
+def getSession(retry_429=True):
+    with _SESSION_LOCK:
+        if not (bool(retry_429) in _SESSIONS):
+            _SESSIONS[bool(retry_429)] = newSession(retry_429=bool(retry_429))
+        return _SESSIONS[bool(retry_429)]
+    # end of function
+#!
+# (re)configures the shared, process-wide sessions. The previous shared sessions (if any) are closed.
+# Args:
+#   kwargs: typical keyword arguments
+#       The same as those of newSession(...), except 'retry_429'.
+#       'session' : requests.Session
+#           If given, this session becomes the shared one (both with, and without, retries of 429) as is
+#           (e.g. a session pointing at a stand-in server).
+# Returns: session : requests.Session
+#   The shared session with retries of 429.
+def configureSession(**kwargs):
+    if 'session' in kwargs:
+        _session = kwargs.pop('session')
+        _new_sessions = {True : _session, False : _session}
+    else:
+        _new_sessions = {_retry_429 : newSession(retry_429=_retry_429, **kwargs) for _retry_429 in (True, False)}
+
+    with _SESSION_LOCK:
+        _old_sessions = list(_SESSIONS.values())
+        _SESSIONS.clear()
+        _SESSIONS.update(_new_sessions)
+
+    for _old_session in _old_sessions:
+        if not (_old_session in _new_sessions.values()):
+            _old_session.close()
+    return _new_sessions[True]
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,275 @@
+import time
+import sqlite3
+import datetime
+import threading
+import numpy as np
+import lib.air_now_clock as ANCL
+
+STORE_FILE = 'observations.sqlite3'
+
+_STORE = None
+_STORE_LOCK = threading.Lock()
+
+_SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS observations (
+        id INTEGER PRIMARY KEY,
+        zip_code TEXT NOT NULL,
+        distance INTEGER NOT NULL,
+        parameter TEXT NOT NULL,
+        hour TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        aqi REAL,
+        category INTEGER,
+        median REAL,
+        min REAL,
+        max REAL,
+        count INTEGER,
+        fetched_at REAL NOT NULL
+        )""",
+    # replaced by observations_zip_distance_parameter_hour
+    """DROP INDEX IF EXISTS observations_zip_parameter_hour""",
+    """CREATE INDEX IF NOT EXISTS observations_zip_distance_parameter_hour
+        ON observations (zip_code, distance, parameter, hour)""",
+    )
+_COLUMNS = ('zip_code', 'distance', 'parameter', 'hour', 'kind', 'aqi', 'category', 'median', 'min', 'max', 'count', 'fetched_at')
+
+class ObservationStore():
+    __doc__ = """
+    #!
+    # an append-only local store (SQLite) of fetched observations, indexed by (zip_code, distance, parameter, hour).
+    #   Rows are never updated: a re-fetch of the same hour appends a new row, and queries return
+    #   the last fetched row per (zip_code, distance, parameter, hour, kind).
+    #   Each row holds:
+    #       zip_code : str, distance : int, parameter : str (e.g. 'OZONE', or 'O3' for current data),
+    #       hour : str (the UTC observation hour, formatted as 2021-09-29T14; the local hour of current data
+    #           is converted with its LocalTimeZone),
+    #       kind : str ('current' for the zip code's reporting area, 'full' for the averaged BBOX data),
+    #       aqi : float, category : int, median, min, max : float or None, count : int or None,
+    #       fetched_at : float (seconds since the epoch)
+    # Args:
+    #   db_path : str
+    #       The path to the SQLite file; ':memory:' keeps the store in memory.
+    """
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.__lock__ = threading.Lock()
+        self.__connection__ = sqlite3.connect(db_path, timeout=10, check_same_thread=False)
+        with self.__lock__, self.__connection__:
+            if db_path != ':memory:':
+                # lets other processes read while one writes
+                self.__connection__.execute('PRAGMA journal_mode=WAL')
+            for _statement in _SCHEMA:
+                self.__connection__.execute(_statement)
+        # end of __init__
+    #!
+    # formats date and hour as stored in the column hour.
+    # Args:
+    #   date : str
+    #       e.g. '2021-09-29'
+    #   hour : int or str
+    # Returns: hour : str
+    #   e.g. '2021-09-29T14'
+    @staticmethod
+    def formatHour(date, hour):
+        return '{}T{:02d}'.format(str(date).strip(), int(hour))
+        # end of function
+    #!
+    # appends rows.
+    # Args:
+    #   rows : list
+    #       Each member is a dictionary with the columns as keys (see the class description);
+    #       missing columns are stored as NULL, and 'fetched_at' defaults to now.
+    # Returns: count : int
+    #   The number of appended rows.
+    def append(self, rows):
+        _now = time.time()
+        _values = [tuple(_row.get(_column, _now if (_column == 'fetched_at') else None) for _column in _COLUMNS)\
+            for _row in rows]
+        if len(_values) < 1:
+            return 0
+
+        with self.__lock__, self.__connection__:
+            self.__connection__.executemany(
+                'INSERT INTO observations ({}) VALUES ({})'.format(', '.join(_COLUMNS), ', '.join('?' * len(_COLUMNS))),
+                _values)
+        return len(_values)
+        # end of function
+    #!
+    # appends the data of an AirQuality object after its getAirData(...): one 'current' row for data_current,
+    #   and one 'full' row per parameter of data_full (with the statistics of data_stats, if available).
+    #   The hour of data_current (date_observed and hour_observed, in the time zone time_zone) is converted to UTC;
+    #   if the time zone is not known, there is no 'current' row. The hour of data_full (date_full and hour_full)
+    #   is the UTC hour requested from AirNow.
+    # Args:
+    #   air_quality : AirQuality
+    # Returns: count : int
+    #   The number of appended rows.
+    def appendAirQuality(self, air_quality):
+        _rows = list()
+        _base = {'zip_code' : str(air_quality.zip_code), 'distance' : int(air_quality.distance_from), 'fetched_at' : time.time()}
+
+        _observed = None if (air_quality.date_observed is None) else\
+            ANCL.localToUtcHour(air_quality.date_observed, air_quality.hour_observed, getattr(air_quality, 'time_zone', None))
+        if isinstance(air_quality.data_current, dict) and not (_observed is None):
+            for _parameter in air_quality.data_current:
+                _aqi, _descriptor, _category = tuple(air_quality.data_current[_parameter])[:3]
+                _rows.append(dict(_base, parameter=_parameter, kind='current',\
+                    hour=ObservationStore.formatHour(*_observed),\
+                    aqi=float(_aqi), category=int(_category)))
+
+        if isinstance(air_quality.data_full, dict) and not (air_quality.date_full is None):
+            _stats = air_quality.data_stats if isinstance(air_quality.data_stats, dict) else dict()
+            for _parameter in air_quality.data_full:
+                _aqi, _descriptor, _category = tuple(air_quality.data_full[_parameter])[:3]
+                _row = dict(_base, parameter=_parameter, kind='full',\
+                    hour=ObservationStore.formatHour(air_quality.date_full, air_quality.hour_full),\
+                    aqi=float(_aqi), category=int(_category))
+                if _parameter in _stats:
+                    _row.update({_key : _stats[_parameter][_key] for _key in ('median', 'min', 'max', 'count')})
+                _rows.append(_row)
+
+        return self.append(_rows)
+        # end of function
+    #!
+    # returns the stored observations for the zip code, the last fetched row per hour, ordered by hour.
+    # Args:
+    #   zip_code : str
+    #   distance : int or None
+    #       The distance (in miles) the rows were fetched with; if None, the rows of all distances are returned.
+    #   parameter : str or None
+    #       If None, all parameters are returned.
+    #   start, end : str or None
+    #       The range of hours (inclusive), formatted as in formatHour(...), e.g. '2021-09-29T00'.
+    #   kind : str
+    #       'full' or 'current'.
+    # Returns: rows : list of dict
+    def query(self, zip_code, distance=None, parameter=None, start=None, end=None, kind='full'):
+        _where = ['o.zip_code = ?', 'o.kind = ?']
+        _args = [str(zip_code), kind]
+        if not (distance is None):
+            _where.append('o.distance = ?')
+            _args.append(int(distance))
+        if not (parameter is None):
+            _where.append('o.parameter = ?')
+            _args.append(parameter)
+        if not (start is None):
+            _where.append('o.hour >= ?')
+            _args.append(start)
+        if not (end is None):
+            _where.append('o.hour <= ?')
+            _args.append(end)
+
+        _sql = 'SELECT {} FROM observations o WHERE {} AND o.id = ('.format(', '.join('o.' + _each for _each in _COLUMNS), ' AND '.join(_where)) +\
+            'SELECT MAX(l.id) FROM observations l WHERE l.zip_code = o.zip_code AND l.distance = o.distance' +\
+            ' AND l.parameter = o.parameter AND l.hour = o.hour AND l.kind = o.kind) ORDER BY o.hour, o.parameter, o.distance'
+
+        with self.__lock__:
+            _cursor = self.__connection__.execute(_sql, _args)
+            return [dict(zip(_COLUMNS, _row)) for _row in _cursor.fetchall()]
+        # end of function
+    #!
+    # returns rolling statistics of the AQI of one parameter over a time window.
+    # Args:
+    #   zip_code : str
+    #   parameter : str
+    #   window : int
+    #       The window in hours; each value covers the hours (hour - window, hour].
+    #   statistic : str
+    #       'mean', 'min', 'max', or 'count'.
+    #   distance : int or None
+    #       See query(...); if None, the distance of the last fetched row is used, so that each hour counts once.
+    #   start, end, kind :
+    #       See query(...).
+    # Returns: list of tuple (hour : str, value : float)
+    def rolling(self, zip_code, parameter, window=24, statistic='mean', distance=None, start=None, end=None, kind='full'):
+        if distance is None:
+            with self.__lock__:
+                _last = self.__connection__.execute('SELECT distance FROM observations' +\
+                    ' WHERE zip_code = ? AND parameter = ? AND kind = ? ORDER BY id DESC LIMIT 1',
+                    (str(zip_code), parameter, kind)).fetchone()
+            if _last is None:
+                return list()
+            distance = _last[0]
+        _rows = self.query(zip_code, distance=distance, parameter=parameter, start=start, end=end, kind=kind)
+        if len(_rows) < 1:
+            return list()
+
+        _hours = np.array([ObservationStore.hourToEpoch(_row['hour']) for _row in _rows], dtype=np.int64)
+        _aqi = np.array([_row['aqi'] for _row in _rows], dtype=np.float64)
+        # the first index within each window
+        _first = np.searchsorted(_hours, _hours - int(window) * 3600, side='right')
+        _last = np.arange(1, len(_rows) + 1)
+
+        if statistic == 'mean':
+            _cumsum = np.concatenate(([0.], np.cumsum(_aqi)))
+            _values = (_cumsum[_last] - _cumsum[_first]) / (_last - _first)
+        elif statistic == 'count':
+            _values = (_last - _first).astype(np.float64)
+        elif statistic in ('min', 'max'):
+            _reduce = np.min if (statistic == 'min') else np.max
+            _values = np.array([_reduce(_aqi[_f:_l]) for _f, _l in zip(_first, _last)])
+        else:
+            raise ValueError(f'invalid statistic {statistic}')
+
+        return [(_row['hour'], float(_value)) for _row, _value in zip(_rows, _values)]
+        # end of function
+    #!
+    # returns the hour (see formatHour(...)) as seconds since the epoch.
+    @staticmethod
+    def hourToEpoch(hour):
+        return int(datetime.datetime.strptime(hour, '%Y-%m-%dT%H').replace(tzinfo=datetime.timezone.utc).timestamp())
+        # end of function
+    #!
+    # closes the store.
+    def close(self):
+        with self.__lock__:
+            self.__connection__.close()
+        # end of function
+    # end of class ObservationStore
+
+#!
+# returns the shared, process-wide store, or None if it has not been configured (see configureStore(...)).
+# Args: none.
+# Returns: store : ObservationStore or None
+def getStore():
+    with _STORE_LOCK:
+        return _STORE
+    # end of function
+#!
+# (re)configures the shared, process-wide store.
+# Args:
+#   db_path : str or None
+#       The path to the SQLite file, e.g. os.path.join(HOME_DIR, 'shch_air_now_cfg', STORE_FILE).
+#       None disables the shared store.
+# Returns: store : ObservationStore or None
+def configureStore(db_path):
+    global _STORE
+
+    _new_store = None if (db_path is None) else ObservationStore(db_path)
+    with _STORE_LOCK:
+        _old_store = _STORE
+        _STORE = _new_store
+
+    if not (_old_store is None):
+        _old_store.close()
+    return _new_store
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -1,6 +1,25 @@
 import sys
-import requests
+import math
+import bisect
+import datetime
+import itertools
+import queue
+import threading
+import concurrent.futures
+import numpy as np
 import lib.lat_lon_round_earth as LLRE
+import lib.air_now_session as ANS
+import lib.air_now_cache as ANC
+import lib.aqi_aggregate as AQA
+import lib.aqi_nowcast as AQN
+import lib.aqi_observations as AQO
+import lib.json_stream as JS
+import lib.zip_centroids as ZC
+import lib.air_now_clock as ANCL
+import lib.air_now_store as ANST
+import lib.air_now_metrics as ANM
+import lib.air_now_flight as ANF
+import lib.air_now_quota as ANQ
 
 class AirQuality():
     __doc__ = """
@@ -14,12 +33,83 @@ class AirQuality():
     #       'ON_SCREEN' : <any value>
     #           If this is set, the function getAirData(...) will output the data on the screen.
     #       In any case, the data will be saved in self.data_current and self.data_full
+    #       'session' : requests.Session
+    #           The HTTP session to use. Defaults to the shared, pooled keep-alive session
+    #           (see getSession(...) in the module air_now_session); without retries of 429 if there is a 'limiter'.
+    #       'API_HOST' : str
+    #           The scheme and host to send requests to. Defaults to AirQuality.API_HOST.
+    #           Example : 'http://localhost:8080' (see shch_air_now_misc/shch_air_now_tserver.py)
+    #       'cache' : ResponseCache or None
+    #           The cache of responses. Defaults to the shared cache (see getCache(...) in the module air_now_cache).
+    #           None disables caching. Current data are keyed by (zip_code, distance_from), and BBOX data
+    #           by (BBOX, date, hour); both expire when the next hourly observation is expected.
+    #       'STREAMING' : <any value>
+    #           If set, the BBOX response is parsed incrementally while it is being downloaded, and its records
+    #           are fed straight into the aggregation (see processAirStream(...)), so the whole response is never
+    #           held in memory. Streamed BBOX responses are read from, but not written to, the cache.
+    #       'KERNEL' : str or callable
+    #           If set, only the monitors within the true (great-circle) radius distance_from around the zip code's
+    #           location are aggregated, and their mean is weighted by distance: 'uniform', 'idw' (inverse distance),
+    #           'gaussian', or a callable (see aggregateWeighted(...) in the module aqi_aggregate).
+    #           By default all monitors in the bounding box count the same.
+    #       'zip_index' : ZipCentroids or None
+    #           The offline index of zip code centroids. Defaults to the shared index (see getIndex(...) in the module
+    #           zip_centroids), if its file exists. None disables it. If the zip code is in the index, the BBOX is
+    #           built from its centroid right away, and both requests are made concurrently, for the latest
+    #           observation hour expected to be published (see latestObservationHour(...) in the module air_now_clock).
+    #       'store' : ObservationStore or None
+    #           The local store to which the data are appended after each getAirData(...). Defaults to the shared store
+    #           (see getStore(...) in the module air_now_store), which is None unless it has been configured.
+    #       'NOWCAST' : <any value>
+    #           If set, the BBOX data are the NowCast instead of a single hour: the raw concentrations of the last
+    #           NOWCAST_HOURS hours (up to the latest observation hour expected to be published) are requested at once,
+    #           and the NowCast and its AQI are computed locally per site and parameter (PM2.5, PM10, OZONE;
+    #           see the module aqi_nowcast), then aggregated as usual. The per-site values are saved in
+    #           self.data_nowcast. 'STREAMING' does not apply to NowCast requests.
+    #       'flight' : SingleFlight or None
+    #           Coalesces concurrent identical requests (also those of other AirQuality objects): they share one request
+    #           in flight, and its response or exception (see getJson(...)). Defaults to the shared SingleFlight
+    #           (see getFlight(...) in the module air_now_flight). None disables it.
+    #       'limiter' : QuotaLimiter or None
+    #           The budget of requests per API key; each request sent takes a token (see spendQuota(...)), and a 429
+    #           response blocks the key for its Retry-After time. Defaults to the shared limiter (see getLimiter(...)
+    #           in the module air_now_quota). None disables it.
+    #       'PRIORITY' : str
+    #           'interactive' (the default), or 'background'; background requests leave a reserve of the budget
+    #           to interactive ones.
+    #       'tile_min_distance' : int or float or None
+    #           If distance_from is at least this (miles), the BBOX data are fetched as the tiles of a fixed grid
+    #           (see tileBoxes(...)) covering the area, concurrently, and merged (see getTiledData(...)); each tile is
+    #           cached per hour, so that neighbouring zip codes and other distances reuse it. Defaults to None
+    #           (no tiling); TILE_MIN_DISTANCE is a sensible value. Tiling costs quota: each whole tile is a request
+    #           (e.g. 4 to 9 requests for a 100-mile radius instead of 1), and tiles are larger than the area, so more
+    #           data are downloaded; it pays off only when many areas share the tiles. It is not used in the
+    #           'STREAMING' mode.
+    #       'metrics' : MetricsRegistry or None
+    #           The registry to which the metrics of each getAirData(...) are added. Defaults to the shared registry
+    #           (see getRegistry(...) in the module air_now_metrics). None disables it.
+    #       In any case, the metrics of the last getAirData(...) (the time of each stage, payload sizes, record counts,
+    #       and classified errors) are saved in self.metrics (see FetchMetrics in the module air_now_metrics).
     """
-    AQI_Numbers = (50, 100, 150, 200, 300, 500)
-    AQI_Descriptors = ('Good', 'Moderate', 'Unhealthy for Sensitive Groups', 'Unhealthy', 'Very Unhealthy', 'Hazardous')
-    AQI_Categories = (1, 2, 3, 4, 5, 6)
-    AQI_Colors_Fg = ('#000', '#000', '#ffffff', '#ffffff', '#ffffff', '#ffffff')
-    AQI_Colors_Bg = ('#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8f3f97', '#7E0023')
+    # the AQI tables (see the module aqi_observations)
+    AQI_Numbers = AQO.AQI_NUMBERS
+    AQI_Descriptors = AQO.AQI_DESCRIPTORS
+    AQI_Categories = AQO.AQI_CATEGORIES
+    AQI_Colors_Fg = AQO.AQI_COLORS_FG
+    AQI_Colors_Bg = AQO.AQI_COLORS_BG
+    AQI_Kaboom = AQO.AQI_KABOOM # any AQI above the last of AQI_Numbers
+    # the tables above as arrays, with the 'Kaboom' row last; see categorizeAqi(...)
+    AQI_Table_Numbers = np.array(AQI_Numbers, dtype=np.float64)
+    AQI_Table_Descriptors = np.array(AQI_Descriptors + (AQI_Kaboom[1],), dtype=object)
+    AQI_Table_Categories = np.array(AQI_Categories + (AQI_Kaboom[2],), dtype=np.int16)
+    AQI_Table_Colors_Fg = np.array(AQI_Colors_Fg + (AQI_Kaboom[3],), dtype=object)
+    AQI_Table_Colors_Bg = np.array(AQI_Colors_Bg + (AQI_Kaboom[4],), dtype=object)
+    API_HOST = 'https://www.airnowapi.org'
+    STREAM_CHUNK_SIZE = 64 * 1024 # bytes read from the response at a time
+    STREAM_BATCH_SIZE = 1024 # records added to the columns at a time
+    TILE_DEGREES = 2. # the side of the tiles of the fixed grid, in degrees of latitude and longitude
+    TILE_MIN_DISTANCE = 100 # miles; a value for 'tile_min_distance' (tiling is off by default)
+    TILE_WORKERS = 4 # concurrent tile requests
     def __init__(self, api_key, zip_code, distance_from, **kwargs):
         if 'ON_SCREEN' in kwargs:
             self.ON_SCREEN = True
@@ -29,20 +119,46 @@ class AirQuality():
         self.data_current = None
         self.data_full = None
         self.data_time = None
+        self.data_stats = None
+        self.observations = None # the BBOX data, as ObservationTable (see processAirData(...))
+        self.latitude = None
+        self.longitude = None
+        self.date_observed = None
+        self.hour_observed = None
+        self.time_zone = None # LocalTimeZone of date_observed and hour_observed (e.g. 'EST')
+        self.date_full = None # the date and hour of the BBOX data
+        self.hour_full = None
+
+        self.api_host = kwargs['API_HOST'] if ('API_HOST' in kwargs) else AirQuality.API_HOST
+        self.cache = kwargs['cache'] if ('cache' in kwargs) else ANC.getCache()
+        self.flight = kwargs['flight'] if ('flight' in kwargs) else ANF.getFlight()
+        self.limiter = kwargs['limiter'] if ('limiter' in kwargs) else ANQ.getLimiter()
+        # with a limiter, a 429 is not retried by the session, but blocks the API key (see checkThrottle(...))
+        self.session = kwargs['session'] if ('session' in kwargs) else ANS.getSession(retry_429=self.limiter is None)
+        self.priority = kwargs['PRIORITY'] if ('PRIORITY' in kwargs) else 'interactive'
+        self.store = kwargs['store'] if ('store' in kwargs) else ANST.getStore()
+        self.metrics_registry = kwargs['metrics'] if ('metrics' in kwargs) else ANM.getRegistry()
+        self.metrics = ANM.FetchMetrics()
 
         self.api_key = api_key
         self.zip_code = zip_code
         self.distance_from = int(distance_from)
+        self.STREAMING = 'STREAMING' in kwargs
+        self.NOWCAST = 'NOWCAST' in kwargs
+        self.tile_min_distance = kwargs['tile_min_distance'] if ('tile_min_distance' in kwargs) else None
+        self.data_nowcast = None
+        self.kernel = kwargs['KERNEL'] if ('KERNEL' in kwargs) else None
+        self.zip_index = kwargs['zip_index'] if ('zip_index' in kwargs) else ZC.getIndex()
         self.requestURL()
         # end of __init__
     #!
-    # generates the URL to get current data from https://www.airnowapi.org based on self.zip_code and self.distance_from
+    # generates the URL to get current data from self.api_host (https://www.airnowapi.org)
+    #   based on self.zip_code and self.distance_from
     #   The generated URL is stored in self.request_URL
     # Args: none
     # Returns : nothing
     def requestURL(self):
-        # self.request_URL = "http://localhost:8080/"+\
-        self.request_URL = "https://www.airnowapi.org/aq/observation/zipCode/current/"+\
+        self.request_URL = f"{self.api_host}/aq/observation/zipCode/current/"+\
             "?format=application/json"+\
             f"&zipCode={self.zip_code}"+\
             f"&distance={self.distance_from}"+\
@@ -57,85 +173,259 @@ class AirQuality():
     #   BBOX : str
     #       Must be formatted as e.g -73.1281,40.8241,-71.9730,41.6924
     #       See also areaLatLonBox(...) in the module lat_lon_round_earth
+    #   kwargs: typical keyword arguments
+    #       'end_date' : str, and 'end_hour' : int or str
+    #           The end of a date range (inclusive); they default to date and hour, i.e. a single hour.
+    #       'data_type' : str
+    #           'A' (AQI; the default), 'C' (concentrations), or 'B' (both).
+    #       'raw_concentrations' : int
+    #           1 includes the raw hourly concentrations; defaults to 0.
     # Returns: request_URL_full :  str
-    def requestURLFull(self, date, hour, BBOX):
+    def requestURLFull(self, date, hour, BBOX, **kwargs):
         date = date.strip()
-        # return "http://localhost:8080/"+\
-        return "https://www.airnowapi.org/aq/data/"+\
+        _end_date = kwargs['end_date'].strip() if ('end_date' in kwargs) else date
+        _end_hour = kwargs['end_hour'] if ('end_hour' in kwargs) else hour
+        _data_type = kwargs['data_type'] if ('data_type' in kwargs) else 'A'
+        _raw_concentrations = int(kwargs['raw_concentrations']) if ('raw_concentrations' in kwargs) else 0
+        return f"{self.api_host}/aq/data/"+\
             f"?startDate={date}T{hour}"+\
-            f"&endDate={date}T{hour}"+\
+            f"&endDate={_end_date}T{_end_hour}"+\
             "&parameters=OZONE,PM25,PM10,CO,NO2,SO2"+\
             "&BBOX={}".format(BBOX)+\
-            "&dataType=A&format=application/json&verbose=0&monitorType=0&includerawconcentrations=0"+\
+            f"&dataType={_data_type}&format=application/json&verbose=0&monitorType=0"+\
+            f"&includerawconcentrations={_raw_concentrations}"+\
             f"&API_KEY={self.api_key}"
         # end of function
 
     #!
     #
     # Args :
-    #   aqi : int
-    #       The value of AQI.
-    # Returns : tuple
+    #   aqi : int or float
+    #       The value of AQI. NumPy integer and floating types are accepted too; bool is not.
+    # Returns : Observation
+    #   It behaves as the tuple (see Observation in the module aqi_observations).
     #   Example : (501, 'Kaboom', 7, '#ffffff', '#000')
     #   The 1st value is aqi (=AQI) itself. The 2nd value is its descriptor (see AQI_Descriptors).
     #   The 3rd value is its category number. The 4rth value is its foreground color.
     #   The 5th value is its background color.
+    #   The row of the tables is found by categoryIndex(...), as in categorizeAqi(...).
     def getAqiCategory(self, aqi):
-        if not (type(aqi) == type(0) or type(aqi) == type(0.0)):
-            raise ValueError(f'invalid AQI value {aqi}')
-
-        number_counter = 0
-        for each_number in AirQuality.AQI_Numbers:
-            if aqi <= each_number:
-                return (\
-                    aqi,\
-                    AirQuality.AQI_Descriptors[number_counter],\
-                    AirQuality.AQI_Categories[number_counter],\
-                    AirQuality.AQI_Colors_Fg[number_counter],\
-                    AirQuality.AQI_Colors_Bg[number_counter])
-
-            number_counter += 1
+        _index = AirQuality.categoryIndex(aqi)
+        if _index >= len(AirQuality.AQI_Numbers):
+            return AQO.Observation(AirQuality.AQI_Kaboom[0], AQO.KABOOM)
 
-        return (501, 'Kaboom', 7, '#ffffff', '#000')
+        return AQO.Observation(aqi, AQO.CATEGORIES[_index])
+        # end of function
+    #!
+    # returns the row of the AQI tables for the scalar aqi: the first i with aqi <= AQI_Numbers[i],
+    #   or len(AQI_Numbers) for 'Kaboom' (also for nan).
+    #   ValueError is raised if aqi is not a number (int, float, or a NumPy integer or floating type).
+    @staticmethod
+    def categoryIndex(aqi):
+        if isinstance(aqi, (bool, np.bool_)) or not isinstance(aqi, (int, float, np.integer, np.floating)):
+            raise ValueError(f'invalid AQI value {aqi}')
+        if aqi != aqi: # nan
+            return len(AirQuality.AQI_Numbers)
+        return bisect.bisect_left(AirQuality.AQI_Numbers, aqi)
+        # end of function
+    #!
+    # categorizes many AQI values at once, in one searchsorted pass over the AQI tables.
+    # Args :
+    #   aqi : array-like
+    #       The AQI values (any shape; int, float, or NumPy numeric types).
+    # Returns : dict
+    #   {'aqi' : float64 array, 'index' : int array (the rows of the tables, see categoryIndex(...)),
+    #    'descriptor' : object array, 'category' : int16 array, 'fg' : object array, 'bg' : object array},
+    #   all of the shape of aqi. As in getAqiCategory(...), 'aqi' is 501 where the category is 'Kaboom'.
+    @staticmethod
+    def categorizeAqi(aqi):
+        _aqi = np.asarray(aqi, dtype=np.float64)
+        # nan sorts last, i.e. as 'Kaboom'
+        _index = np.searchsorted(AirQuality.AQI_Table_Numbers, _aqi, side='left')
+        _kaboom = _index >= len(AirQuality.AQI_Numbers)
+        return {
+            'aqi' : np.where(_kaboom, float(AirQuality.AQI_Kaboom[0]), _aqi),
+            'index' : _index,
+            'descriptor' : AirQuality.AQI_Table_Descriptors[_index],
+            'category' : AirQuality.AQI_Table_Categories[_index],
+            'fg' : AirQuality.AQI_Table_Colors_Fg[_index],
+            'bg' : AirQuality.AQI_Table_Colors_Bg[_index],
+            }
         # end of function
     #!
     # processes Air Quality data obtained after the API call using BBOX (bounding-box) style request
+    #   The data are turned into columns once, and aggregated per parameter in vectorized form
+    #   (see the module aqi_aggregate); AirNow's -999 values are masked. The full statistics
+    #   (mean, median, min, max, percentiles, counts) are saved in self.data_stats, and the columns
+    #   (see ObservationTable in the module aqi_observations) in self.observations.
     # Args :
     #   data : list
     #       The list with air quality data by a bounding box,
     #       with each member being a dictionary that has elements named 'Parameter' : str, and 'AQI' : int.
     # Returns : dict or int
     #       If a dictionary is returned, each member's key is the name of air quality (OZONE, PM2.5,...).
-    #       Each member's value is the average AQI for that air quality.
-    #       Example : {'OZONE': 26.714285714285715, 'PM2.5': 10.5, 'PM10': 7.5, 'NO2': 3.0, 'CO': -999.0}
+    #       Each member's value is the Observation (see getAqiCategory(...)) of the average AQI for that air quality.
+    #       Example : {'OZONE': (26.714285714285715, 'Good', 1, '#000', '#00E400'), 'PM2.5': (10.5, 'Good', 1, '#000', '#00E400')}
+    #       An air quality with no valid values (e.g. only -999) is left out.
     #       If the provided data : list cannot be procesed, the return value is 0, indicating an error.
     def processAirData(self, data):
         if not isinstance(data, list) or len(data) < 1:
             return 0
 
-        _aqi_names = list()
-        _aqi_values = dict()
-        _aqi_count = dict()
-        for _each in data:
-            if not (_each['Parameter'] in _aqi_names):
-                _aqi_names.append(_each['Parameter'])
-                _aqi_values[_each['Parameter']] = _each['AQI']
-                _aqi_count[_each['Parameter']] = 1
-            else:
-                _aqi_values[_each['Parameter']] = _aqi_values[_each['Parameter']] + _each['AQI']
-                _aqi_count[_each['Parameter']] = _aqi_count[_each['Parameter']] + 1
-
-        if len(_aqi_names) < 1:
+        self.metrics.add('records', 'bbox', len(data))
+        try:
+            with self.metrics.stage('bbox', 'columns'):
+                _columns = AQO.ObservationTable.fromRecords(data)
+        except (KeyError, TypeError) as e:
+            self.metrics.addError('bbox', e)
             return 0
 
-        for _each in _aqi_names:
-            _aqi_values[_each] = self.getAqiCategory(_aqi_values[_each] / _aqi_count[_each])
+        self.observations = _columns
+        return self.aggregateColumns(_columns)
+        # end of function
+    #!
+    # aggregates the columns (see processAirData(...)), and saves the statistics in self.data_stats.
+    #   If self.kernel is set, and the zip code's location is known, the aggregation is distance-weighted
+    #   within the true radius; otherwise all monitors count the same.
+    # Args :
+    #   columns : AqiColumns (or ObservationTable)
+    # Returns : dict or int
+    #   See viewAirData(...).
+    def aggregateColumns(self, columns):
+        with self.metrics.stage('bbox', 'aggregate'):
+            self.data_stats = self.statsColumns(columns)
+        with self.metrics.stage('bbox', 'categorize'):
+            return self.viewAirData(self.data_stats)
+        # end of function
+    #!
+    # returns the statistics of the columns like aggregateColumns(...), without saving them.
+    # Args :
+    #   columns : AqiColumns
+    # Returns : dict
+    #   See aggregate(...) in the module aqi_aggregate.
+    def statsColumns(self, columns):
+        if (self.kernel is None) or (self.latitude is None) or (self.longitude is None):
+            return AQA.aggregate(columns)
+        return AQA.aggregateWeighted(columns, self.latitude, self.longitude,\
+            LLRE.Dms.MilesToMeters(self.distance_from), kernel=self.kernel)
+        # end of function
+    #!
+    # processes Air Quality data like processAirData(...), but parses them incrementally from a stream
+    #   of byte chunks, adding the records to the columns in batches as they arrive.
+    # Args :
+    #   chunks : iterable
+    #       The byte chunks of the JSON response, e.g. requests.Response.iter_content(...).
+    # Returns : dict or int
+    #   See processAirData(...).
+    def processAirStream(self, chunks):
+        _columns = AQO.ObservationTable()
+        _records = JS.iterJsonArray(chunks)
+        try:
+            with self.metrics.stage('bbox', 'stream'):
+                while True:
+                    _batch = list(itertools.islice(_records, AirQuality.STREAM_BATCH_SIZE))
+                    if len(_batch) < 1:
+                        break
+                    _columns.extend(_batch)
+        except (KeyError, TypeError, ValueError) as e:
+            self.metrics.addError('bbox', e)
+            return 0
 
-        # print(_aqi_count)
-        # print(_aqi_values)
+        self.metrics.add('records', 'bbox', len(_columns))
+        if len(_columns) < 1:
+            return 0
+
+        self.observations = _columns
+        return self.aggregateColumns(_columns)
+        # end of function
+    #!
+    # returns the view of the statistics (see processAirData(...)) used for painting.
+    # Args :
+    #   data_stats : dict
+    #       The value returned by aggregate(...) in the module aqi_aggregate.
+    # Returns : dict or int
+    #   The dictionary of the Observation of the mean AQI per air quality, or 0 if there are no valid values.
+    def viewAirData(self, data_stats):
+        _aqi_values = {_each : self.getAqiCategory(data_stats[_each]['mean'])\
+            for _each in data_stats if data_stats[_each]['count'] > 0}
+
+        if len(_aqi_values) < 1:
+            return 0
         return _aqi_values
         # end of function
     #!
+    # gets JSON data from url, or from self.cache if there is a valid entry for cache_key.
+    #   Only successful responses (status code 200, with a non-empty list) are cached.
+    # Args:
+    #   url : str
+    #   cache_key : tuple
+    #       See ResponseCache in the module air_now_cache; it is scoped to self.api_host and self.api_key
+    #       in self.cache (see scopeKey(...) in the module air_now_cache).
+    #   timeout : int or float
+    #       The timeout of the request in seconds.
+    #   The stages are timed in self.metrics, with cache_key[0] ('current', or 'bbox') as the kind of request.
+    #   If the same request (the same API host, API key, and cache_key) is already in flight, e.g. from another
+    #   AirQuality object, no new request is sent: its response (or exception) is shared (see self.flight).
+    #   Such a request is counted as 'coalesced' in self.metrics, and its stages are timed by the first caller only.
+    # Returns : the decoded JSON data (normally list).
+    def getJson(self, url, cache_key, timeout=30):
+        _kind = cache_key[0]
+        if not (self.cache is None):
+            _cached = self.cache.get(ANC.scopeKey(self.api_host, self.api_key, cache_key))
+            if not (_cached is None):
+                if self.ON_SCREEN:
+                    print("STATUS CODE: (cached)")
+                self.metrics.add('cache_hits', _kind)
+                return _cached
+
+        if self.flight is None:
+            return self.__requestJson__(url, cache_key, timeout)[0]
+
+        try:
+            (data_json, data_status_code), _shared = self.flight.do((self.api_host, self.api_key) + tuple(cache_key),\
+                lambda: self.__requestJson__(url, cache_key, timeout))
+        except Exception as e:
+            self.metrics.addError(_kind, e)
+            raise
+        if _shared:
+            self.metrics.add('coalesced', _kind)
+            self.metrics.setStatus(_kind, data_status_code)
+            if data_status_code != 200:
+                self.metrics.addError(_kind, f'http_{data_status_code}')
+            if self.ON_SCREEN:
+                print(f"STATUS CODE: {data_status_code} (coalesced)")
+        return data_json
+        # end of function
+    #!
+    # sends the request of getJson(...), and caches a successful response.
+    # Returns : tuple (data_json, status_code : int)
+    def __requestJson__(self, url, cache_key, timeout):
+        _kind = cache_key[0]
+        self.spendQuota(_kind)
+        try:
+            with self.metrics.stage(_kind, 'request'):
+                data = self.session.get(url, timeout=timeout, stream=True)
+            with self.metrics.stage(_kind, 'download'):
+                _content = data.content
+            data_status_code = data.status_code
+            self.checkThrottle(data)
+            self.metrics.setStatus(_kind, data_status_code)
+            self.metrics.add('bytes', _kind, len(_content))
+            if data_status_code != 200:
+                self.metrics.addError(_kind, f'http_{data_status_code}')
+            if self.ON_SCREEN:
+                print(f"STATUS CODE: {data_status_code}")
+            with self.metrics.stage(_kind, 'parse'):
+                data_json = data.json()
+        except Exception as e:
+            self.metrics.addError(_kind, e)
+            raise
+
+        if not (self.cache is None) and (data_status_code == 200) and isinstance(data_json, list) and len(data_json) > 0:
+            self.cache.put(ANC.scopeKey(self.api_host, self.api_key, cache_key), data_json)
+        return data_json, data_status_code
+        # end of function
+    #!
     # gets Air quality data by executing to API requests: current and BBOX (bonding-box). All data are the most recent.
     #
     #   The current data are for the specified zip code (self.zip_code). See also the function requestURL(...).
@@ -150,34 +440,39 @@ class AirQuality():
     #           'PM2.5': (8.5, 'Good', 1, '#000', '#00E400'),
     #           'PM10': (8.0, 'Good', 1, '#000', '#00E400'),
     #           'NO2': (1.0, 'Good', 1, '#000', '#00E400'),
-    #           'SO2': (0.0, 'Good', 1, '#000', '#00E400'),
-    #           'CO': (-999.0, 'Good', 1, '#000', '#00E400')
+    #           'SO2': (0.0, 'Good', 1, '#000', '#00E400')
     #           }
+    #   The full statistics behind self.data_full are saved in self.data_stats (see processAirData(...)).
     def getAirData(self, timeout=30):
+        self.startMetrics()
+        _centroid = None if (self.zip_index is None) else self.zip_index.lookup(self.zip_code)
+        if not (_centroid is None):
+            self.getAirDataConcurrently(_centroid, timeout=timeout)
+            self.saveAirData()
+            self.finishMetrics()
+            return
+
         try:
             if self.ON_SCREEN:
                 print(' ')
                 print ("*** Requesting current AirNowAPI data ***")
             # Perform data request (stage 1; current)
-            data = requests.get(self.request_URL, timeout=timeout)
-            data_status_code = data.status_code
-            if self.ON_SCREEN:
-                print(f"STATUS CODE: { data_status_code}")
-                # print(f"DATA: {data.json()}")
-            data_json = data.json()[0]
-            self.data_current = {data_json['ParameterName'] : self.getAqiCategory(data_json['AQI'])}
+            data_json = self.getCurrentData(timeout=timeout)
             # Download complete
-            self.data_time = data_json['DateObserved'] + ': ' + str(data_json['HourObserved'])
-            Latitude = data_json['Latitude']
-            Longitude = data_json['Longitude']
+            if data_json is None:
+                if self.ON_SCREEN:
+                    print (f"No current AirNowAPI data: {self.metrics.errors[-1:]}")
+                self.saveAirData()
+                self.finishMetrics()
+                return
             if self.ON_SCREEN:
                 Area = data_json['ReportingArea']  + ', ' + data_json['StateCode']
                 ParameterName = data_json['ParameterName']
                 AQI = data_json['AQI']
                 CategoryName = '({}=) {}'.format(data_json['Category']['Number'], data_json['Category']['Name'])
 
-                print(f'Latitude= {Latitude}')
-                print(f'Longitude= {Longitude}')
+                print(f'Latitude= {self.latitude}')
+                print(f'Longitude= {self.longitude}')
                 print(f'Area= {Area}')
                 print(f'Time= {self.data_time}')
                 print(f'Par= {ParameterName}')
@@ -187,21 +482,468 @@ class AirQuality():
                 print(' ')
                 print (f"*** Requesting full AirNowAPI data within {self.distance_from} mile radius ***")
             # Perform data request (stage 2; full)
-            p = LLRE.LatLon(Latitude, Longitude)
-            box_LatLon = p.areaLatLonBox(LLRE.Dms.MilesToMeters(self.distance_from), BBOX=1)
-            # print(box_LatLon)
-            request_URL_full = self.requestURLFull(data_json['DateObserved'], data_json['HourObserved'], box_LatLon)
-            data = requests.get(request_URL_full, timeout=timeout)
-            data_status_code = data.status_code
-            self.data_full = self.processAirData(data.json())
+            self.getFullData(timeout=timeout)
             # Download complete
             if self.ON_SCREEN:
-                print(f"STATUS CODE: {data_status_code}")
                 print(f"Data (full, averaged): {self.data_full}")
 
         except Exception as e:
+            self.metrics.addError('fetch', e)
             if self.ON_SCREEN:
                 print (f"Unable perform AirNowAPI request: {e}")
+
+        self.saveAirData()
+        self.finishMetrics()
+        # end of function
+    #!
+    # starts the metrics of a new fetch: self.metrics is replaced by new FetchMetrics.
+    # Args: none.
+    # Returns : nothing.
+    def startMetrics(self):
+        self.metrics = ANM.FetchMetrics()
+        with self.metrics.stage('current', 'url_build'):
+            self.requestURL()
+        # end of function
+    #!
+    # ends the metrics of the fetch, and adds them to self.metrics_registry (if any).
+    # Args: none.
+    # Returns : nothing.
+    def finishMetrics(self):
+        self.metrics.finish()
+        if not (self.metrics_registry is None):
+            self.metrics_registry.record(self.metrics)
+        if self.ON_SCREEN:
+            print(f"Metrics: {self.metrics.toDict()}")
+        # end of function
+    #!
+    # appends the data obtained by getAirData(...) to self.store (if any).
+    #   Failures of the store are reported (if ON_SCREEN), but never raised.
+    # Args: none.
+    # Returns : nothing.
+    def saveAirData(self):
+        if self.store is None:
+            return
+        try:
+            self.store.appendAirQuality(self)
+        except Exception as e:
+            if self.ON_SCREEN:
+                print (f"Unable to store the data: {e}")
+        # end of function
+    #!
+    # gets Air quality data like getAirData(...), but with the location of the zip code already known
+    #   (from self.zip_index), so that the current and BBOX requests are made concurrently.
+    #   The BBOX data are for the latest observation hour expected to be published. If that hour has no data yet,
+    #   they are requested again for the hour of the current data (in UTC), or else for the hour before.
+    # Args:
+    #   centroid : tuple (latitude : float, longitude : float)
+    #   timeout : int or float
+    #       The timeout of each request in seconds.
+    # Returns : nothing.
+    def getAirDataConcurrently(self, centroid, timeout=30):
+        self.latitude, self.longitude = centroid
+        _date, _hour = ANCL.latestObservationHour()
+        if self.ON_SCREEN:
+            print(' ')
+            print (f"*** Requesting current and full AirNowAPI data within {self.distance_from} mile radius ***")
+            print(f'Latitude= {self.latitude}')
+            print(f'Longitude= {self.longitude}')
+            print(f'Time (UTC)= {_date}T{_hour}')
+
+        _current, _full = AirQuality.runConcurrently([(self.getCurrentData, (timeout,), dict()),\
+            (self.getFullData, (timeout,), dict(date=_date, hour=_hour))], max_workers=2)
+        try:
+            _current.result()
+        except Exception as e:
+            self.metrics.addError('current', e)
+            if self.ON_SCREEN:
+                print (f"Unable perform AirNowAPI request (current): {e}")
+        try:
+            _full.result()
+            if not isinstance(self.data_full, dict):
+                self.getFullData(timeout, **self.fallbackHour(_date, _hour))
+            if self.data_time is None:
+                self.data_time = f'{self.date_full}: {self.hour_full} UTC'
+        except Exception as e:
+            self.metrics.addError('bbox', e)
+            if self.ON_SCREEN:
+                print (f"Unable perform AirNowAPI request (full): {e}")
+
+        if self.ON_SCREEN:
+            print(f"Data (current): {self.data_current}")
+            print(f"Data (full, averaged): {self.data_full}")
+        # end of function
+    #!
+    # returns the hour to request the BBOX data for, if the estimated hour (date, hour) had none:
+    #   the hour of the current data in UTC, if it is known and differs; otherwise the hour before.
+    # Returns : dict
+    #   {'date' : str, 'hour' : int}, the keyword arguments of getFullData(...).
+    def fallbackHour(self, date, hour):
+        _observed = self.observedHourUtc()
+        if (_observed is None) or (_observed == (date, int(hour))):
+            _observed = ANCL.previousHour(date, hour)
+        if self.ON_SCREEN:
+            print(f'No data for {date}T{hour} (UTC); retrying {_observed[0]}T{_observed[1]}')
+        return {'date' : _observed[0], 'hour' : _observed[1]}
+        # end of function
+    #!
+    # returns the hour of the current data (self.date_observed and self.hour_observed, in self.time_zone) in UTC,
+    #   as requested from AirNow for the BBOX data.
+    # Returns : tuple (date : str, hour : int) or None
+    #   None is returned if there are no current data, or their time zone is not known.
+    def observedHourUtc(self):
+        if self.date_observed is None:
+            return None
+        return ANCL.localToUtcHour(self.date_observed, self.hour_observed, self.time_zone)
+        # end of function
+    #!
+    # performs the 1st stage of getAirData(...): gets the current data for self.zip_code.
+    #   It sets self.data_current and self.data_time, and also the location and the time of the observation:
+    #   self.latitude, self.longitude (unless the location is already known), self.date_observed (e.g. '2021-09-29'),
+    #   self.hour_observed : int, and self.time_zone (e.g. 'EST'). A location learned from the response is added to
+    #   self.zip_index (if any), so that the next fetch of the zip code can be concurrent (see getAirDataConcurrently(...)).
+    # Args:
+    #   timeout : int or float
+    #       The timeout of the request in seconds.
+    # Returns : data_json : dict or None
+    #   The first record of the response; None if the response has no records (e.g. an error of AirNow, which is
+    #   recorded as 'http_<status code>', or an empty list, recorded as 'no_data'), in which case nothing is set.
+    #   Exceptions are not caught.
+    def getCurrentData(self, timeout=30):
+        _response = self.getJson(self.request_URL, ('current', self.zip_code, self.distance_from), timeout=timeout)
+        if isinstance(_response, list):
+            self.metrics.add('records', 'current', len(_response))
+        if not (isinstance(_response, list) and len(_response) > 0 and isinstance(_response[0], dict)):
+            if self.metrics.status.get('current', 200) == 200:
+                self.metrics.addError('current', 'no_data')
+            return None
+        data_json = _response[0]
+        self.data_current = {data_json['ParameterName'] : self.getAqiCategory(data_json['AQI'])}
+        self.data_time = data_json['DateObserved'] + ': ' + str(data_json['HourObserved'])
+        if (self.latitude is None) or (self.longitude is None):
+            self.latitude = data_json['Latitude']
+            self.longitude = data_json['Longitude']
+            if not (self.zip_index is None):
+                self.zip_index.learn(self.zip_code, self.latitude, self.longitude)
+        self.date_observed = data_json['DateObserved'].strip()
+        self.hour_observed = int(data_json['HourObserved'])
+        self.time_zone = data_json.get('LocalTimeZone')
+        return data_json
+        # end of function
+    #!
+    # returns the bounding box around (self.latitude, self.longitude) whose "radius" is self.distance_from.
+    #   getCurrentData(...) must be called first.
+    # Args:
+    #   kwargs: typical keyword arguments
+    #       'BBOX' : <any value>
+    #           If set, the box is returned as str (see requestURLFull(...)); otherwise as dict (see areaLatLonBox(...)).
+    # Returns : str or dict
+    def requestBBOX(self, **kwargs):
+        p = LLRE.LatLon(self.latitude, self.longitude)
+        return p.areaLatLonBox(LLRE.Dms.MilesToMeters(self.distance_from), **kwargs)
+        # end of function
+    #!
+    # performs the 2nd stage of getAirData(...): gets the BBOX data, and sets self.data_full.
+    #   The location (self.latitude, self.longitude) must be known, e.g. after getCurrentData(...).
+    # Args:
+    #   timeout : int or float
+    #       The timeout of the request in seconds.
+    #   kwargs: typical keyword arguments
+    #       'date' : str, and 'hour' : int
+    #           The time (UTC) of the data. They default to the hour of the current data in UTC (see observedHourUtc(...)),
+    #           or, if its time zone is not known, to the latest observation hour expected to be published.
+    # Returns : nothing. Exceptions are not caught.
+    def getFullData(self, timeout=30, **kwargs):
+        if self.NOWCAST:
+            self.getNowCastData(timeout=timeout, **kwargs)
+            return
+
+        _observed = None if (('date' in kwargs) and ('hour' in kwargs)) else\
+            (self.observedHourUtc() or ANCL.latestObservationHour())
+        _date = kwargs['date'] if ('date' in kwargs) else _observed[0]
+        _hour = kwargs['hour'] if ('hour' in kwargs) else _observed[1]
+        if not (self.STREAMING or (self.tile_min_distance is None)) and (self.distance_from >= self.tile_min_distance):
+            with self.metrics.stage('bbox', 'url_build'):
+                _box = self.requestBBOX()
+            self.date_full = _date
+            self.hour_full = _hour
+            self.data_full = self.processAirData(self.getTiledData(_box, _date, _hour, timeout=timeout))
+            if not isinstance(self.data_full, dict):
+                self.metrics.addError('bbox', 'no_data')
+            return
+
+        with self.metrics.stage('bbox', 'url_build'):
+            box_LatLon = self.requestBBOX(BBOX=1)
+            request_URL_full = self.requestURLFull(_date, _hour, box_LatLon)
+        _cache_key = ('bbox', box_LatLon, _date, _hour)
+        self.date_full = _date
+        self.hour_full = _hour
+        if self.STREAMING:
+            self.data_full = self.getStream(request_URL_full, _cache_key, timeout=timeout)
+        else:
+            self.data_full = self.processAirData(self.getJson(request_URL_full, _cache_key, timeout=timeout))
+        if not isinstance(self.data_full, dict):
+            self.metrics.addError('bbox', 'no_data')
+        # end of function
+    #!
+    # returns the tiles of the fixed grid (of side degrees, aligned to multiples of it) that cover the box.
+    # Args:
+    #   box : dict
+    #       {'lats' : (min, max), 'lons' : (min, max)}; see areaLatLonBox(...) in the module lat_lon_round_earth.
+    #   degrees : float
+    # Returns : list of dict
+    #   The tiles, as boxes of the same form, row by row from the south-west.
+    @staticmethod
+    def tileBoxes(box, degrees=TILE_DEGREES):
+        _lat_min, _lat_max = max(-90., box['lats'][0]), min(90., box['lats'][1])
+        _rows = range(math.floor(_lat_min / degrees), math.floor(_lat_max / degrees) + 1)
+        _columns = range(math.floor(box['lons'][0] / degrees), math.floor(box['lons'][1] / degrees) + 1)
+        return [{'lats' : (max(-90., _row * degrees), min(90., (_row + 1) * degrees)),\
+            'lons' : (_column * degrees, (_column + 1) * degrees)} for _row in _rows for _column in _columns]
+        # end of function
+    #!
+    # gets the BBOX data of the box as the tiles that cover it (see tileBoxes(...)), concurrently, and merges them:
+    #   only the records within the box are kept, and a site (its location and parameter) reported by two tiles
+    #   (on their common edge) is kept once. Each tile is requested by getJson(...), so it is cached per hour, and
+    #   shared with concurrent identical requests. A tile that fails is recorded in self.metrics, and left out.
+    # Args:
+    #   box : dict
+    #   date : str, and hour : int
+    #   timeout : int or float
+    #       The timeout of each request in seconds.
+    # Returns : list
+    #   The records. The exception of the first tile is raised if all tiles fail.
+    def getTiledData(self, box, date, hour, timeout=30):
+        _tiles = [AirQuality.boxToBBOX(_tile) for _tile in AirQuality.tileBoxes(box)]
+        _futures = AirQuality.runConcurrently([(self.getJson, (self.requestURLFull(date, hour, _tile), ('bbox', _tile, date, hour)),\
+            dict(timeout=timeout)) for _tile in _tiles], max_workers=AirQuality.TILE_WORKERS)
+
+        _errors = [_future.exception() for _future in _futures if not (_future.exception() is None)]
+        if len(_errors) == len(_futures):
+            raise _errors[0]
+        if self.ON_SCREEN:
+            print(f"{len(_tiles) - len(_errors)} of {len(_tiles)} tiles")
+
+        records = list()
+        _sites = set()
+        _lats, _lons = box['lats'], box['lons']
+        for _future in _futures:
+            _data = _future.result() if (_future.exception() is None) else None
+            if not isinstance(_data, list):
+                continue
+            for _record in _data:
+                if not isinstance(_record, dict):
+                    continue
+                if ('Latitude' in _record) and ('Longitude' in _record):
+                    if not ((_lats[0] <= _record['Latitude'] <= _lats[1]) and (_lons[0] <= _record['Longitude'] <= _lons[1])):
+                        continue
+                    _site = (_record['Latitude'], _record['Longitude'], _record.get('Parameter'), _record.get('UTC'))
+                    if _site in _sites:
+                        continue
+                    _sites.add(_site)
+                records.append(_record)
+        return records
+        # end of function
+    #!
+    # runs the calls concurrently, on at most max_workers daemon threads, and waits for all of them.
+    #   Unlike the threads of a ThreadPoolExecutor (which are joined at exit), daemon threads do not keep
+    #   the process alive when the caller is abandoned, e.g. by a FetchWorker (in the module shch_air_now_lib)
+    #   whose window has been closed.
+    # Args:
+    #   calls : list of tuple (fnc : callable, args : tuple, kwargs : dict)
+    #   max_workers : int
+    # Returns : list of concurrent.futures.Future
+    #   One done future per call, in the same order.
+    @staticmethod
+    def runConcurrently(calls, max_workers):
+        _futures = [concurrent.futures.Future() for _each in calls]
+        _indexes = queue.Queue()
+        for _index in range(len(calls)):
+            _indexes.put(_index)
+
+        def __work__():
+            while True:
+                try:
+                    _index = _indexes.get_nowait()
+                except queue.Empty:
+                    return
+                _fnc, _args, _kwargs = calls[_index]
+                try:
+                    _futures[_index].set_result(_fnc(*_args, **_kwargs))
+                except BaseException as e:
+                    _futures[_index].set_exception(e)
+
+        _threads = [threading.Thread(target=__work__, name=f'air_quality_{_index}', daemon=True)\
+            for _index in range(max(1, min(int(max_workers), len(calls))))]
+        for _thread in _threads:
+            _thread.start()
+        for _thread in _threads:
+            _thread.join()
+        return _futures
+        # end of function
+    #!
+    # returns box (see tileBoxes(...)) as str formatted for requestURLFull(...).
+    @staticmethod
+    def boxToBBOX(box):
+        return '{},{},{},{}'.format(box['lons'][0], box['lats'][0], box['lons'][1], box['lats'][1])
+        # end of function
+    #!
+    # performs the 2nd stage of getAirData(...) in the 'NOWCAST' mode: gets the raw concentrations of the last
+    #   NOWCAST_HOURS hours in one BBOX request, and sets self.data_full from their NowCast (see processNowCast(...)).
+    # Args:
+    #   timeout : int or float
+    #       The timeout of the request in seconds.
+    #   kwargs: typical keyword arguments
+    #       'date' : str, and 'hour' : int
+    #           The most recent hour (UTC) of the window. They default to the latest observation hour expected
+    #           to be published (see latestObservationHour(...) in the module air_now_clock).
+    # Returns : nothing. Exceptions are not caught.
+    def getNowCastData(self, timeout=30, **kwargs):
+        if ('date' in kwargs) and ('hour' in kwargs):
+            _date, _hour = kwargs['date'], kwargs['hour']
+        else:
+            _date, _hour = ANCL.latestObservationHour()
+        _end = datetime.datetime.strptime(str(_date).strip(), '%Y-%m-%d') + datetime.timedelta(hours=int(_hour))
+        _start = _end - datetime.timedelta(hours=AQN.NOWCAST_HOURS - 1)
+
+        with self.metrics.stage('bbox', 'url_build'):
+            box_LatLon = self.requestBBOX(BBOX=1)
+            request_URL_full = self.requestURLFull(_start.strftime('%Y-%m-%d'), _start.strftime('%H'), box_LatLon,\
+                end_date=_end.strftime('%Y-%m-%d'), end_hour=_end.strftime('%H'), data_type='B', raw_concentrations=1)
+        _cache_key = ('bbox', box_LatLon, _start.strftime('%Y-%m-%dT%H'), _end.strftime('%Y-%m-%dT%H'), 'nowcast')
+        self.date_full = _end.strftime('%Y-%m-%d')
+        self.hour_full = _end.hour
+        self.data_full = self.processNowCast(self.getJson(request_URL_full, _cache_key, timeout=timeout), _end)
+        if not isinstance(self.data_full, dict):
+            self.metrics.addError('bbox', 'no_data')
+        # end of function
+    #!
+    # processes the raw concentrations of a NowCast window (see getNowCastData(...)): computes the NowCast and its AQI
+    #   per site and parameter (saved in self.data_nowcast, see nowCastSites(...) in the module aqi_nowcast),
+    #   and aggregates the valid AQI values of the sites as in processAirData(...).
+    # Args :
+    #   data : list
+    #       The BBOX records, with 'RawConcentration' and 'UTC'.
+    #   end_hour : datetime.datetime
+    #       The most recent hour (UTC) of the window.
+    # Returns : dict or int
+    #   See processAirData(...).
+    def processNowCast(self, data, end_hour):
+        if not isinstance(data, list) or len(data) < 1:
+            return 0
+
+        self.metrics.add('records', 'bbox', len(data))
+        try:
+            with self.metrics.stage('bbox', 'nowcast'):
+                self.data_nowcast = AQN.nowCastSites(data, end_hour)
+        except (TypeError, ValueError) as e:
+            self.metrics.addError('bbox', e)
+            return 0
+
+        _valid = np.flatnonzero(np.isfinite(self.data_nowcast['aqi']))
+        _hour = end_hour.strftime('%Y-%m-%dT%H:00')
+        with self.metrics.stage('bbox', 'columns'):
+            _columns = AQO.ObservationTable.fromRecords([{\
+                'Parameter' : self.data_nowcast['parameter'][_index],\
+                'AQI' : float(self.data_nowcast['aqi'][_index]),\
+                'Latitude' : float(self.data_nowcast['latitude'][_index]),\
+                'Longitude' : float(self.data_nowcast['longitude'][_index]),\
+                'UTC' : _hour} for _index in _valid])
+        if len(_columns) < 1:
+            return 0
+
+        self.observations = _columns
+        return self.aggregateColumns(_columns)
+        # end of function
+    #!
+    # gets the BBOX data from url in streaming mode, and processes them while they are being downloaded.
+    #   If there is a valid entry for cache_key in self.cache, it is processed instead.
+    # Args:
+    #   url : str
+    #   cache_key : tuple
+    #   timeout : int or float
+    # Returns : dict or int
+    #   See processAirStream(...).
+    def getStream(self, url, cache_key, timeout=30):
+        if not (self.cache is None):
+            _cached = self.cache.get(ANC.scopeKey(self.api_host, self.api_key, cache_key))
+            if not (_cached is None):
+                if self.ON_SCREEN:
+                    print("STATUS CODE: (cached)")
+                self.metrics.add('cache_hits', 'bbox')
+                return self.processAirData(_cached)
+
+        self.spendQuota('bbox')
+        try:
+            with self.metrics.stage('bbox', 'request'):
+                data = self.session.get(url, timeout=timeout, stream=True)
+        except Exception as e:
+            self.metrics.addError('bbox', e)
+            raise
+        with data:
+            self.checkThrottle(data)
+            self.metrics.setStatus('bbox', data.status_code)
+            if self.ON_SCREEN:
+                print(f"STATUS CODE: {data.status_code}")
+            if data.status_code != 200:
+                self.metrics.addError('bbox', f'http_{data.status_code}')
+                return 0
+            return self.processAirStream(self.__countBytes__(data.iter_content(chunk_size=AirQuality.STREAM_CHUNK_SIZE)))
+        # end of function
+    #!
+    # takes a token of the API key's budget from self.limiter for a request that is about to be sent.
+    #   The remaining budget is saved in self.metrics.
+    # Args:
+    #   kind : str
+    #       'current', or 'bbox'.
+    #   wait : float
+    #       The most seconds to wait for the token; see acquire(...) of QuotaLimiter.
+    # Returns : nothing. QuotaExceeded (see the module air_now_quota) is raised, and recorded in self.metrics,
+    #   if the budget is exhausted; the request must not be sent then.
+    def spendQuota(self, kind, wait=0.):
+        if self.limiter is None:
+            return
+        try:
+            self.metrics.setQuota(self.limiter.acquire(self.api_key, priority=self.priority, wait=wait))
+        except ANQ.QuotaExceeded as e:
+            self.metrics.setQuota(e.remaining)
+            self.metrics.addError(kind, e)
+            if self.ON_SCREEN:
+                print(f"Request not sent: {e}")
+            raise
+        # end of function
+    #!
+    # charges self.limiter a token for each retry the session has made within the request (the first attempt
+    #   is charged by spendQuota(...)), and blocks the API key if the response is a 429 (too many requests),
+    #   for its Retry-After time.
+    # Args:
+    #   response : requests.Response
+    # Returns : nothing.
+    def checkThrottle(self, response):
+        if self.limiter is None:
+            return
+        _retries = getattr(getattr(response, 'raw', None), 'retries', None)
+        _history = getattr(_retries, 'history', None)
+        if isinstance(_history, tuple) and len(_history) > 0:
+            self.limiter.charge(self.api_key, len(_history))
+        if response.status_code != 429:
+            return
+        try:
+            _retry_after = float(response.headers.get('Retry-After'))
+        except (TypeError, ValueError):
+            _retry_after = None
+        self.limiter.penalize(self.api_key, _retry_after)
+        # end of function
+    #!
+    # returns the budget of the API key (see remaining(...) of QuotaLimiter), or None if there is no limiter.
+    def quotaRemaining(self):
+        return None if (self.limiter is None) else self.limiter.remaining(self.api_key)
+        # end of function
+    #!
+    # passes the chunks through, adding their sizes to self.metrics.
+    def __countBytes__(self, chunks):
+        for _chunk in chunks:
+            self.metrics.add('bytes', 'bbox', len(_chunk))
+            yield _chunk
         # end of function
     #!
     # prints air quality data on screen
@@ -0,0 +1,215 @@
+import concurrent.futures
+import lib.air_now_clock as ANCL
+from lib.air_quality import AirQuality
+
+MAX_WORKERS = 8
+
+class AirQualityBatch():
+    __doc__ = """
+    #!
+    # gets Air quality data for many areas at once.
+    #   The current data (stage 1) are requested for all areas concurrently. Then the areas' bounding boxes
+    #   are grouped by the observation hour (in UTC), and the overlapping boxes are merged, so that one BBOX request
+    #   (stage 2) serves all areas of a merged box. The returned monitor records are split back to each area
+    #   locally, by their Latitude and Longitude. For N areas whose boxes merge into k boxes,
+    #   it takes N + k requests instead of 2N.
+    # Args:
+    #   api_key : str
+    #   areas : iterable
+    #       The (zip_code, distance_from) pairs. See AirQuality(...).
+    #   kwargs: typical keyword arguments
+    #       'max_workers' : int
+    #           The maximum number of concurrent requests. Defaults to MAX_WORKERS.
+    #       Any other keyword arguments (e.g. 'ON_SCREEN', 'session', 'API_HOST', 'cache') are passed to AirQuality(...).
+    #   In any case, the data will be saved in self.air_qualities, with (zip_code, distance_from : int) as keys,
+    #   and AirQuality objects (with data_current, data_full, and data_time set) as values.
+    """
+    def __init__(self, api_key, areas, **kwargs):
+        self.max_workers = int(kwargs.pop('max_workers', MAX_WORKERS))
+        self.ON_SCREEN = 'ON_SCREEN' in kwargs
+
+        self.api_key = api_key
+        self.air_qualities = dict()
+        for _zip_code, _distance_from in areas:
+            _key = (_zip_code, int(_distance_from))
+            if not (_key in self.air_qualities):
+                self.air_qualities[_key] = AirQuality(api_key, _zip_code, _distance_from, **kwargs)
+        # end of __init__
+    #!
+    # merges overlapping boxes until no two of the resulting boxes overlap.
+    # Args:
+    #   boxes : list
+    #       The boxes as returned by areaLatLonBox(...), i.e. {'lats': (min, max), 'lons': (min, max)}.
+    # Returns : list
+    #   Each member is a tuple (box : dict, members : list), where members are the indices of the boxes
+    #   (in the argument boxes) merged into box.
+    @staticmethod
+    def mergeBoxes(boxes):
+        merged = [({'lats': tuple(_box['lats']), 'lons': tuple(_box['lons'])}, [_index])\
+            for _index, _box in enumerate(boxes)]
+
+        _has_merged = True
+        while _has_merged:
+            _has_merged = False
+            for i in range(len(merged)):
+                for j in range(i + 1, len(merged)):
+                    if AirQualityBatch.overlap(merged[i][0], merged[j][0]):
+                        _a, _b = merged[i][0], merged[j][0]
+                        _box = {
+                            'lats': (min(_a['lats'][0], _b['lats'][0]), max(_a['lats'][1], _b['lats'][1])),
+                            'lons': (min(_a['lons'][0], _b['lons'][0]), max(_a['lons'][1], _b['lons'][1])),
+                            }
+                        merged[i] = (_box, merged[i][1] + merged[j][1])
+                        del merged[j]
+                        _has_merged = True
+                        break
+                if _has_merged:
+                    break
+
+        return merged
+        # end of function
+    #!
+    # returns True if the two boxes (see mergeBoxes(...)) overlap or touch.
+    @staticmethod
+    def overlap(box_a, box_b):
+        return (box_a['lats'][0] <= box_b['lats'][1]) and (box_b['lats'][0] <= box_a['lats'][1]) and\
+            (box_a['lons'][0] <= box_b['lons'][1]) and (box_b['lons'][0] <= box_a['lons'][1])
+        # end of function
+    #!
+    # returns True if the record (with 'Latitude' and 'Longitude') lies in the box (see mergeBoxes(...)).
+    #   Records without coordinates are considered to lie in any box.
+    @staticmethod
+    def isInBox(record, box):
+        if not (('Latitude' in record) and ('Longitude' in record)):
+            return True
+        return (box['lats'][0] <= record['Latitude'] <= box['lats'][1]) and\
+            (box['lons'][0] <= record['Longitude'] <= box['lons'][1])
+        # end of function
+    #!
+    # returns box (see mergeBoxes(...)) as str formatted for requestURLFull(...)
+    @staticmethod
+    def boxToBBOX(box):
+        return AirQuality.boxToBBOX(box)
+        # end of function
+    #!
+    # gets Air quality data for all areas. See also AirQuality.getAirData(...).
+    # Args:
+    #   timeout : int or float
+    #       The timeout of each request in seconds.
+    # Returns : nothing.
+    #   The results are in self.air_qualities. An area whose data cannot be obtained keeps data_full = None.
+    def getAirData(self, timeout=30):
+        _air_qualities = list(self.air_qualities.values())
+        if len(_air_qualities) < 1:
+            return
+        for _each in _air_qualities:
+            _each.startMetrics()
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as _executor:
+            # stage 1 (current), for all areas concurrently
+            _futures = {_executor.submit(_each.getCurrentData, timeout): _each for _each in _air_qualities}
+            _resolved = list()
+            for _future in concurrent.futures.as_completed(_futures):
+                try:
+                    if not (_future.result() is None): # None: no current data (the error is recorded)
+                        _resolved.append(_futures[_future])
+                except Exception as e:
+                    _futures[_future].metrics.addError('current', e)
+                    if self.ON_SCREEN:
+                        print(f"Unable perform AirNowAPI request for {_futures[_future].zip_code}: {e}")
+
+            # the boxes are merged only within the same observation hour (UTC, see observedHourUtc(...) of AirQuality)
+            _by_time = dict()
+            for _each in _resolved:
+                _by_time.setdefault(_each.observedHourUtc() or ANCL.latestObservationHour(), list()).append(_each)
+
+            _requests = list() # (date, hour, box, members)
+            for (_date, _hour), _group in _by_time.items():
+                _boxes = [_each.requestBBOX() for _each in _group]
+                for _box, _members in AirQualityBatch.mergeBoxes(_boxes):
+                    _requests.append((_date, _hour, _box, [(_group[_m], _boxes[_m]) for _m in _members]))
+
+            if self.ON_SCREEN:
+                print(f"*** {len(_resolved)} areas resolved; {len(_requests)} BBOX requests ***")
+
+            # stage 2 (full), one request per merged box, concurrently
+            _futures = {_executor.submit(self.__getBoxData__, _date, _hour, _box, _members, timeout):\
+                (_date, _hour, _members) for _date, _hour, _box, _members in _requests}
+            for _future in concurrent.futures.as_completed(_futures):
+                _date, _hour, _members = _futures[_future]
+                try:
+                    _data = _future.result()
+                except Exception as e:
+                    for _air_quality, _box in _members:
+                        _air_quality.metrics.addError('bbox', e)
+                    if self.ON_SCREEN:
+                        print(f"Unable perform AirNowAPI request: {e}")
+                    continue
+
+                for _air_quality, _box in _members:
+                    if isinstance(_data, list):
+                        _air_quality.data_full = _air_quality.processAirData(\
+                            [_record for _record in _data if AirQualityBatch.isInBox(_record, _box)])
+                    else:
+                        _air_quality.data_full = _air_quality.processAirData(_data)
+                    _air_quality.date_full = _date
+                    _air_quality.hour_full = _hour
+
+        for _each in _air_qualities:
+            _each.saveAirData()
+            _each.finishMetrics()
+        # end of function
+    #!
+    # gets the BBOX data for the merged box. The request is made by the first member area (its metrics get
+    #   the times and the payload); the other members record it as coalesced (or as a cache hit), with its status.
+    # Args:
+    #   members : list
+    #       The (AirQuality, box) pairs of the member areas.
+    def __getBoxData__(self, date, hour, box, members, timeout):
+        _air_quality = members[0][0]
+        _BBOX = AirQualityBatch.boxToBBOX(box)
+        _cache_hits = _air_quality.metrics.cache_hits.get('bbox', 0)
+        result = _air_quality.getJson(_air_quality.requestURLFull(date, hour, _BBOX), ('bbox', _BBOX, date, hour), timeout=timeout)
+
+        _is_cached = _air_quality.metrics.cache_hits.get('bbox', 0) > _cache_hits
+        _status = _air_quality.metrics.status.get('bbox')
+        for _member, _box in members[1:]:
+            _member.metrics.add('cache_hits' if _is_cached else 'coalesced', 'bbox')
+            if not (_is_cached or (_status is None)):
+                _member.metrics.setStatus('bbox', _status)
+                if _status != 200:
+                    _member.metrics.addError('bbox', f'http_{_status}')
+            if not (_air_quality.metrics.quota_remaining is None):
+                _member.metrics.setQuota(_air_quality.metrics.quota_remaining)
+        return result
+        # end of function
+    #!
+    # prints air quality data on screen
+    # Args: none.
+    # Returns : nothing.
+    def printAirData(self):
+        for _key in self.air_qualities:
+            print('')
+            print(f' *** {_key[0]} ({_key[1]} miles) *** ')
+            self.air_qualities[_key].printAirData()
+        # end of function
+    # end of class AirQualityBatch
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,222 @@
+import math
+import array
+import numpy as np
+from lib.lat_lon_round_earth import LatLonBatch
+
+AQI_SENTINEL = -999 # AirNow's value for "no data"; any negative AQI is masked
+PERCENTILES = (10, 25, 75, 90)
+IDW_POWER = 2.
+IDW_MIN_DISTANCE = 1000. # metres; closer monitors are weighted as if they were this far
+KERNELS = ('uniform', 'idw', 'gaussian')
+
+class AqiColumns():
+    __doc__ = """
+    #!
+    # builds the columns of BBOX data (list of records, each being a dictionary with 'Parameter' and 'AQI', and,
+    #   optionally, 'Latitude' and 'Longitude') once, so that they can be aggregated without Python loops.
+    #   Parameter names are interned: each record keeps a small integer code; self.parameters holds the names.
+    #   Records can be added one by one (add(...)), or in bulk (extend(...)).
+    """
+    def __init__(self):
+        self.parameters = list() # code -> name
+        self.__codes__ = dict() # name -> code
+        self.__code__ = array.array('h')
+        self.__aqi__ = array.array('d')
+        self.__latitude__ = array.array('d')
+        self.__longitude__ = array.array('d')
+        # end of __init__
+    #!
+    def __len__(self):
+        return len(self.__code__)
+    #!
+    # returns new AqiColumns built from the list of records.
+    @classmethod
+    def fromRecords(cls, records):
+        columns = cls()
+        columns.extend(records)
+        return columns
+        # end of function
+    #!
+    # returns the code of the parameter name, interning the name if needed.
+    def getCode(self, parameter):
+        if not (parameter in self.__codes__):
+            self.__codes__[parameter] = len(self.parameters)
+            self.parameters.append(parameter)
+        return self.__codes__[parameter]
+        # end of function
+    #!
+    # adds one record.
+    # Args:
+    #   record : dict
+    # Returns: nothing. KeyError is raised if the record has no 'Parameter' or 'AQI'.
+    def add(self, record):
+        self.__code__.append(self.getCode(record['Parameter']))
+        self.__aqi__.append(record['AQI'])
+        self.__latitude__.append(record.get('Latitude', math.nan))
+        self.__longitude__.append(record.get('Longitude', math.nan))
+        # end of function
+    #!
+    # adds many records.
+    # Args:
+    #   records : list
+    # Returns: nothing. KeyError is raised if any record has no 'Parameter' or 'AQI'.
+    def extend(self, records):
+        _codes = self.__codes__
+        for _name in {_each['Parameter'] for _each in records}:
+            self.getCode(_name)
+
+        self.__code__.extend([_codes[_each['Parameter']] for _each in records])
+        self.__aqi__.extend([_each['AQI'] for _each in records])
+        self.__latitude__.extend([_each.get('Latitude', math.nan) for _each in records])
+        self.__longitude__.extend([_each.get('Longitude', math.nan) for _each in records])
+        # end of function
+    #!
+    # returns the columns as NumPy arrays (which share memory with the columns).
+    # Returns : dict
+    #   {'code' : int16 array, 'aqi' : float64 array, 'latitude' : float64 array, 'longitude' : float64 array}
+    def arrays(self):
+        return {
+            'code' : np.frombuffer(self.__code__, dtype=np.int16) if len(self) > 0 else np.zeros(0, dtype=np.int16),
+            'aqi' : np.frombuffer(self.__aqi__, dtype=np.float64) if len(self) > 0 else np.zeros(0),
+            'latitude' : np.frombuffer(self.__latitude__, dtype=np.float64) if len(self) > 0 else np.zeros(0),
+            'longitude' : np.frombuffer(self.__longitude__, dtype=np.float64) if len(self) > 0 else np.zeros(0),
+            }
+        # end of function
+    # end of class AqiColumns
+
+#!
+# aggregates AQI values per parameter (pollutant), with AirNow's sentinels (negative values) masked.
+#   Everything is computed in one sorted pass over the columns.
+# Args:
+#   columns : AqiColumns
+#   percentiles : tuple
+#       The percentiles to compute (in addition to the median), each within 0..100.
+# Returns : dict
+#   Each member's key is the parameter's name. Each member's value is a dictionary:
+#   {'mean', 'median', 'min', 'max', 'p10', 'p25', ... : float, 'count' : int, 'monitors' : int},
+#   where 'count' is the number of valid values, and 'monitors' is the number of all records for the parameter.
+#   If 'count' is 0, all float values are nan.
+#   Example : {'OZONE': {'mean': 26.7, 'median': 27.0, 'min': 19.0, 'max': 33.0, 'p10': 21.4, ..., 'count': 7, 'monitors': 7}}
+def aggregate(columns, percentiles=PERCENTILES):
+    _arrays = columns.arrays()
+    return _aggregate(columns.parameters, _arrays['code'], _arrays['aqi'], percentiles)
+    # end of function
+#!
+# aggregates AQI values per parameter like aggregate(...), but only over the monitors within the true
+#   great-circle radius around the center, and with the mean weighted by the distance to the center.
+#   Records without coordinates are left out.
+# Args:
+#   columns : AqiColumns
+#   latitude, longitude : float
+#       The center.
+#   radius : float
+#       The radius in metres.
+#   kernel : str or callable
+#       'uniform' : every monitor within the radius counts the same.
+#       'idw' : inverse-distance weighting, 1 / max(distance, IDW_MIN_DISTANCE)**power.
+#       'gaussian' : exp(-(distance / bandwidth)**2 / 2), where bandwidth defaults to radius / 2.
+#       callable : kernel(distances : numpy.ndarray, radius : float) returns the weights.
+#   percentiles : tuple
+#   kwargs: typical keyword arguments
+#       'power' : float
+#           The power of 'idw'. Defaults to IDW_POWER.
+#       'bandwidth' : float
+#           The bandwidth (in metres) of 'gaussian'.
+# Returns : dict
+#   See aggregate(...). 'mean' is the weighted mean; the median and the percentiles are those of the monitors
+#   within the radius. 'monitors' counts the records within the radius.
+def aggregateWeighted(columns, latitude, longitude, radius, kernel='idw', percentiles=PERCENTILES, **kwargs):
+    _arrays = columns.arrays()
+    _distances = LatLonBatch.haversineDistances(latitude, longitude, _arrays['latitude'], _arrays['longitude'])
+    # nan distances (no coordinates) compare as False
+    _within = _distances <= float(radius)
+    _distances = _distances[_within]
+
+    if callable(kernel):
+        _weights = np.asarray(kernel(_distances, float(radius)), dtype=np.float64)
+    elif kernel == 'uniform':
+        _weights = np.ones(len(_distances))
+    elif kernel == 'idw':
+        _power = float(kwargs.get('power', IDW_POWER))
+        _weights = 1. / np.maximum(_distances, IDW_MIN_DISTANCE)**_power
+    elif kernel == 'gaussian':
+        _bandwidth = float(kwargs.get('bandwidth', float(radius) / 2.))
+        _weights = np.exp(-0.5 * (_distances / _bandwidth)**2)
+    else:
+        raise ValueError(f'invalid kernel {kernel}')
+
+    return _aggregate(columns.parameters, _arrays['code'][_within], _arrays['aqi'][_within], percentiles, weights=_weights)
+    # end of function
+#!
+# aggregates the columns code and aqi (and optionally weights) per parameter; see aggregate(...).
+def _aggregate(parameters, code, aqi, percentiles, weights=None):
+    _n_parameters = len(parameters)
+    if _n_parameters < 1:
+        return dict()
+
+    _monitors = np.bincount(code, minlength=_n_parameters)
+
+    _valid = (aqi >= 0) & np.isfinite(aqi)
+    _code = code[_valid]
+    _aqi = aqi[_valid]
+
+    _count = np.bincount(_code, minlength=_n_parameters)
+    if weights is None:
+        _sum = np.bincount(_code, weights=_aqi, minlength=_n_parameters)
+        _total = _count.astype(np.float64)
+    else:
+        _weights = weights[_valid]
+        _sum = np.bincount(_code, weights=_aqi * _weights, minlength=_n_parameters)
+        _total = np.bincount(_code, weights=_weights, minlength=_n_parameters)
+
+    # values sorted by parameter, then by AQI; each parameter occupies [_start, _start + _count)
+    _order = np.lexsort((_aqi, _code))
+    _sorted = _aqi[_order]
+    _start = np.concatenate(([0], np.cumsum(_count)[:-1]))
+    _has_values = _count > 0
+
+    def _percentile(q):
+        _result = np.full(_n_parameters, np.nan)
+        _position = _start + (q / 100.) * (_count - 1)
+        _low = np.floor(_position).astype(np.int64)
+        _high = np.ceil(_position).astype(np.int64)
+        _fraction = _position - _low
+        _low, _high, _fraction = _low[_has_values], _high[_has_values], _fraction[_has_values]
+        _result[_has_values] = _sorted[_low] + (_sorted[_high] - _sorted[_low]) * _fraction
+        return _result
+
+    _stats = {
+        'mean' : np.divide(_sum, _total, out=np.full(_n_parameters, np.nan), where=_has_values & (_total > 0)),
+        'median' : _percentile(50),
+        'min' : _percentile(0),
+        'max' : _percentile(100),
+        }
+    for q in percentiles:
+        _stats['p{}'.format(q)] = _percentile(q)
+
+    result = dict()
+    for _code_index, _name in enumerate(parameters):
+        result[_name] = {_key : float(_stats[_key][_code_index]) for _key in _stats}
+        result[_name]['count'] = int(_count[_code_index])
+        result[_name]['monitors'] = int(_monitors[_code_index])
+    return result
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -0,0 +1,172 @@
+import datetime
+import numpy as np
+
+NOWCAST_HOURS = 12 # the window requested at once; the longest of NOWCAST_WINDOWS
+NOWCAST_MIN_WEIGHT = 0.5 # the minimum weight factor (PM2.5 and PM10)
+# EPA's NowCast window of each parameter: (hours, the minimum weight factor). Ozone's is shorter, and has no
+#   minimum weight factor, so that it follows the faster changes of ozone.
+NOWCAST_WINDOWS = {
+    'PM2.5' : (NOWCAST_HOURS, NOWCAST_MIN_WEIGHT),
+    'PM10' : (NOWCAST_HOURS, NOWCAST_MIN_WEIGHT),
+    'OZONE' : (8, 0.),
+    }
+NOWCAST_RECENT_HOURS = 3 # of these most recent hours ...
+NOWCAST_RECENT_REQUIRED = 2 # ... at least this many must be valid
+# EPA's breakpoints of each parameter: (concentration low, concentration high, AQI low, AQI high),
+#   in the units AirNow reports raw concentrations in (PM: UG/M3, OZONE: PPB). Concentrations are truncated
+#   to TRUNCATE[parameter] decimals before the interpolation.
+#   Ozone uses the 8-hour scale, on which the hourly NowCast is reported; it is not defined above 200 ppb,
+#   where AirNow switches to the 1-hour scale, which is approximated here by the last row.
+BREAKPOINTS = {
+    'PM2.5' : (
+        (0.0, 9.0, 0, 50), (9.1, 35.4, 51, 100), (35.5, 55.4, 101, 150),
+        (55.5, 125.4, 151, 200), (125.5, 225.4, 201, 300), (225.5, 325.4, 301, 500)),
+    'PM10' : (
+        (0, 54, 0, 50), (55, 154, 51, 100), (155, 254, 101, 150),
+        (255, 354, 151, 200), (355, 424, 201, 300), (425, 604, 301, 500)),
+    'OZONE' : (
+        (0, 54, 0, 50), (55, 70, 51, 100), (71, 85, 101, 150),
+        (86, 105, 151, 200), (106, 200, 201, 300), (201, 604, 301, 500)),
+    }
+TRUNCATE = {'PM2.5' : 1, 'PM10' : 0, 'OZONE' : 0}
+PARAMETERS = tuple(BREAKPOINTS)
+
+#!
+# computes the NowCast of many series at once.
+# Args:
+#   concentrations : numpy.ndarray
+#       The shape is (series, hours); column 0 is the most recent hour. Missing hours are nan (or negative).
+#   min_weight : float
+#       The minimum weight factor (see NOWCAST_WINDOWS).
+#   hours : int or None
+#       The window; only the first hours columns are used. None uses all the columns.
+# Returns : numpy.ndarray
+#   The NowCast of each series, or nan if fewer than NOWCAST_RECENT_REQUIRED of the NOWCAST_RECENT_HOURS
+#   most recent hours are valid.
+#   The weight factor is min / max over the valid hours (at least min_weight), and the NowCast is the mean of
+#   the valid hours weighted by weight factor ** (hours ago).
+def nowCast(concentrations, min_weight=NOWCAST_MIN_WEIGHT, hours=None):
+    _c = np.array(concentrations, dtype=np.float64, ndmin=2)
+    if not (hours is None):
+        _c = _c[:, :int(hours)]
+    _c[~(_c >= 0)] = np.nan
+    _valid = np.isfinite(_c)
+    _has_values = _valid.any(axis=1)
+
+    _filled = np.where(_valid, _c, 0.)
+    _max = np.where(_valid, _c, -np.inf).max(axis=1)
+    _min = np.where(_valid, _c, np.inf).min(axis=1)
+    _ratio = np.divide(_min, _max, out=np.ones(len(_c)), where=_has_values & (_max > 0))
+    _weight = np.clip(_ratio, min_weight, 1.)
+
+    _powers = _weight[:, np.newaxis] ** np.arange(_c.shape[1])[np.newaxis, :] * _valid
+    _total = _powers.sum(axis=1)
+    result = np.divide((_powers * _filled).sum(axis=1), _total, out=np.full(len(_c), np.nan), where=_total > 0)
+
+    _recent = _valid[:, :NOWCAST_RECENT_HOURS].sum(axis=1)
+    result[_recent < min(NOWCAST_RECENT_REQUIRED, _c.shape[1])] = np.nan
+    return result
+    # end of function
+#!
+# converts concentrations of the parameter to AQI by EPA's breakpoint interpolation.
+#   Concentrations above the last breakpoint are extrapolated along the last row.
+# Args:
+#   parameter : str
+#       One of PARAMETERS.
+#   concentrations : array-like
+# Returns : numpy.ndarray
+#   The AQI values (rounded to int, as float); nan where the concentration is nan or negative.
+def concentrationToAqi(parameter, concentrations):
+    _table = np.array(BREAKPOINTS[parameter], dtype=np.float64)
+    _scale = 10. ** TRUNCATE[parameter]
+    _c = np.floor(np.asarray(concentrations, dtype=np.float64) * _scale + 1e-9) / _scale
+
+    # the first row whose high concentration is >= c; above the table, the last row
+    _row = np.minimum(np.searchsorted(_table[:, 1], _c, side='left'), len(_table) - 1)
+    _c_low, _c_high, _i_low, _i_high = _table[_row].T
+    result = np.round((_i_high - _i_low) / (_c_high - _c_low) * (np.maximum(_c, _c_low) - _c_low) + _i_low)
+    result[~(_c >= 0)] = np.nan
+    return result
+    # end of function
+#!
+# returns the datetime of the record's 'UTC' (e.g. '2021-09-29T14:00'), or None.
+def _recordHour(record):
+    try:
+        return datetime.datetime.strptime(str(record['UTC'])[:13], '%Y-%m-%dT%H')
+    except (KeyError, ValueError):
+        return None
+    # end of function
+#!
+# computes the NowCast, and its AQI, per site and parameter from the hourly raw concentrations of a BBOX response
+#   (requested with includerawconcentrations=1 over the NOWCAST_HOURS hours ending at end_hour).
+# Args:
+#   records : list
+#       Each record is a dictionary with 'Parameter', 'UTC', 'RawConcentration', 'Latitude', and 'Longitude'.
+#       Records of other parameters than PARAMETERS, or without a raw concentration, are left out.
+#   end_hour : datetime.datetime
+#       The most recent hour (UTC) of the window.
+#   hours : int
+#       The hours of the records; each parameter's NowCast uses the most recent ones of its NOWCAST_WINDOWS.
+# Returns : dict
+#   {'parameter' : list of str, 'latitude', 'longitude', 'nowcast', 'aqi' : numpy.ndarray},
+#   one entry per (site, parameter); a site is identified by its location. 'nowcast' and 'aqi' are nan
+#   where the NowCast is not valid.
+def nowCastSites(records, end_hour, hours=NOWCAST_HOURS):
+    _series = dict() # (latitude, longitude, parameter) -> row
+    _rows, _columns, _values = list(), list(), list()
+    for _record in records:
+        _parameter = _record.get('Parameter')
+        if not (_parameter in BREAKPOINTS) or (_record.get('RawConcentration') is None):
+            continue
+        _hour = _recordHour(_record)
+        if _hour is None:
+            continue
+        _ago = int((end_hour - _hour).total_seconds()) // 3600
+        if (_ago < 0) or (_ago >= hours):
+            continue
+        _key = (_record.get('Latitude'), _record.get('Longitude'), _parameter)
+        if not (_key in _series):
+            _series[_key] = len(_series)
+        _rows.append(_series[_key])
+        _columns.append(_ago)
+        _values.append(_record['RawConcentration'])
+
+    _keys = list(_series)
+    _concentrations = np.full((len(_keys), hours), np.nan)
+    if len(_rows) > 0:
+        _concentrations[np.array(_rows), np.array(_columns)] = np.array(_values, dtype=np.float64)
+
+    result = {
+        'parameter' : [_key[2] for _key in _keys],
+        'latitude' : np.array([np.nan if (_key[0] is None) else _key[0] for _key in _keys], dtype=np.float64),
+        'longitude' : np.array([np.nan if (_key[1] is None) else _key[1] for _key in _keys], dtype=np.float64),
+        'nowcast' : np.full(len(_keys), np.nan),
+        'aqi' : np.full(len(_keys), np.nan),
+        }
+    _parameters = np.array(result['parameter'], dtype=object)
+    for _parameter in set(result['parameter']):
+        _mask = _parameters == _parameter
+        _window_hours, _min_weight = NOWCAST_WINDOWS[_parameter]
+        result['nowcast'][_mask] = nowCast(_concentrations[_mask], min_weight=_min_weight, hours=_window_hours)
+        result['aqi'][_mask] = concentrationToAqi(_parameter, result['nowcast'][_mask])
+    return result
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
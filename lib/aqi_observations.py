@@ -0,0 +1,193 @@
+import array
+import bisect
+import numpy as np
+from lib.aqi_aggregate import AqiColumns
+
+AQI_NUMBERS = (50, 100, 150, 200, 300, 500)
+AQI_DESCRIPTORS = ('Good', 'Moderate', 'Unhealthy for Sensitive Groups', 'Unhealthy', 'Very Unhealthy', 'Hazardous')
+AQI_CATEGORIES = (1, 2, 3, 4, 5, 6)
+AQI_COLORS_FG = ('#000', '#000', '#ffffff', '#ffffff', '#ffffff', '#ffffff')
+AQI_COLORS_BG = ('#00E400', '#FFFF00', '#FF7E00', '#FF0000', '#8f3f97', '#7E0023')
+AQI_KABOOM = (501, 'Kaboom', 7, '#ffffff', '#000') # any AQI above the last of AQI_NUMBERS
+
+class AqiCategory():
+    __doc__ = """
+    #!
+    # the metadata of one AQI category. There is one object per category (see CATEGORIES), shared by all observations.
+    # Args:
+    #   index : int
+    #       The row of the AQI tables (see categoryIndex(...) of AirQuality); len(AQI_NUMBERS) for 'Kaboom'.
+    #   number : int
+    #       The highest AQI of the category.
+    #   descriptor : str
+    #   category : int
+    #       The category number (1 ... 7).
+    #   fg, bg : str
+    #       The foreground and background colors.
+    """
+    __slots__ = ('index', 'number', 'descriptor', 'category', 'fg', 'bg')
+    def __init__(self, index, number, descriptor, category, fg, bg):
+        self.index = index
+        self.number = number
+        self.descriptor = descriptor
+        self.category = category
+        self.fg = fg
+        self.bg = bg
+        # end of __init__
+    #!
+    def __repr__(self):
+        return f'AqiCategory({self.category}, {self.descriptor!r})'
+    # end of class AqiCategory
+
+# the categories by the row of the AQI tables, 'Kaboom' last
+CATEGORIES = tuple(AqiCategory(_index, *_row) for _index, _row in enumerate(zip(\
+    AQI_NUMBERS + (AQI_KABOOM[0],), AQI_DESCRIPTORS + (AQI_KABOOM[1],), AQI_CATEGORIES + (AQI_KABOOM[2],),\
+    AQI_COLORS_FG + (AQI_KABOOM[3],), AQI_COLORS_BG + (AQI_KABOOM[4],))))
+KABOOM = CATEGORIES[-1]
+
+class Observation():
+    __doc__ = """
+    #!
+    # one AQI value and its category; what getAqiCategory(...) of AirQuality returns, and the values of
+    #   data_current and data_full. It holds the value and a reference to the shared AqiCategory only.
+    #   It still behaves as the tuple (aqi, descriptor, category, fg, bg) it replaces: it can be unpacked,
+    #   indexed, sliced, and compared with such tuples.
+    # Args:
+    #   aqi : int or float
+    #   info : AqiCategory
+    """
+    __slots__ = ('aqi', 'info')
+    def __init__(self, aqi, info):
+        self.aqi = aqi
+        self.info = info
+        # end of __init__
+    #!
+    @property
+    def descriptor(self):
+        return self.info.descriptor
+    #!
+    @property
+    def category(self):
+        return self.info.category
+    #!
+    @property
+    def fg(self):
+        return self.info.fg
+    #!
+    @property
+    def bg(self):
+        return self.info.bg
+    #!
+    # returns the tuple (aqi, descriptor, category, fg, bg).
+    def toTuple(self):
+        return (self.aqi, self.info.descriptor, self.info.category, self.info.fg, self.info.bg)
+        # end of function
+    #!
+    def __len__(self):
+        return 5
+    #!
+    def __iter__(self):
+        return iter(self.toTuple())
+    #!
+    def __getitem__(self, index):
+        return self.toTuple()[index]
+    #!
+    def __eq__(self, other):
+        if isinstance(other, (Observation, tuple)):
+            return self.toTuple() == tuple(other)
+        return NotImplemented
+    #!
+    def __hash__(self):
+        return hash(self.toTuple())
+    #!
+    def __repr__(self):
+        return repr(self.toTuple())
+    # end of class Observation
+
+class ObservationTable(AqiColumns):
+    __doc__ = """
+    #!
+    # the columns of BBOX data (see AqiColumns in the module aqi_aggregate), with the hour of each record ('UTC')
+    #   interned like the parameter names: each record keeps a small integer code; self.hours holds the hours.
+    #   A record takes 34 bytes, instead of a dictionary with its repeated keys; the AQI categories are not
+    #   stored, but derived from the AQI values when needed (see categories(...), and observation(...)).
+    #   It can be aggregated like AqiColumns.
+    """
+    def __init__(self):
+        super().__init__()
+        self.hours = list() # code -> 'UTC' (e.g. '2021-09-29T14:00'), or None
+        self.__hour_codes__ = dict() # 'UTC' -> code
+        self.__hour__ = array.array('q') # int64, so that the number of distinct hours is not limited
+        # end of __init__
+    #!
+    # returns the code of the hour ('UTC' of a record, or None), interning it if needed.
+    def getHourCode(self, hour):
+        if not (hour in self.__hour_codes__):
+            self.__hour_codes__[hour] = len(self.hours)
+            self.hours.append(hour)
+        return self.__hour_codes__[hour]
+        # end of function
+    #!
+    # adds one record; see add(...) of AqiColumns.
+    def add(self, record):
+        super().add(record)
+        self.__hour__.append(self.getHourCode(record.get('UTC')))
+        # end of function
+    #!
+    # adds many records; see extend(...) of AqiColumns.
+    def extend(self, records):
+        super().extend(records)
+        _hours = [_each.get('UTC') for _each in records]
+        _codes = self.__hour_codes__
+        for _hour in set(_hours):
+            self.getHourCode(_hour)
+        self.__hour__.extend(map(_codes.__getitem__, _hours))
+        # end of function
+    #!
+    # returns the columns as NumPy arrays (which share memory with the columns).
+    # Returns : dict
+    #   See arrays(...) of AqiColumns, and 'hour' : int64 array (the codes of self.hours).
+    def arrays(self):
+        result = super().arrays()
+        result['hour'] = np.frombuffer(self.__hour__, dtype=np.int64) if len(self) > 0 else np.zeros(0, dtype=np.int64)
+        return result
+        # end of function
+    #!
+    # returns the row of CATEGORIES of each record, in one searchsorted pass.
+    # Returns : numpy.ndarray
+    #   int8; -1 where the AQI is not valid (AirNow's -999, or nan).
+    def categories(self):
+        _aqi = self.arrays()['aqi']
+        result = np.searchsorted(np.array(AQI_NUMBERS, dtype=np.float64), _aqi, side='left').astype(np.int8)
+        result[~(_aqi >= 0)] = -1
+        return result
+        # end of function
+    #!
+    # returns the record at index as an Observation, or None if its AQI is not valid.
+    def observation(self, index):
+        _aqi = self.__aqi__[index]
+        if not (_aqi >= 0):
+            return None
+        _index = bisect.bisect_left(AQI_NUMBERS, _aqi)
+        return Observation(AQI_KABOOM[0], KABOOM) if (_index >= len(AQI_NUMBERS)) else Observation(_aqi, CATEGORIES[_index])
+        # end of function
+    # end of class ObservationTable
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
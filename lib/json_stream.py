@@ -0,0 +1,94 @@
+import json
+import codecs
+
+_WHITESPACE = ' \t\n\r'
+
+#!
+# parses a JSON array incrementally from a stream of byte chunks, yielding its members one by one
+#   as soon as each of them has been received. Only the not yet parsed part of the stream is kept in memory.
+# Args:
+#   chunks : iterable
+#       The byte chunks of a UTF-8 encoded JSON array, e.g. requests.Response.iter_content(...).
+# Returns : generator
+#   It yields the decoded members of the array.
+#   ValueError is raised if the stream is not a (complete) JSON array.
+def iterJsonArray(chunks):
+    _decoder = json.JSONDecoder()
+    _utf8 = codecs.getincrementaldecoder('utf-8')()
+    _buffer = ''
+    _state = 'start' # 'start' -> 'first' -> ('separator' <-> 'member') -> 'end'
+
+    def _members(is_final):
+        nonlocal _buffer, _state
+        _pos = 0
+        while _state != 'end':
+            while _pos < len(_buffer) and _buffer[_pos] in _WHITESPACE:
+                _pos += 1
+            if _pos >= len(_buffer):
+                break
+
+            _char = _buffer[_pos]
+            if _state == 'start':
+                if _char != '[':
+                    raise ValueError('the stream is not a JSON array')
+                _pos += 1
+                _state = 'first'
+            elif (_state in ('first', 'separator')) and (_char == ']'):
+                _pos += 1
+                _state = 'end'
+            elif _state == 'separator':
+                if _char != ',':
+                    raise ValueError(f'unexpected {_char!r} in the JSON array')
+                _pos += 1
+                _state = 'member'
+            else:
+                try:
+                    _member, _end = _decoder.raw_decode(_buffer, _pos)
+                except json.JSONDecodeError:
+                    if is_final:
+                        raise
+                    break # the member is not complete yet
+                # a number might continue in the next chunk, unless it is followed by ',' or ']'
+                if not is_final and not isinstance(_member, (dict, list, str)):
+                    _next = _end
+                    while _next < len(_buffer) and _buffer[_next] in _WHITESPACE:
+                        _next += 1
+                    if (_next >= len(_buffer)) or not (_buffer[_next] in ',]'):
+                        break
+                _pos = _end
+                _state = 'separator'
+                yield _member
+
+        _buffer = _buffer[_pos:]
+
+    for _chunk in chunks:
+        if not _chunk:
+            continue
+        _buffer += _utf8.decode(_chunk)
+        yield from _members(False)
+
+    _buffer += _utf8.decode(b'', final=True)
+    yield from _members(True)
+
+    if _state != 'end':
+        raise ValueError('the JSON array is not complete')
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -2,6 +2,7 @@
 # by Chris Veness at https://www.movable-type.co.uk/scripts/latlong.html
 
 import math as ma
+import numpy as np
 
 class LatLon():
     def __init__(self, lat, lon, radius=6371e3):
@@ -90,14 +91,19 @@ class Dms():
 
     #!
     # constrains degrees to range 0..360 (e.g. for bearings). Note: -1 => 359, 361 => 1.
+    #   This, and the other wrap functions, also accept arrays (numpy.ndarray, list, tuple), and then return numpy.ndarray.
     # Args:
-    #   degrees : float or int
+    #   degrees : float or int or array
     #       The number of degrees to constrain.
-    # Returns: deg : float
+    # Returns: deg : float or numpy.ndarray
     #       The number of degrees within the range of 0...360.
     @staticmethod
     def wrap360(degrees):
         # wave period: 360, amplitude: 0/360
+        if isinstance(degrees, (np.ndarray, list, tuple)):
+            _modified_degrees = np.fmod(np.asarray(degrees, dtype=np.float64), 360)
+            return np.where(_modified_degrees >= 0, _modified_degrees, _modified_degrees + 360)
+
         _modified_degrees =  ma.fmod(float(degrees), 360)
         if _modified_degrees >=0:
             return _modified_degrees
@@ -115,6 +121,8 @@ class Dms():
     #       The number of degrees within the range of -180..+180.
     @staticmethod
     def wrap180(degrees, **kwargs):
+        if isinstance(degrees, (list, tuple)):
+            degrees = np.asarray(degrees, dtype=np.float64)
         _modified_degrees = Dms.wrap360(degrees + 180) # shift to zero base
         return _modified_degrees - 180 # return back to base = -180
         # end of function (EOFun)
@@ -130,6 +138,8 @@ class Dms():
     @staticmethod
     def wrap90(degrees, **kwargs):
         # wave period: 180, amplitude: -90/+90
+        if isinstance(degrees, (list, tuple)):
+            degrees = np.asarray(degrees, dtype=np.float64)
         _modified_degrees = Dms.wrap180(degrees*2)
         return _modified_degrees/2
         # end of function
@@ -145,6 +155,8 @@ class Dms():
     @staticmethod
     def wrap45(degrees, **kwargs):
         # wave period: 90, amplitude: -45/+45
+        if isinstance(degrees, (list, tuple)):
+            degrees = np.asarray(degrees, dtype=np.float64)
         _modified_degrees = Dms.wrap90(degrees*2)
         return _modified_degrees/2
         # end of function
@@ -159,6 +171,8 @@ class Dms():
     #       The number of degrees within the range of -NM..+Nm.
     @staticmethod
     def wrapNM(degrees, **kwargs):
+        if isinstance(degrees, (list, tuple)):
+            degrees = np.asarray(degrees, dtype=np.float64)
         if ('NM' in kwargs) and (type(kwargs['NM']) == type(0.0) or type(kwargs['NM']) == type(0)):
             _coeff = 180./float(kwargs['NM'])
             _modified_degrees = Dms.wrap180(degrees*_coeff)
@@ -172,6 +186,136 @@ class Dms():
         # end of function
     # end of class
 
+
+class LatLonBatch():
+    __doc__ = """
+    #!
+    # batch (vectorized) counterparts of the LatLon methods. They work on arrays of points at once,
+    #   without a Python loop or a LatLon object per point. Arguments may be numbers or arrays
+    #   (numpy.ndarray, list, tuple), and are broadcast against each other as in NumPy.
+    #   Latitudes and longitudes are in degrees; distances are in the same units as radius (default: metres).
+    """
+    EARTH_RADIUS = 6371e3
+    BOX_BEARINGS = (0., 90., 180., 270.) # the bearings used by areaLatLonBox(...)
+
+    #!
+    # returns the destination points having travelled the given distances on the given initial bearings.
+    #   See LatLon.destinationPoint(...).
+    # Args:
+    #   lats, lons : array
+    #       The start points.
+    #   distances : array
+    #   bearings : array
+    #       Initial bearings in degrees from north.
+    #   radius : float
+    # Returns : tuple (lats : numpy.ndarray, lons : numpy.ndarray)
+    #   Latitudes are within -90..+90, longitudes within -180..+180.
+    #
+    # Example
+    # LatLonBatch.destinationPoints([51.47788], [-0.00147], 7794, 300.7)
+    #   Note: result should be (array([51.5136]), array([-0.0983]))
+    @staticmethod
+    def destinationPoints(lats, lons, distances, bearings, radius=EARTH_RADIUS):
+        δ = np.asarray(distances, dtype=np.float64) / radius # angular distances in radians
+        θ = np.radians(np.asarray(bearings, dtype=np.float64))
+        φ1 = np.radians(Dms.wrap90(np.asarray(lats, dtype=np.float64)))
+        λ1 = np.radians(Dms.wrap180(np.asarray(lons, dtype=np.float64)))
+
+        sinφ1, cosφ1 = np.sin(φ1), np.cos(φ1)
+        sinδ, cosδ = np.sin(δ), np.cos(δ)
+
+        sinφ2 = sinφ1 * cosδ + cosφ1 * sinδ * np.cos(θ)
+        φ2 = np.arcsin(np.clip(sinφ2, -1., 1.))
+        y = np.sin(θ) * sinδ * cosφ1
+        x = cosδ - sinφ1 * sinφ2
+        λ2 = λ1 + np.arctan2(y, x)
+
+        return (Dms.wrap90(np.degrees(φ2)), Dms.wrap180(np.degrees(λ2)))
+        # end of function
+    #!
+    # returns the bounding boxes around the points. See LatLon.areaLatLonBox(...).
+    # Args:
+    #   lats, lons : array
+    #   distances : array
+    #   radius : float
+    #   kwargs: typical keyword arguments
+    #       'BBOX' : <any value>
+    #           If set, the boxes are returned as a list of str formatted as lon_min,lat_min,lon_max,lat_max
+    # Returns : dict or list
+    #   {'lats': (mins : numpy.ndarray, maxs : numpy.ndarray), 'lons': (mins : numpy.ndarray, maxs : numpy.ndarray)}
+    @staticmethod
+    def areaLatLonBoxes(lats, lons, distances, radius=EARTH_RADIUS, **kwargs):
+        _lats, _lons, _distances = np.broadcast_arrays(\
+            np.asarray(lats, dtype=np.float64), np.asarray(lons, dtype=np.float64), np.asarray(distances, dtype=np.float64))
+        _bearings = np.asarray(LatLonBatch.BOX_BEARINGS)
+        # one column per bearing
+        _box_lats, _box_lons = LatLonBatch.destinationPoints(\
+            _lats[..., None], _lons[..., None], _distances[..., None], _bearings, radius=radius)
+
+        lats = (_box_lats.min(axis=-1), _box_lats.max(axis=-1))
+        lons = (_box_lons.min(axis=-1), _box_lons.max(axis=-1))
+
+        if 'BBOX' in kwargs:
+            return ['{},{},{},{}'.format(_lon_min, _lat_min, _lon_max, _lat_max) for _lon_min, _lat_min, _lon_max, _lat_max in\
+                zip(lons[0].ravel().tolist(), lats[0].ravel().tolist(), lons[1].ravel().tolist(), lats[1].ravel().tolist())]
+        else:
+            return {'lats': lats, 'lons': lons}
+        # end of function
+    #!
+    # returns the great-circle (haversine) distances between the points 1 and the points 2, element by element.
+    # Args:
+    #   lats1, lons1 : array
+    #   lats2, lons2 : array
+    #   radius : float
+    # Returns : distances : numpy.ndarray
+    @staticmethod
+    def haversineDistances(lats1, lons1, lats2, lons2, radius=EARTH_RADIUS):
+        φ1 = np.radians(np.asarray(lats1, dtype=np.float64))
+        φ2 = np.radians(np.asarray(lats2, dtype=np.float64))
+        Δφ = φ2 - φ1
+        Δλ = np.radians(np.asarray(lons2, dtype=np.float64) - np.asarray(lons1, dtype=np.float64))
+
+        a = np.sin(Δφ / 2.)**2 + np.cos(φ1) * np.cos(φ2) * np.sin(Δλ / 2.)**2
+        return 2. * radius * np.arcsin(np.sqrt(np.clip(a, 0., 1.)))
+        # end of function
+    #!
+    # returns the matrix of great-circle distances, with rows for the points 1, and columns for the points 2.
+    # Args:
+    #   lats1, lons1 : array of n points
+    #   lats2, lons2 : array of m points
+    #   radius : float
+    # Returns : distances : numpy.ndarray of shape (n, m)
+    @staticmethod
+    def haversineMatrix(lats1, lons1, lats2, lons2, radius=EARTH_RADIUS):
+        return LatLonBatch.haversineDistances(\
+            np.ravel(lats1)[:, None], np.ravel(lons1)[:, None], np.ravel(lats2)[None, :], np.ravel(lons2)[None, :], radius=radius)
+        # end of function
+    #!
+    # returns the initial bearings (in degrees from north, 0..360) from the points 1 to the points 2, element by element.
+    # Args:
+    #   lats1, lons1 : array
+    #   lats2, lons2 : array
+    # Returns : bearings : numpy.ndarray
+    @staticmethod
+    def initialBearings(lats1, lons1, lats2, lons2):
+        # tanθ = sinΔλ⋅cosφ2 / cosφ1⋅sinφ2 − sinφ1⋅cosφ2⋅cosΔλ
+        φ1 = np.radians(np.asarray(lats1, dtype=np.float64))
+        φ2 = np.radians(np.asarray(lats2, dtype=np.float64))
+        Δλ = np.radians(np.asarray(lons2, dtype=np.float64) - np.asarray(lons1, dtype=np.float64))
+
+        y = np.sin(Δλ) * np.cos(φ2)
+        x = np.cos(φ1) * np.sin(φ2) - np.sin(φ1) * np.cos(φ2) * np.cos(Δλ)
+        return Dms.wrap360(np.degrees(np.arctan2(y, x)))
+        # end of function
+    #!
+    # returns the matrix of initial bearings, with rows for the points 1, and columns for the points 2.
+    @staticmethod
+    def bearingMatrix(lats1, lons1, lats2, lons2):
+        return LatLonBatch.initialBearings(\
+            np.ravel(lats1)[:, None], np.ravel(lons1)[:, None], np.ravel(lats2)[None, :], np.ravel(lons2)[None, :])
+        # end of function
+    # end of class
+
 # screen centering
 #:-)
 #:-)
@@ -1,7 +1,15 @@
 import os
+import time
+import queue
+import random
+import threading
 import tkinter as tk
+import lib.air_now_clock as ANCL
 
 DEBUG = False#True
+REFRESH_JITTER = 180 # seconds; a random delay of up to this is added to each refresh
+REFRESH_BACKOFF = 300 # seconds; the first retry after the observation hour has not advanced
+REFRESH_MAX_BACKOFF = 3600 # seconds
 
 #!
 # this is a wrapper for os.path.isfile(...)
@@ -71,3 +79,272 @@ class ApiKeyChange():
                 pass
         # end of function
     # end of class ApiKeyChange
+
+class FetchWorker():
+    __doc__ = """
+    #!
+    # runs blocking fetches (e.g. fnc_renewAirData(...)) on a background thread, and hands their results
+    #   back to the Tk main thread by polling a queue via tk_window.after(...).
+    #   Each submit(...) starts a new generation; results of older generations are dropped (stale),
+    #   and any older fetch that has not started yet is cancelled.
+    # Args:
+    #   tk_window : tkinter window created via the tk.Tk(...) method.
+    #   poll_ms : int
+    #       The interval (in milliseconds) at which the result queue is polled while a fetch is in flight.
+    #   max_workers : int
+    #       The number of background threads. A stale fetch that is already running cannot be interrupted,
+    #       so more than one thread lets a new fetch start without waiting for it.
+    #       The threads are daemon threads, so a fetch still running when the window is closed is abandoned
+    #       (see shutdown(...)) instead of keeping the process alive until its requests time out.
+    """
+    def __init__(self, tk_window, poll_ms=100, max_workers=2):
+        self.tk_window = tk_window
+        self.poll_ms = int(poll_ms)
+        self.IS_CLOSED = False
+
+        self.__tasks__ = queue.Queue() # (generation, fetch, args, on_done, on_error), or None to stop a thread
+        self.__results__ = queue.Queue()
+        self.__lock__ = threading.Lock()
+        self.__generation__ = 0
+        self.__pending__ = None # the generation of the current fetch, until its result is delivered
+        self.__running__ = 0 # the fetches running on the threads, current or stale
+        self.__after_id__ = None
+        self.__threads__ = [threading.Thread(target=self.__work__, name=f'shch_air_now_fetch_{_index}', daemon=True)\
+            for _index in range(max(1, int(max_workers)))]
+        for _thread in self.__threads__:
+            _thread.start()
+        # end of __init__
+    #!
+    # submits a new fetch. Any previous fetch becomes stale: if it is still queued it is skipped,
+    #   otherwise its result is dropped when it arrives.
+    # Args:
+    #   fetch : callable
+    #       The blocking function to run on a background thread.
+    #   args : tuple
+    #       The positional arguments for fetch(...).
+    #   on_done : callable
+    #       It is called on the Tk main thread as on_done(result) with the value returned by fetch(...).
+    #   on_error : callable or None
+    #       It is called on the Tk main thread as on_error(exception) if fetch(...) raises.
+    # Returns : generation : int
+    #   The number identifying this fetch.
+    def submit(self, fetch, args=(), on_done=None, on_error=None):
+        if self.IS_CLOSED:
+            return None
+
+        with self.__lock__:
+            self.__generation__ += 1
+            _generation = self.__generation__
+            self.__pending__ = _generation
+        self.__tasks__.put((_generation, fetch, args, on_done, on_error))
+
+        if self.__after_id__ is None:
+            self.__after_id__ = self.tk_window.after(self.poll_ms, self.__poll__)
+
+        return _generation
+        # end of function
+    #!
+    # cancels the current fetch. Its result (if any) will be dropped.
+    # Args: none.
+    # Returns: nothing.
+    def cancel(self):
+        with self.__lock__:
+            self.__generation__ += 1
+            self.__pending__ = None
+        # end of function
+    #!
+    # returns True if there is a current (not stale) fetch whose result has not been delivered yet.
+    def isFetching(self):
+        with self.__lock__:
+            return not (self.__pending__ is None)
+        # end of function
+    #!
+    # returns True if any fetch (current or stale) is still running on a background thread.
+    def isRunning(self):
+        with self.__lock__:
+            return self.__running__ > 0
+        # end of function
+    #!
+    # stops polling and stops the background threads without waiting for running fetches: those are abandoned
+    #   (the threads are daemon threads), and their results are dropped.
+    # Args: none.
+    # Returns: nothing.
+    def shutdown(self):
+        self.cancel()
+        self.IS_CLOSED = True
+        if not (self.__after_id__ is None):
+            try:
+                self.tk_window.after_cancel(self.__after_id__)
+            except:
+                pass
+            self.__after_id__ = None
+        for _thread in self.__threads__:
+            self.__tasks__.put(None)
+        # end of function
+    #!
+    # runs on each background thread: runs the queued fetches, skipping those that have become stale meanwhile.
+    def __work__(self):
+        while True:
+            _task = self.__tasks__.get()
+            if (_task is None) or self.IS_CLOSED:
+                return
+            _generation, _fetch, _args, _on_done, _on_error = _task
+            with self.__lock__:
+                if _generation != self.__generation__:
+                    if DEBUG:
+                        print(f'skipping stale fetch {_generation}')
+                    continue
+                self.__running__ += 1
+            try:
+                self.__run__(_generation, _fetch, _args, _on_done, _on_error)
+            finally:
+                with self.__lock__:
+                    self.__running__ -= 1
+        # end of function
+    #!
+    # runs a fetch on a background thread.
+    def __run__(self, generation, fetch, args, on_done, on_error):
+        try:
+            _result = fetch(*args)
+            self.__results__.put((generation, on_done, _result))
+        except Exception as e:
+            if DEBUG:
+                print(f'fetch failed: {e}')
+            self.__results__.put((generation, on_error, e))
+        # end of function
+    #!
+    # runs on the Tk main thread; delivers the current generation's result, drops stale ones.
+    def __poll__(self):
+        self.__after_id__ = None
+        if self.IS_CLOSED:
+            return
+
+        while True:
+            try:
+                _generation, _callback, _value = self.__results__.get_nowait()
+            except queue.Empty:
+                break
+
+            with self.__lock__:
+                _is_current = (_generation == self.__generation__)
+                if _is_current:
+                    self.__pending__ = None
+
+            if not _is_current:
+                if DEBUG:
+                    print(f'dropping stale fetch {_generation}')
+                continue
+
+            if not (_callback is None):
+                _callback(_value)
+
+        if self.isFetching():
+            self.__after_id__ = self.tk_window.after(self.poll_ms, self.__poll__)
+        # end of function
+    # end of class FetchWorker
+
+class RefreshScheduler():
+    __doc__ = """
+    #!
+    # schedules automatic refreshes (via tk_window.after(...)) aligned with the expected publication of
+    #   AirNow's hourly observations (see nextPublicationTime(...) in the module air_now_clock).
+    #   After each fetch, notify(...) is to be called with the fetched data_time:
+    #   - if data_time has advanced, the next refresh is at the next expected publication time;
+    #   - if it has not (or the fetch failed), the refresh is retried with an exponential backoff.
+    #   A random jitter is added to every delay, so that many desktops do not hit the API at the same second.
+    #   When a refresh falls due, but nothing has been published since the last fetch (e.g. OKAY was pressed
+    #   in the meantime), the fetch is skipped, and the refresh is rescheduled.
+    # Args:
+    #   tk_window : tkinter window created via the tk.Tk(...) method.
+    #   refresh : callable
+    #       It is called as refresh() on the Tk main thread to start a fetch (e.g. fnc_renew(...)).
+    #   jitter : int or float
+    #       The maximum random delay (in seconds) added to each refresh.
+    #   backoff : int or float
+    #       The first retry delay (in seconds); it doubles with each retry up to max_backoff.
+    #   max_backoff : int or float
+    """
+    def __init__(self, tk_window, refresh, jitter=REFRESH_JITTER, backoff=REFRESH_BACKOFF, max_backoff=REFRESH_MAX_BACKOFF):
+        self.tk_window = tk_window
+        self.refresh = refresh
+        self.jitter = float(jitter)
+        self.backoff = float(backoff)
+        self.max_backoff = float(max_backoff)
+        self.IS_STOPPED = False
+
+        self.last_data_time = None
+        self.last_fetch_time = None
+        self.next_refresh_time = None
+        self.__misses__ = 0
+        self.__after_id__ = None
+        # end of __init__
+    #!
+    # schedules the next refresh after a fetch has completed.
+    # Args:
+    #   data_time : str or None
+    #       The fetched data_time (see AirQuality), or None if the fetch failed.
+    #   now : float or None
+    #       The current time in seconds since the epoch. Defaults to time.time().
+    # Returns: delay : float
+    #   The number of seconds until the next refresh.
+    def notify(self, data_time, now=None):
+        if now is None:
+            now = time.time()
+
+        if not (data_time is None) and (data_time != self.last_data_time):
+            self.__misses__ = 0
+            self.last_data_time = data_time
+            _delay = ANCL.nextPublicationTime(now) - now
+        else:
+            self.__misses__ += 1
+            _delay = min(self.backoff * 2**(self.__misses__ - 1), self.max_backoff)
+
+        self.last_fetch_time = now
+        return self.__schedule__(_delay + random.uniform(0., self.jitter), now)
+        # end of function
+    #!
+    # stops the scheduler.
+    # Args: none.
+    # Returns: nothing.
+    def stop(self):
+        self.IS_STOPPED = True
+        if not (self.__after_id__ is None):
+            try:
+                self.tk_window.after_cancel(self.__after_id__)
+            except:
+                pass
+            self.__after_id__ = None
+        # end of function
+    #!
+    def __schedule__(self, delay, now):
+        if self.IS_STOPPED:
+            return None
+
+        if not (self.__after_id__ is None):
+            try:
+                self.tk_window.after_cancel(self.__after_id__)
+            except:
+                pass
+        self.next_refresh_time = now + delay
+        self.__after_id__ = self.tk_window.after(max(1000, int(delay * 1000)), self.__fire__)
+        if DEBUG:
+            print(f'next refresh in {int(delay)} s')
+        return delay
+        # end of function
+    #!
+    # runs on the Tk main thread when a refresh falls due.
+    def __fire__(self):
+        self.__after_id__ = None
+        if self.IS_STOPPED:
+            return
+
+        _now = time.time()
+        # nothing new is expected since the last fetch: the result on screen is still current
+        if (self.__misses__ == 0) and not (self.last_fetch_time is None) and\
+                (ANCL.nextPublicationTime(self.last_fetch_time) > _now):
+            self.__schedule__(ANCL.nextPublicationTime(_now) - _now + random.uniform(0., self.jitter), _now)
+            return
+
+        self.refresh()
+        # end of function
+    # end of class RefreshScheduler
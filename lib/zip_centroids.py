@@ -0,0 +1,286 @@
+import os
+import csv
+import mmap
+import struct
+import threading
+import contextlib
+import numpy as np
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+    import msvcrt
+
+INDEX_FILE = 'zip_centroids.bin'
+# source files (see buildIndex(...)) that configureIndex(...) builds the index from, if they are in its folder
+SOURCE_FILES = ('2020_Gaz_zcta_national.txt', 'zip_centroids.csv')
+INDEX_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shch_air_now_cfg')
+INDEX_MAGIC = b'SHZC'
+INDEX_VERSION = 1
+HEADER_SIZE = 8 # magic (4 bytes), version (uint32)
+RECORD_FORMAT = '<ff' # latitude, longitude as little-endian float32; nan for unknown zip codes
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+ZIP_CODES = 100000 # 00000...99999
+
+_INDEX = None
+_INDEX_LOADED = False
+_INDEX_LOCK = threading.Lock()
+
+class ZipCentroids():
+    __doc__ = """
+    #!
+    # an offline, memory-mapped index of zip code centroids.
+    #   The file holds one fixed-size record per 5-digit zip code (00000...99999), so a lookup is a single
+    #   read at the offset HEADER_SIZE + zip * RECORD_SIZE. The file is built by buildIndex(...)
+    #   (see also shch_air_now_misc/shch_air_now_zip_index.py), or created empty by createIndex(...);
+    #   the locations of zip codes missing from it are learned from AirNow's responses (see learn(...)).
+    # Args:
+    #   index_path : str
+    #       The path to the index file. ValueError is raised if it is not a valid index file.
+    #       If the file cannot be written, the index is read-only.
+    """
+    def __init__(self, index_path):
+        self.index_path = index_path
+        try:
+            with open(index_path, 'r+b') as _file:
+                self.__mmap__ = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_WRITE)
+            self.writable = True
+        except PermissionError:
+            with open(index_path, 'rb') as _file:
+                self.__mmap__ = mmap.mmap(_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.writable = False
+
+        if (len(self.__mmap__) != HEADER_SIZE + ZIP_CODES * RECORD_SIZE) or\
+                (self.__mmap__[:4] != INDEX_MAGIC) or\
+                (struct.unpack_from('<I', self.__mmap__, 4)[0] != INDEX_VERSION):
+            self.__mmap__.close()
+            raise ValueError(f'invalid zip code index {index_path}')
+
+        self.__lock__ = threading.Lock()
+        # the same memory, viewed as an array of shape (ZIP_CODES, 2)
+        self.__array__ = np.frombuffer(self.__mmap__, dtype='<f4', offset=HEADER_SIZE).reshape(ZIP_CODES, 2)
+        # end of __init__
+    #!
+    # returns the centroid of the zip code.
+    # Args:
+    #   zip_code : str or int
+    #       5-digit zip code, e.g. '20500'. A ZIP+4 code ('20500-0003') is accepted too.
+    # Returns : tuple (latitude : float, longitude : float) or None
+    #   None is returned if the zip code is invalid, or not in the index.
+    def lookup(self, zip_code):
+        _index = ZipCentroids.zipToIndex(zip_code)
+        if _index is None:
+            return None
+
+        _lat, _lon = struct.unpack_from(RECORD_FORMAT, self.__mmap__, HEADER_SIZE + _index * RECORD_SIZE)
+        if _lat != _lat or _lon != _lon: # nan
+            return None
+        return (_lat, _lon)
+        # end of function
+    #!
+    # returns the centroids of many zip codes at once.
+    # Args:
+    #   zip_codes : iterable of str or int
+    # Returns : tuple (latitudes : numpy.ndarray, longitudes : numpy.ndarray)
+    #   Invalid or unknown zip codes get nan.
+    def lookupMany(self, zip_codes):
+        _indices = [ZipCentroids.zipToIndex(_each) for _each in zip_codes]
+        _valid = np.array([not (_each is None) for _each in _indices], dtype=bool)
+        _rows = np.array([0 if (_each is None) else _each for _each in _indices], dtype=np.int64)
+
+        _centroids = self.__array__[_rows].astype(np.float64)
+        _centroids[~_valid] = np.nan
+        return (_centroids[:, 0], _centroids[:, 1])
+        # end of function
+    #!
+    # adds the location of a zip code missing from the index, e.g. the location of its reporting area
+    #   in the current data of AirNow (see getCurrentData(...) of AirQuality). Known zip codes are not changed.
+    # Args:
+    #   zip_code : str or int
+    #   latitude, longitude : float
+    # Returns : bool
+    #   True if the location has been added.
+    def learn(self, zip_code, latitude, longitude):
+        _index = ZipCentroids.zipToIndex(zip_code)
+        if (_index is None) or not self.writable or not (self.lookup(zip_code) is None):
+            return False
+        with self.__locked__():
+            if not (self.lookup(zip_code) is None): # learned meanwhile
+                return False
+            try:
+                struct.pack_into(RECORD_FORMAT, self.__mmap__, HEADER_SIZE + _index * RECORD_SIZE, float(latitude), float(longitude))
+            except (TypeError, ValueError):
+                return False
+        return True
+        # end of function
+    #!
+    # locks the index for writing (a context manager), for the threads of this process, and for the other processes
+    #   (by an exclusive lock of index_path + '.lock').
+    @contextlib.contextmanager
+    def __locked__(self):
+        with self.__lock__:
+            with open(self.index_path + '.lock', 'a+') as _file:
+                if fcntl is None:
+                    _file.seek(0)
+                    msvcrt.locking(_file.fileno(), msvcrt.LK_LOCK, 1)
+                else:
+                    fcntl.flock(_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is None:
+                        _file.seek(0)
+                        msvcrt.locking(_file.fileno(), msvcrt.LK_UNLCK, 1)
+                    else:
+                        fcntl.flock(_file.fileno(), fcntl.LOCK_UN)
+        # end of function
+    #!
+    # returns the row of the zip code in the index, or None if the zip code is invalid.
+    @staticmethod
+    def zipToIndex(zip_code):
+        if isinstance(zip_code, int):
+            zip_code = str(zip_code).zfill(5)
+        _zip_code = str(zip_code).strip().split('-')[0]
+        if (len(_zip_code) != 5) or not _zip_code.isdigit():
+            return None
+        return int(_zip_code)
+        # end of function
+    # end of class ZipCentroids
+
+#!
+# builds the index file from a text file with zip codes and their centroids.
+#   The source is either the Census Bureau's ZCTA gazetteer file (tab-separated, with the columns
+#   GEOID, INTPTLAT and INTPTLONG), or a CSV file with the columns zip, latitude, longitude (in any order).
+# Args:
+#   source_path : str
+#   index_path : str
+# Returns : count : int
+#   The number of zip codes written to the index.
+def buildIndex(source_path, index_path):
+    _centroids = np.full((ZIP_CODES, 2), np.nan, dtype='<f4')
+
+    with open(source_path, 'r', newline='', encoding='utf-8-sig') as _file:
+        _sample = _file.readline()
+        _file.seek(0)
+        _reader = csv.reader(_file, delimiter='\t' if ('\t' in _sample) else ',')
+        _header = [_each.strip().lower() for _each in next(_reader)]
+
+        def _column(names):
+            for _name in names:
+                if _name in _header:
+                    return _header.index(_name)
+            raise ValueError(f'none of the columns {names} is in {source_path}')
+
+        _zip_column = _column(('geoid', 'zcta5', 'zip', 'zip_code', 'zipcode'))
+        _lat_column = _column(('intptlat', 'latitude', 'lat'))
+        _lon_column = _column(('intptlong', 'longitude', 'lon', 'lng'))
+
+        count = 0
+        for _row in _reader:
+            if len(_row) <= max(_zip_column, _lat_column, _lon_column):
+                continue
+            _index = ZipCentroids.zipToIndex(_row[_zip_column].zfill(5))
+            if _index is None:
+                continue
+            try:
+                _centroids[_index] = (float(_row[_lat_column]), float(_row[_lon_column]))
+                count += 1
+            except ValueError:
+                continue
+
+    writeIndex(_centroids, index_path)
+    return count
+    # end of function
+#!
+# creates an index file without zip codes (see learn(...) of ZipCentroids).
+# Args:
+#   index_path : str
+# Returns: nothing.
+def createIndex(index_path):
+    writeIndex(np.full((ZIP_CODES, 2), np.nan, dtype='<f4'), index_path)
+    # end of function
+#!
+# writes the index file (atomically).
+# Args:
+#   centroids : numpy.ndarray
+#       float32 of shape (ZIP_CODES, 2).
+#   index_path : str
+# Returns: nothing.
+def writeIndex(centroids, index_path):
+    _tmp_path = index_path + '.tmp'
+    with open(_tmp_path, 'wb') as _file:
+        _file.write(INDEX_MAGIC + struct.pack('<I', INDEX_VERSION))
+        _file.write(centroids.astype('<f4').tobytes())
+    os.replace(_tmp_path, index_path)
+    # end of function
+#!
+# returns the index loaded from index_path, or None if it cannot be loaded. If there is no index file yet
+#   and create is True, it is built from the first of SOURCE_FILES found in its folder, or else created empty
+#   (and filled by learn(...) of ZipCentroids).
+# Args:
+#   index_path : str
+#   create : bool
+# Returns: index : ZipCentroids or None
+def loadIndex(index_path, create=False):
+    try:
+        if create and not os.path.isfile(index_path):
+            _folder_path = os.path.dirname(index_path)
+            _sources = [os.path.join(_folder_path, _each) for _each in SOURCE_FILES]
+            _sources = [_each for _each in _sources if os.path.isfile(_each)]
+            if len(_sources) > 0:
+                buildIndex(_sources[0], index_path)
+            else:
+                createIndex(index_path)
+        return ZipCentroids(index_path)
+    except (OSError, ValueError):
+        return None
+    # end of function
+#!
+# returns the shared index: the one set by configureIndex(...), or else the one loaded from INDEX_FOLDER/INDEX_FILE
+#   if that file exists (it is not created here; see shch_air_now_misc/shch_air_now_zip_index.py), or None.
+#   The file is mapped on the first call only.
+# Args: none.
+# Returns: index : ZipCentroids or None
+def getIndex():
+    global _INDEX, _INDEX_LOADED
+
+    with _INDEX_LOCK:
+        if not _INDEX_LOADED:
+            _INDEX_LOADED = True
+            _INDEX = loadIndex(os.path.join(INDEX_FOLDER, INDEX_FILE))
+        return _INDEX
+    # end of function
+#!
+# (re)configures the shared index. The index file is built or created if it does not exist (see loadIndex(...)).
+# Args:
+#   index_path : str
+#       Example : configureIndex(os.path.join(HOME_DIR, 'shch_air_now_cfg', INDEX_FILE))
+# Returns: index : ZipCentroids or None
+def configureIndex(index_path):
+    global _INDEX, _INDEX_LOADED
+
+    _new_index = loadIndex(index_path, create=True)
+    with _INDEX_LOCK:
+        _INDEX = _new_index
+        _INDEX_LOADED = True
+    return _new_index
+    # end of function
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
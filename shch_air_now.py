@@ -1,27 +1,47 @@
-import lib.air_quality as AQI
+# the data stack (lib.air_quality, and through it requests and numpy) is imported on the first fetch,
+#   on the background thread, so that the window is painted without waiting for it (see fnc_loadData(...))
 from lib.shch_air_now_lib import ApiKeyChange as AKC
+from lib.shch_air_now_lib import FetchWorker
+from lib.shch_air_now_lib import RefreshScheduler
 
 import getpass
 import os
 import json
-from PIL import ImageTk as pil_image_tk
-from PIL import Image as pil_image
+import threading
 import tkinter as tk
+from tkinter import font as tk_font
 from tkinter import messagebox as tk_messagebox
 
 DEBUG = False
 GET_AIR_DATA = True
 AIR_DATA_TIMEOUT = 60
+NOWCAST = False # averages the NowCast computed locally, instead of the latest hour (see the module aqi_nowcast)
 HOME_DIR = None
 CONFIG_FOLDER = 'shch_air_now_cfg'
+CACHE_FOLDER = 'cache' # inside CONFIG_FOLDER
+DATA_LOCK = threading.Lock()
+DATA_LOADED = False # see fnc_loadData(...)
 ICO_FILE = None
 CURRENT_USER = None
 API_KEY = None
 ZIP_CODE = None
 DISTANCE_FROM = None
 HAS_AREA_CHANGED = False
+AIR_DATA = None
+SNAPSHOT_SUFFIX = '.air_data.json' # the last good AIR_DATA, next to the config file (see fnc_saveSnapshot(...))
+FETCH_WORKER = None
+FETCH_POLL_MS = 100
+AUTO_REFRESH = True # refreshes when AirNow's next hourly observation is expected, see RefreshScheduler
+REFRESH_SCHEDULER = None
 WIDGET_FONT_SIZES = (6, 8, 10, 12, 14, 16, 18, 22, 24, 28, 32, 36) # predefined scales for buttons, and labels
 WIDGET_FONT_SIZE_INDEX = 7
+FONTS = None # shared tk_font.Font objects, see fnc_fonts(...)
+FONT_SPECS = {\
+    'label' : ('Times', 'segundo'),\
+    'label_small' : ('Times', 'tercero'),\
+    'entry' : ('TkTextFont', 'primero'),\
+    'button' : ('Arial', 'segundo'),\
+    'menu' : ('TkTextFont', 'tercero')}
 
 #!
 # returns the font size
@@ -69,6 +89,25 @@ def fnc_font(**kwargs):
 
     return int(_coeff* WIDGET_FONT_SIZES[WIDGET_FONT_SIZE_INDEX])
 #!
+# creates the shared fonts (FONTS : dict), or, if they exist, reconfigures their sizes after
+#   WIDGET_FONT_SIZE_INDEX has changed. All widgets refer to these fonts, so resizing them resizes
+#   every widget at once, without rebuilding anything.
+# Args: none.
+# Returns: nothing.
+def fnc_fonts():
+    global FONTS, FONT_SPECS
+
+    if FONTS is None:
+        FONTS = dict()
+        for _name in FONT_SPECS:
+            _family, _size = FONT_SPECS[_name]
+            FONTS[_name] = tk_font.Font(family=_family, size=fnc_font(**{_size : 1}))
+    else:
+        for _name in FONT_SPECS:
+            _family, _size = FONT_SPECS[_name]
+            FONTS[_name].configure(size=fnc_font(**{_size : 1}))
+    # end of function
+#!
 # changes button sizes on the display.
 # Args:
 #   tk_window : tkinter window created via the tk.Tk(...) method.
@@ -77,78 +116,84 @@ def fnc_font(**kwargs):
 #       If the new index is < 0, it is set to 0. If the new index is larger than the last
 #       index of self.WIDGET_FONT_SIZES, it is set to the last index of self.WIDGET_FONT_SIZES
 # Returns: nothing.
-def fnc_regDisplay(tk_window, index_increment, **kwargs):
-    global AIR_DATA, HAS_AREA_CHANGED
+def fnc_regDisplay(tk_window, index_increment):
+    global HAS_AREA_CHANGED
     global WIDGET_FONT_SIZE_INDEX
     WIDGET_FONT_SIZE_INDEX += index_increment
     # the index above is normalized in fnc_font(...)
 
-    api_key, zip_code, distance_from = fnc_paintStart(tk_window, paint_again=1, menu = kwargs['menu'])
+    fnc_fonts()
+    fnc_checkArea()
     if HAS_AREA_CHANGED:
-        AIR_DATA = fnc_renewAirData(api_key, zip_code, distance_from)
         HAS_AREA_CHANGED = False
+        fnc_renew(tk_window)
+    # end of function
+#!
+# checks if the area (zip code, or distance) in the entry boxes differs from ZIP_CODE and DISTANCE_FROM.
+#   It sets HAS_AREA_CHANGED, and stores the new area in ZIP_CODE and DISTANCE_FROM.
+# Args: none.
+# Returns: nothing.
+def fnc_checkArea():
+    global ZIP_CODE, DISTANCE_FROM, HAS_AREA_CHANGED, ENTRY_COMPONENTS
 
-    fnc_paint(tk_window, AIR_DATA)
+    _zip_code = ENTRY_COMPONENTS['tk_entry_zip_code'].get()
+    HAS_AREA_CHANGED = (_zip_code != ZIP_CODE)
+    ZIP_CODE = _zip_code
+    try:
+        _distance_from = int(ENTRY_COMPONENTS['tk_entry_distance_from'].get())
+    except ValueError:
+        return
+    HAS_AREA_CHANGED = HAS_AREA_CHANGED or (_distance_from != DISTANCE_FROM)
+    DISTANCE_FROM = _distance_from
     # end of function
 
 #!
 # starts to paint. It creates frames, and fills the top frame with labels, entry boxes, and buttons.
-#   It also creates three global variables:
-#   IS_CLOSING : bool, FRAMES : dict, and RENEWABLE_COMPONENTS : dict.
+#   It also creates the global variables:
+#   IS_CLOSING : bool, MENUS : dict, FRAMES : dict, RENEWABLE_COMPONENTS : dict, ENTRY_COMPONENTS : dict,
+#   and FONTS : dict (see fnc_fonts(...)).
+#   The widgets are created once; later changes (data, font sizes) update them in place.
 # Args:
 #   tk_window : tkinter window created via the tk.Tk(...) method.
-#   kwargs: usual keyword args.
-#       'paint_again' :  <any value>
-#           If set, all frames will be erased, and then build again.
-#           This is to be used when changing fonts' sizes, or for similar operations.
 # Returns : tuple
 #   It is (zip_code : str, distance_from : str) as in the tuple
 #   (ENTRY_COMPONENTS['tk_entry_zip_code'].get(), ENTRY_COMPONENTS['tk_entry_distance_from'].get())
-def fnc_paintStart(tk_window, **kwargs):
+def fnc_paintStart(tk_window):
     global HOME_DIR, CONFIG_FOLDER, ICO_FILE
-    global API_KEY, ZIP_CODE, DISTANCE_FROM, HAS_AREA_CHANGED
-    global IS_CLOSING, MENUS, FRAMES, RENEWABLE_COMPONENTS, ENTRY_COMPONENTS
+    global API_KEY, ZIP_CODE, DISTANCE_FROM
+    global IS_CLOSING, MENUS, FRAMES, RENEWABLE_COMPONENTS, ENTRY_COMPONENTS, PAINTED_LAYOUT
 
     _ico_folder_path = os.path.join(HOME_DIR, CONFIG_FOLDER)
     _ico_file_path = os.path.join(_ico_folder_path, ICO_FILE)
 
-    if 'paint_again' in kwargs:
-        _zip_code = ENTRY_COMPONENTS['tk_entry_zip_code'].get()
-        HAS_AREA_CHANGED = (_zip_code != ZIP_CODE)
-        ZIP_CODE = _zip_code
-        _distance_from = int(ENTRY_COMPONENTS['tk_entry_distance_from'].get())
-        HAS_AREA_CHANGED = HAS_AREA_CHANGED or (_distance_from != DISTANCE_FROM)
-        DISTANCE_FROM = _distance_from
-        [FRAMES[each].destroy() for each in FRAMES]
-        if len(MENUS) > 0:
-            kwargs['menu'].delete(0, len(MENUS))
-    # start for the 1st time
-    else:
-        IS_CLOSING = False
-        tk_window.title('-- Shch Air Quality --')
-        try:
-            tk_window.iconbitmap(_ico_file_path)
-        except:
-            pass
+    IS_CLOSING = False
+    tk_window.title('-- Shch Air Quality --')
+    try:
+        tk_window.iconbitmap(_ico_file_path)
+    except:
+        pass
+
+    fnc_fonts()
 
     tk_menu = tk.Menu(tk_window)
     tk_window.config(menu= tk_menu)
     MENUS = dict()
 
-    MENUS['tk_menu_api_key'] =  tk.Menu(tk_menu, font=('TkTextFont', fnc_font(tercero=1)))
+    MENUS['tk_menu_api_key'] =  tk.Menu(tk_menu, font=FONTS['menu'])
     tk_menu.add_cascade(label= 'API Key', menu= MENUS['tk_menu_api_key'])
     MENUS['tk_menu_api_key'].add_command(\
             label= 'Change API key',\
             command= lambda: fnc_requestToChangeApiKey(tk_window, API_KEY, ico_path=_ico_file_path))
 
-    MENUS['tk_menu_display'] =  tk.Menu(tk_menu, font=('TkTextFont', fnc_font(tercero=1)))
+    MENUS['tk_menu_display'] =  tk.Menu(tk_menu, font=FONTS['menu'])
     tk_menu.add_cascade(label= 'Display', menu= MENUS['tk_menu_display'])
-    MENUS['tk_menu_display'].add_command(label= '|+| Larger Buttons', command= lambda: fnc_regDisplay(tk_window, 1, menu = tk_menu))
-    MENUS['tk_menu_display'].add_command(label= '|-| Smaller Buttons', command= lambda: fnc_regDisplay(tk_window, -1, menu = tk_menu))
+    MENUS['tk_menu_display'].add_command(label= '|+| Larger Buttons', command= lambda: fnc_regDisplay(tk_window, 1))
+    MENUS['tk_menu_display'].add_command(label= '|-| Smaller Buttons', command= lambda: fnc_regDisplay(tk_window, -1))
 
     FRAMES =  dict() # holds frames
     RENEWABLE_COMPONENTS = dict() # holds tk widgets to renew after each request
     ENTRY_COMPONENTS = dict()  # holds entry widgets that specify zip_code and distance_from
+    PAINTED_LAYOUT = None # the layout of RENEWABLE_COMPONENTS in the grid (see fnc_paint(...))
     # frame for request data
     FRAMES['tk_frame_request_data'] = tk.Frame(tk_window)
     FRAMES['tk_frame_request_data'].pack(padx= 4, pady= 4)
@@ -158,38 +203,38 @@ def fnc_paintStart(tk_window, **kwargs):
 
     tk_label_zip_code = tk.Label(
                 FRAMES['tk_frame_request_data'],
-                text = "Zip Code (5 digits)", font = ('Times', fnc_font(segundo=1)),
+                text = "Zip Code (5 digits)", font = FONTS['label'],
                 padx = 12, pady = 10,
                 relief = tk.SUNKEN, bd = 8
                 )
     tk_label_distance_from = tk.Label(
                 FRAMES['tk_frame_request_data'],
-                text = "Distance From (miles)", font = ('Times', fnc_font(segundo=1)),
+                text = "Distance From (miles)", font = FONTS['label'],
                 padx = 2, pady = 10,
                 relief = tk.SUNKEN, bd = 8
                 )
     tk_label_okay = tk.Label(
                 FRAMES['tk_frame_request_data'],
-                text = "Renew Data", font = ('Times', fnc_font(segundo=1)),
+                text = "Renew Data", font = FONTS['label'],
                 padx = 12, pady = 10,
                 relief = tk.SUNKEN, bd = 8
                 )
 
     ENTRY_COMPONENTS['tk_entry_zip_code'] = tk.Entry(
                 FRAMES['tk_frame_request_data'],
-                font= ('TkTextFont', fnc_font(primero=1)), justify='center',
+                font= FONTS['entry'], justify='center',
                 relief = tk.GROOVE, bd = 7,
                 )
     ENTRY_COMPONENTS['tk_entry_zip_code'].insert('end', ZIP_CODE)
     ENTRY_COMPONENTS['tk_entry_distance_from'] = tk.Entry(
                 FRAMES['tk_frame_request_data'],
-                font= ('TkTextFont', fnc_font(primero=1)), justify='center',
+                font= FONTS['entry'], justify='center',
                 relief = tk.GROOVE, bd = 7,
                 )
     ENTRY_COMPONENTS['tk_entry_distance_from'].insert('end', DISTANCE_FROM)
     tk_button_okay = tk.Button(
                 FRAMES['tk_frame_request_data'],
-                text='OKAY', font = ('Arial', fnc_font(segundo=1)), fg = 'green',
+                text='OKAY', font = FONTS['button'], fg = 'green',
                 relief = tk.GROOVE, bd = 7,
                 command= lambda: fnc_renew(tk_window),
                 )
@@ -206,19 +251,36 @@ def fnc_paintStart(tk_window, **kwargs):
 
     return (API_KEY, ENTRY_COMPONENTS['tk_entry_zip_code'].get(), ENTRY_COMPONENTS['tk_entry_distance_from'].get())
 #!
+# returns the label named name from RENEWABLE_COMPONENTS, creating it first if it does not exist yet.
+# Args:
+#   name : str
+#   kwargs: the options of tk.Label(...) used only when the label is created.
+# Returns : tk.Label
+def fnc_renewableLabel(name, **kwargs):
+    global FRAMES, RENEWABLE_COMPONENTS
+
+    if not (name in RENEWABLE_COMPONENTS):
+        RENEWABLE_COMPONENTS[name] = tk.Label(FRAMES['tk_frame_air_data'], padx = 12, pady = 4, bd = 3, **kwargs)
+    return RENEWABLE_COMPONENTS[name]
+    # end of function
+#!
 # paints the buttom frame. It is to be invoked each time after teh air data have been renewed.
+#   The labels are kept between calls and updated in place; labels are only created or destroyed when
+#   the set of air qualities changes, and re-gridded only when the layout changes.
 # Args:
 #   tk_window : tkinter window created via the tk.Tk(...) method.
+#   air_data : dict or None
+#       See fnc_renewAirData(...). If air_data['stale'] is set, the data are painted as the last known ones.
+#   kwargs: usual keyword args.
+#       'fetching' : <any value>
+#           If set, and air_data cannot be painted, the warning says that the data are being fetched.
 # Returns : nothing.
-def fnc_paint(tk_window, air_data):
-    global IS_CLOSING, FRAMES, RENEWABLE_COMPONENTS
+def fnc_paint(tk_window, air_data, **kwargs):
+    global IS_CLOSING, FRAMES, RENEWABLE_COMPONENTS, FONTS, PAINTED_LAYOUT
 
     if IS_CLOSING:
         return
 
-    if len(RENEWABLE_COMPONENTS) > 0:
-        [RENEWABLE_COMPONENTS[_wg_key].destroy() for _wg_key in RENEWABLE_COMPONENTS]
-
     _air_data_okay = True
     if (not isinstance(air_data, dict)) or (not ('data_full' in air_data)) or (not ('data_time' in air_data)):
         _air_data_okay = False
@@ -227,74 +289,72 @@ def fnc_paint(tk_window, air_data):
 
     _wrap_length = int((1./3.5)*tk_window.winfo_screenwidth())
 
+    _elements = list(air_data['data_full']) if _air_data_okay else list()
+    # air qualities no longer present
+    for _wg_key in [_wg_key for _wg_key in RENEWABLE_COMPONENTS if _wg_key.startswith('tk_label_air_data_element_')]:
+        if not (_wg_key.rsplit('_', 1)[0][len('tk_label_air_data_element_'):] in _elements):
+            RENEWABLE_COMPONENTS.pop(_wg_key).destroy()
+
+    fnc_renewableLabel('tk_label_air_data_info', font = FONTS['label'], wraplength = _wrap_length, relief = tk.RAISED)\
+        .config(text = '--- Last Known AQI Values ---' if (_air_data_okay and air_data.get('stale')) else '--- AQI Values ---')
+
     if not _air_data_okay:
-        RENEWABLE_COMPONENTS['tk_label_air_data_info'] = tk.Label(
-                    FRAMES['tk_frame_air_data'],
-                    text = '--- AQI Values ---', font = ('Times', fnc_font(segundo=1)),
-                    wraplength = _wrap_length,
-                    padx = 12, pady = 4,
-                    relief = tk.RAISED, bd = 3
-                    )
-        RENEWABLE_COMPONENTS['tk_label_air_data_warning'] = tk.Label(
-                    FRAMES['tk_frame_air_data'],
-                    text = '-- Cannot be Found for the Selected Area --', font = ('Times', fnc_font(segundo=1)),
-                    wraplength = _wrap_length,
-                    padx = 12, pady = 4,
-                    relief = tk.RAISED, bd = 3
-                    )
-
-        RENEWABLE_COMPONENTS['tk_label_air_data_info'].grid(row=0, column=0, sticky='nesw')
-        RENEWABLE_COMPONENTS['tk_label_air_data_warning'].grid(row=1, column=0, sticky='nesw')
+        fnc_renewableLabel('tk_label_air_data_warning', font = FONTS['label'], wraplength = _wrap_length, relief = tk.RAISED)\
+            .config(text = '-- Fetching Data for the Selected Area --' if ('fetching' in kwargs) else\
+                '-- Cannot be Found for the Selected Area --')
+
+        if PAINTED_LAYOUT != ('warning',):
+            if 'tk_label_air_data_time' in RENEWABLE_COMPONENTS:
+                RENEWABLE_COMPONENTS['tk_label_air_data_time'].grid_remove()
+            RENEWABLE_COMPONENTS['tk_label_air_data_info'].grid(row=0, column=0, columnspan=1, sticky='nesw')
+            RENEWABLE_COMPONENTS['tk_label_air_data_warning'].grid(row=1, column=0, sticky='nesw')
+            PAINTED_LAYOUT = ('warning',)
         return
 
-    RENEWABLE_COMPONENTS['tk_label_air_data_time'] = tk.Label(
-                FRAMES['tk_frame_air_data'],
-                text = air_data['data_time'], font = ('Times', fnc_font(tercero=1)),
-                wraplength = _wrap_length,
-                padx = 12, pady = 4,
-                relief = tk.FLAT, bd = 3
-                )
-    RENEWABLE_COMPONENTS['tk_label_air_data_info'] = tk.Label(
-                FRAMES['tk_frame_air_data'],
-                text = '--- AQI Values ---', font = ('Times', fnc_font(segundo=1)),
-                wraplength = _wrap_length,
-                padx = 12, pady = 4,
-                relief = tk.RAISED, bd = 3
-                )
+    fnc_renewableLabel('tk_label_air_data_time', font = FONTS['label_small'], wraplength = _wrap_length, relief = tk.FLAT)\
+        .config(text = air_data['data_time'] + (' (stale)' if air_data.get('stale') else ''))
 
-    _namePairs = list()
-    for _element in air_data['data_full']:
-        _nameRoot = 'tk_label_air_data_' + _element + '_'
-        _name_pair = (_nameRoot + 'aqi', _nameRoot + 'quality')
-        _namePairs.append(_name_pair)
+    for _element in _elements:
+        _nameRoot = 'tk_label_air_data_element_' + _element + '_'
         _aqi, _quality, _q_index, _fg, _bg = air_data['data_full'][_element]
         _aqi = int(float(_aqi)*100.)/100
         _aqi_text = '{}: {}'.format(_element, _aqi)
         _quality_text = '{} (Quality Index: {})'.format(_quality, _q_index)
 
-        RENEWABLE_COMPONENTS[_name_pair[0]] = tk.Label(
-                    FRAMES['tk_frame_air_data'],
-                    text = _aqi_text, font = ('Times', fnc_font(segundo=1)),
-                    wraplength = _wrap_length,
-                    padx = 12, pady = 4,
-                    relief = tk.SUNKEN, bd = 3
-                    )
-        RENEWABLE_COMPONENTS[_name_pair[1]] = tk.Label(
-                    FRAMES['tk_frame_air_data'],
-                    text = _quality_text, font = ('Times', fnc_font(segundo=1)),
-                    fg = _fg, bg = _bg,
-                    wraplength = _wrap_length,
-                    padx = 12, pady = 4,
-                    relief = tk.SUNKEN, bd = 3
-                    )
-
-    RENEWABLE_COMPONENTS['tk_label_air_data_time'].grid(row=0, column=0, sticky='nesw')
-    RENEWABLE_COMPONENTS['tk_label_air_data_info'].grid(row=1, column=0, columnspan=2, sticky='nesw')
-    _row = 2
-    for _name_pair in _namePairs:
-        RENEWABLE_COMPONENTS[_name_pair[0]].grid(row=_row, column=0, sticky='nesw')
-        RENEWABLE_COMPONENTS[_name_pair[1]].grid(row=_row, column=1, sticky='nesw')
-        _row +=1
+        fnc_renewableLabel(_nameRoot + 'aqi', font = FONTS['label'], wraplength = _wrap_length, relief = tk.SUNKEN)\
+            .config(text = _aqi_text)
+        fnc_renewableLabel(_nameRoot + 'quality', font = FONTS['label'], wraplength = _wrap_length, relief = tk.SUNKEN)\
+            .config(text = _quality_text, fg = _fg, bg = _bg)
+
+    if PAINTED_LAYOUT != tuple(_elements):
+        if 'tk_label_air_data_warning' in RENEWABLE_COMPONENTS:
+            RENEWABLE_COMPONENTS['tk_label_air_data_warning'].grid_remove()
+        RENEWABLE_COMPONENTS['tk_label_air_data_time'].grid(row=0, column=0, sticky='nesw')
+        RENEWABLE_COMPONENTS['tk_label_air_data_info'].grid(row=1, column=0, columnspan=2, sticky='nesw')
+        _row = 2
+        for _element in _elements:
+            _nameRoot = 'tk_label_air_data_element_' + _element + '_'
+            RENEWABLE_COMPONENTS[_nameRoot + 'aqi'].grid(row=_row, column=0, sticky='nesw')
+            RENEWABLE_COMPONENTS[_nameRoot + 'quality'].grid(row=_row, column=1, sticky='nesw')
+            _row +=1
+        PAINTED_LAYOUT = tuple(_elements)
+    # end of function
+#!
+# shows the "fetching" state in the buttom frame, while the air data are being renewed in the background.
+#   The data already on the screen (if any) are kept; only the info label is changed.
+# Args:
+#   tk_window : tkinter window created via the tk.Tk(...) method.
+# Returns : nothing.
+def fnc_paintFetching(tk_window):
+    global IS_CLOSING, RENEWABLE_COMPONENTS, PAINTED_LAYOUT
+
+    if IS_CLOSING:
+        return
+
+    if (PAINTED_LAYOUT is None) or (PAINTED_LAYOUT == ('warning',)):
+        fnc_paint(tk_window, None, fetching=1)
+    else:
+        RENEWABLE_COMPONENTS['tk_label_air_data_info'].config(text = '--- Fetching AQI Values ---')
     # end of function
 #!
 # destroys tk_window. Before that it sets IS_CLOSING to True to prevent any attempts to paint.
@@ -302,8 +362,11 @@ def fnc_paint(tk_window, air_data):
 #   tk_window : tkinter window created via the tk.Tk(...) method.
 # Returns : nothing.
 def fnc_paintStop(tk_window):
-    global IS_CLOSING
+    global IS_CLOSING, FETCH_WORKER, REFRESH_SCHEDULER
     IS_CLOSING = True
+    if not (REFRESH_SCHEDULER is None):
+        REFRESH_SCHEDULER.stop()
+    FETCH_WORKER.shutdown()
     fnc_save()
     tk_window.destroy()
     # end of function
@@ -361,6 +424,7 @@ def fnc_load():
     if DEBUG:
         print(_config_file_path)
 
+
     _CONFIG_KEYS = {\
         'ICO_FILE' : 'str',\
         'API_KEY' : 'str', 'ZIP_CODE' : 'str', 'DISTANCE_FROM' : 'int',\
@@ -445,6 +509,106 @@ def fnc_save():
             print('no config is saved')
 
 #!
+# returns the path of the snapshot of the last good air data (see fnc_saveSnapshot(...)).
+def fnc_snapshotPath():
+    global HOME_DIR, CONFIG_FOLDER, CURRENT_USER, SNAPSHOT_SUFFIX
+
+    return os.path.join(HOME_DIR, CONFIG_FOLDER, '{}{}'.format(CURRENT_USER, SNAPSHOT_SUFFIX))
+    # end of function
+#!
+# returns the area (zip_code : str, distance_from : int) in a comparable form, or None if it is not valid.
+def fnc_area(zip_code, distance_from):
+    try:
+        return (str(zip_code).strip(), int(distance_from))
+    except (TypeError, ValueError):
+        return None
+    # end of function
+#!
+# saves the air data (see fnc_renewAirData(...)) of the area, if they are good, as the snapshot painted
+#   at the next start (see fnc_loadSnapshot(...)). The file is replaced atomically.
+# Args:
+#   air_data : dict
+#   area : tuple (zip_code, distance_from)
+# Returns: nothing.
+def fnc_saveSnapshot(air_data, area):
+    global DEBUG
+
+    if not isinstance(air_data, dict) or not isinstance(air_data.get('data_full'), dict) or\
+            not fnc_checkType('str', air_data.get('data_time')) or (fnc_area(*area) is None):
+        return
+
+    _snapshot_path = fnc_snapshotPath()
+    try:
+        if not os.path.isdir(os.path.dirname(_snapshot_path)):
+            os.mkdir(os.path.dirname(_snapshot_path))
+        _snapshot = {'ZIP_CODE' : fnc_area(*area)[0], 'DISTANCE_FROM' : fnc_area(*area)[1],\
+            'data_time' : air_data['data_time'],\
+            'data_full' : {_key : list(_value) for _key, _value in air_data['data_full'].items()}}
+        with open(_snapshot_path + '.tmp', 'w') as _snapshot_file:
+            json.dump(_snapshot, _snapshot_file)
+        os.replace(_snapshot_path + '.tmp', _snapshot_path)
+    except:
+        if DEBUG:
+            print('no snapshot is saved')
+    # end of function
+#!
+# loads the snapshot of the last good air data, if it is for the area.
+# Args:
+#   area : tuple (zip_code, distance_from)
+# Returns: air_data : dict or None
+#   See fnc_renewAirData(...), with 'stale' and 'area' set.
+def fnc_loadSnapshot(area):
+    global DEBUG
+
+    try:
+        with open(fnc_snapshotPath(), 'r') as _snapshot_file:
+            _snapshot = json.load(_snapshot_file)
+        if fnc_area(_snapshot['ZIP_CODE'], _snapshot['DISTANCE_FROM']) != fnc_area(*area) or\
+                not fnc_checkType('str', _snapshot['data_time']):
+            return None
+        _data_full = {str(_key) : tuple(_value) for _key, _value in _snapshot['data_full'].items()\
+            if isinstance(_value, list) and len(_value) == 5}
+        if len(_data_full) < 1:
+            return None
+        return {'data_full' : _data_full, 'data_time' : _snapshot['data_time'], 'stale' : True,\
+            'area' : fnc_area(*area)}
+    except:
+        if DEBUG:
+            print('no snapshot is loaded')
+        return None
+    # end of function
+#!
+# imports the data stack, and configures the cache of AirNow responses, the budget of the API key, the zip code index,
+#   and the local store of observations next to the config file. It is called on the first fetch (on the background thread); later calls do nothing.
+# Args: none.
+# Returns: nothing.
+def fnc_loadData():
+    global DEBUG, HOME_DIR, CONFIG_FOLDER, CACHE_FOLDER, DATA_LOCK, DATA_LOADED
+
+    with DATA_LOCK:
+        if DATA_LOADED:
+            return
+        DATA_LOADED = True
+
+        import lib.air_now_cache as ANC
+        import lib.air_now_store as ANST
+        import lib.air_now_quota as ANQ
+        import lib.zip_centroids as ZC
+        _config_folder_path = os.path.join(HOME_DIR, CONFIG_FOLDER)
+        # AirNow responses are cached in memory, and on disk next to the config file
+        ANC.configureCache(folder_path=os.path.join(_config_folder_path, CACHE_FOLDER))
+        # the budget of the API key is shared with the other instances (GUI, and headless) on this host
+        ANQ.configureLimiter(path=os.path.join(_config_folder_path, ANQ.QUOTA_FILE))
+        # the locations of zip codes, so that fetches skip the first round trip (see the module zip_centroids)
+        ZC.configureIndex(os.path.join(_config_folder_path, ZC.INDEX_FILE))
+        # every fetch is appended to the local store of observations
+        try:
+            ANST.configureStore(os.path.join(_config_folder_path, ANST.STORE_FILE))
+        except:
+            if DEBUG:
+                print('no store of observations is opened')
+    # end of function
+#!
 # renews Air data.
 # Args:
 #   zip_code : str
@@ -465,10 +629,13 @@ def fnc_save():
 #       The 2nd member ('data_time') is a string in the format year-month-day : hour.
 #       2019-09-30 : 10
 def fnc_renewAirData(api_key, zip_code, distance_from):
-    global DEBUG, GET_AIR_DATA, AIR_DATA_TIMEOUT
+    global DEBUG, GET_AIR_DATA, AIR_DATA_TIMEOUT, NOWCAST
+    import lib.air_quality as AQI
 
+    fnc_loadData()
+    _kwargs = {'NOWCAST' : 1} if NOWCAST else dict()
     if DEBUG:
-        air_quality = AQI.AirQuality(api_key, zip_code, int(distance_from), ON_SCREEN=1)
+        air_quality = AQI.AirQuality(api_key, zip_code, int(distance_from), ON_SCREEN=1, **_kwargs)
         if GET_AIR_DATA:
             air_quality.getAirData(timeout=AIR_DATA_TIMEOUT)
             air_quality.printAirData()
@@ -484,45 +651,97 @@ def fnc_renewAirData(api_key, zip_code, distance_from):
             air_quality.data_time = '2019-09-30 : 10'
     # normal operation
     else:
-        air_quality = AQI.AirQuality(api_key, zip_code, int(distance_from))
+        air_quality = AQI.AirQuality(api_key, zip_code, int(distance_from), **_kwargs)
         if GET_AIR_DATA:
             air_quality.getAirData(timeout=AIR_DATA_TIMEOUT)
 
     return {'data_full' : air_quality.data_full, 'data_time' : air_quality.data_time}
     # end of function
 #!
-# callback for the OKAY button. It renews the air data (via a call to fnc_renewAirData(...)),
-#   and updates the 2nd frame (via a call to fnc_paint(...))
+# callback for the OKAY button. It renews the air data (via a call to fnc_renewAirData(...)) on a background
+#   thread (see FETCH_WORKER), and shows the "fetching" state meanwhile. When the data arrive, the 2nd frame
+#   is updated (via a call to fnc_renewDone(...)). Pressing OKAY again, or changing the area, makes
+#   the previous request stale: its result is never painted.
 def fnc_renew(tk_window):
-    global API_KEY, ENTRY_COMPONENTS#, RENEWABLE_COMPONENTS
-    global AIR_DATA
-
-    # try:
-    #     RENEWABLE_COMPONENTS['tk_label_air_data_info'].config(text='Fetching Data')
-    # except:
-    #     pass
-
-    AIR_DATA = fnc_renewAirData(\
-        API_KEY,\
-        ENTRY_COMPONENTS['tk_entry_zip_code'].get(),\
-        ENTRY_COMPONENTS['tk_entry_distance_from'].get())
+    global API_KEY, ENTRY_COMPONENTS, FETCH_WORKER, HAS_AREA_CHANGED
+
+    # the entries are read here, on the Tk main thread
+    _zip_code = ENTRY_COMPONENTS['tk_entry_zip_code'].get()
+    _distance_from = ENTRY_COMPONENTS['tk_entry_distance_from'].get()
+    fnc_checkArea()
+    HAS_AREA_CHANGED = False
+
+    fnc_paintFetching(tk_window)
+    FETCH_WORKER.submit(\
+        fnc_renewAirData,\
+        (API_KEY, _zip_code, _distance_from),\
+        on_done= lambda air_data: fnc_renewDone(tk_window, air_data, (_zip_code, _distance_from)),\
+        on_error= lambda e: fnc_renewDone(tk_window, None, (_zip_code, _distance_from)))
+    # end of function
+#!
+# receives the renewed air data on the Tk main thread, and updates the 2nd frame (via a call to fnc_paint(...))
+#   Good data are saved as the snapshot (see fnc_saveSnapshot(...)). If the fetch has failed, the last good data
+#   of the same area (if any) are kept on the screen, marked stale (stale-while-revalidate).
+#   It also schedules the next automatic refresh (see REFRESH_SCHEDULER).
+# Args:
+#   tk_window : tkinter window created via the tk.Tk(...) method.
+#   air_data : dict or None
+#       The value returned by fnc_renewAirData(...), or None if it has failed.
+#   area : tuple (zip_code, distance_from) or None
+#       The area of the fetch.
+# Returns : nothing.
+def fnc_renewDone(tk_window, air_data, area=None):
+    global AIR_DATA, REFRESH_SCHEDULER
+
+    _is_okay = isinstance(air_data, dict) and isinstance(air_data.get('data_full'), dict)
+    _area = None if (area is None) else fnc_area(*area)
+    if _is_okay:
+        AIR_DATA = dict(air_data, area=_area)
+        if not (_area is None):
+            fnc_saveSnapshot(air_data, _area)
+    elif isinstance(AIR_DATA, dict) and not (_area is None) and (AIR_DATA.get('area') == _area):
+        AIR_DATA = dict(AIR_DATA, stale=True)
+    else:
+        AIR_DATA = air_data
     fnc_paint(tk_window, AIR_DATA)
+
+    if not (REFRESH_SCHEDULER is None):
+        REFRESH_SCHEDULER.notify(air_data['data_time'] if _is_okay else None)
     # end of function
 
-if __name__ == "__main__":
+#!
+# starts the application in the window: loads the config, paints the window, and schedules the first fetch.
+#   The last good air data of the area (see fnc_loadSnapshot(...)) are painted right away, marked stale,
+#   and the first fetch (and with it the import of the data stack) starts once the window has been painted.
+# Args:
+#   tk_window : tkinter window created via the tk.Tk(...) method.
+# Returns: nothing.
+def fnc_start(tk_window):
+    global FETCH_WORKER, FETCH_POLL_MS, AUTO_REFRESH, REFRESH_SCHEDULER, AIR_DATA, ZIP_CODE, DISTANCE_FROM
 
-    tk_window_main = tk.Tk()
-    tk_window_main.protocol("WM_DELETE_WINDOW", lambda: fnc_paintStop(tk_window_main))
+    FETCH_WORKER = FetchWorker(tk_window, poll_ms=FETCH_POLL_MS)
+    if AUTO_REFRESH:
+        REFRESH_SCHEDULER = RefreshScheduler(tk_window, lambda: fnc_renew(tk_window))
+    tk_window.protocol("WM_DELETE_WINDOW", lambda: fnc_paintStop(tk_window))
     # centering the window...
-    screen_width = int((1./2.)*tk_window_main.winfo_screenwidth())
-    screen_x = int((tk_window_main.winfo_screenwidth() - screen_width)/2.)
-    screen_height = int((1./1.9)*tk_window_main.winfo_screenheight())
-    tk_window_main.geometry('{}x{}+{}+{}'.format(screen_width, screen_height, screen_x, 0))
+    screen_width = int((1./2.)*tk_window.winfo_screenwidth())
+    screen_x = int((tk_window.winfo_screenwidth() - screen_width)/2.)
+    screen_height = int((1./1.9)*tk_window.winfo_screenheight())
+    tk_window.geometry('{}x{}+{}+{}'.format(screen_width, screen_height, screen_x, 0))
     fnc_load()
-    api_key, zip_code, distance_from = fnc_paintStart(tk_window_main)
-    # tk_window_main.mainloop()
-    AIR_DATA = fnc_renewAirData(api_key, zip_code, distance_from)
-    fnc_paint(tk_window_main, AIR_DATA)
+    fnc_paintStart(tk_window)
+    AIR_DATA = fnc_loadSnapshot((ZIP_CODE, DISTANCE_FROM))
+    if not (AIR_DATA is None):
+        fnc_paint(tk_window, AIR_DATA)
+    tk_window.update()
+    # the first fetch runs in the background; the window is painted in the "fetching" state meanwhile
+    fnc_renew(tk_window)
+    # end of function
+
+if __name__ == "__main__":
+
+    tk_window_main = tk.Tk()
+    fnc_start(tk_window_main)
 
     tk_window_main.mainloop()
 
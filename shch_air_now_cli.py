@@ -0,0 +1,256 @@
+# the headless (command-line, and daemon) entry point: gets air quality data for many zip codes,
+#   once or on an interval, and writes them as NDJSON (one JSON object per line) or CSV to stdout or to a file.
+#   It never imports tkinter or PIL, and imports the data stack (requests, numpy) only when it is about to fetch.
+#
+# Usage:
+#   python shch_air_now_cli.py [options] ZIP_CODE[:DISTANCE] [ZIP_CODE[:DISTANCE] ...]
+#   Examples :
+#       python shch_air_now_cli.py 20500 10001:50
+#       python shch_air_now_cli.py --interval auto --format csv --output air.csv 20500 10001
+#   The API key is taken from --api-key, the environment variable AIRNOW_API_KEY, or the GUI's config file.
+#   Each output record is
+#   {"fetched_at", "zip_code", "distance", "kind", "parameter", "hour", "aqi", "category", "descriptor",
+#    "median", "min", "max", "count"},
+#   where kind is 'current' (the zip code's reporting area) or 'full' (averaged over the area), and hour is
+#   the UTC observation hour (e.g. '2021-09-29T14'; None if the time zone of the current data is not known).
+#   The budget of requests of the API key is shared with the GUI, and the other instances on the host
+#   (see the module air_now_quota); runs on an interval are background requests. --quota prints the budget, and exits.
+
+import os
+import sys
+import csv
+import json
+import time
+import signal
+import getpass
+import argparse
+import threading
+
+CONFIG_FOLDER = 'shch_air_now_cfg'
+DISTANCE_FROM = 30
+FIELDS = ('fetched_at', 'zip_code', 'distance', 'kind', 'parameter', 'hour', 'aqi', 'category', 'descriptor',\
+    'median', 'min', 'max', 'count')
+FORMATS = ('ndjson', 'csv')
+API_KEY_VARIABLE = 'AIRNOW_API_KEY'
+
+#!
+# returns the command-line parser.
+def fnc_parser():
+    parser = argparse.ArgumentParser(prog='shch_air_now_cli.py',\
+        description='Gets AirNow air quality data for many zip codes, once or on an interval.')
+    parser.add_argument('areas', nargs='+', metavar='ZIP_CODE[:DISTANCE]',\
+        help='the zip codes, optionally with the distance in miles (defaults to --distance)')
+    parser.add_argument('--distance', type=int, default=DISTANCE_FROM,\
+        help=f'the default distance in miles (default: {DISTANCE_FROM})')
+    parser.add_argument('--api-key', default=None,\
+        help=f'the AirNow API key (default: ${API_KEY_VARIABLE}, or the GUI config file)')
+    parser.add_argument('--format', choices=FORMATS, default='ndjson', help='the output format (default: ndjson)')
+    parser.add_argument('--output', default=None, help='the file to append to (default: stdout)')
+    parser.add_argument('--interval', default='0',\
+        help="seconds between runs; 'auto' runs when the next hourly observation is expected; 0 runs once (default)")
+    parser.add_argument('--count', type=int, default=0, help='stops after this many runs (default: no limit)')
+    parser.add_argument('--timeout', type=float, default=60, help='the timeout of each request in seconds')
+    parser.add_argument('--api-host', default=None, help='the scheme and host to send requests to')
+    parser.add_argument('--store', action='store_true', help='also appends the data to the local store of observations')
+    parser.add_argument('--metrics-port', type=int, default=None,\
+        help='serves the fetch metrics on this port: /metrics (Prometheus text), and /metrics.json')
+    parser.add_argument('--quota', action='store_true', help='prints the remaining budget of the API key, and exits')
+    parser.add_argument('--verbose', action='store_true', help='prints a summary of each fetch (and the remaining budget) to stderr')
+    return parser
+    # end of function
+#!
+# returns the list of areas (zip_code : str, distance_from : int) parsed from ZIP_CODE[:DISTANCE] arguments.
+#   ValueError is raised if a distance is not an int.
+def fnc_areas(arguments, distance_from):
+    areas = list()
+    for _each in arguments:
+        _zip_code, _, _distance_from = _each.partition(':')
+        areas.append((_zip_code.strip(), int(_distance_from) if _distance_from else int(distance_from)))
+    return areas
+    # end of function
+#!
+# returns the API key from the environment, or from the GUI config file of the current user, or None.
+def fnc_apiKey(home_dir):
+    if os.environ.get(API_KEY_VARIABLE):
+        return os.environ[API_KEY_VARIABLE]
+
+    _config_file_path = os.path.join(home_dir, CONFIG_FOLDER, '{}.cfg'.format(getpass.getuser()))
+    try:
+        with open(_config_file_path, 'r') as _config_file:
+            _api_key = json.load(_config_file).get('API_KEY')
+            return _api_key if isinstance(_api_key, str) and _api_key else None
+    except (OSError, ValueError, AttributeError):
+        return None
+    # end of function
+#!
+# returns the output records of one AirQuality object (see FIELDS).
+def fnc_records(air_quality, fetched_at):
+    records = list()
+    _base = {'fetched_at' : fetched_at, 'zip_code' : air_quality.zip_code, 'distance' : air_quality.distance_from}
+
+    if isinstance(air_quality.data_current, dict):
+        # the local hour of the reporting area, in UTC (as in appendAirQuality(...) of ObservationStore)
+        _observed = air_quality.observedHourUtc()
+        _hour = '{}T{:02d}'.format(*_observed) if not (_observed is None) else None
+        for _parameter, _category in air_quality.data_current.items():
+            records.append(dict(_base, kind='current', parameter=_parameter, hour=_hour,\
+                aqi=_category[0], category=_category[2], descriptor=_category[1]))
+
+    if isinstance(air_quality.data_full, dict):
+        _hour = '{}T{:02d}'.format(air_quality.date_full.strip(), int(air_quality.hour_full))\
+            if not (air_quality.date_full is None) else None
+        _stats = air_quality.data_stats if isinstance(air_quality.data_stats, dict) else dict()
+        for _parameter, _category in air_quality.data_full.items():
+            _record = dict(_base, kind='full', parameter=_parameter, hour=_hour,\
+                aqi=_category[0], category=_category[2], descriptor=_category[1])
+            if _parameter in _stats:
+                _record.update({_key : _stats[_parameter][_key] for _key in ('median', 'min', 'max', 'count')})
+            records.append(_record)
+
+    return [{_key : _record.get(_key) for _key in FIELDS} for _record in records]
+    # end of function
+#!
+# writes the records to the output (an open text file) in the format ('ndjson' or 'csv').
+def fnc_write(output, records, output_format, write_header=False):
+    if output_format == 'csv':
+        _writer = csv.DictWriter(output, fieldnames=FIELDS, lineterminator='\n')
+        if write_header:
+            _writer.writeheader()
+        _writer.writerows(records)
+    else:
+        for _record in records:
+            output.write(json.dumps(_record) + '\n')
+    output.flush()
+    # end of function
+#!
+# gets the data for all areas once.
+# Returns: records : list
+def fnc_fetch(api_key, areas, arguments):
+    from lib.air_quality_batch import AirQualityBatch
+
+    _kwargs = dict()
+    if not (arguments.api_host is None):
+        _kwargs['API_HOST'] = arguments.api_host
+    if arguments.interval == 'auto' or float(arguments.interval) > 0:
+        _kwargs['PRIORITY'] = 'background'
+
+    # ON_SCREEN stays off, so that stdout holds the records only; --verbose prints the metrics to stderr instead
+    _batch = AirQualityBatch(api_key, areas, **_kwargs)
+    _batch.getAirData(timeout=arguments.timeout)
+    if arguments.verbose:
+        for (_zip_code, _distance_from), _air_quality in _batch.air_qualities.items():
+            _metrics = _air_quality.metrics.toDict()
+            print(f"{_zip_code}:{_distance_from}: status {json.dumps(_metrics['status'])},"\
+                f" cache hits {json.dumps(_metrics['cache_hits'])}, errors {json.dumps(_metrics['errors'])}", file=sys.stderr)
+
+    _fetched_at = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+    records = list()
+    for _air_quality in _batch.air_qualities.values():
+        records += fnc_records(_air_quality, _fetched_at)
+    return records
+    # end of function
+#!
+# returns the delay (seconds) before the next run.
+def fnc_delay(interval):
+    if interval == 'auto':
+        import lib.air_now_clock as ANCL
+        return max(0., ANCL.nextPublicationTime() - time.time())
+    return float(interval)
+    # end of function
+#!
+# runs the command line.
+# Returns: exit_code : int
+#   0 on success, 1 if the (last) run got no data, 2 on invalid arguments.
+def fnc_main(argv=None):
+    _parser = fnc_parser()
+    arguments = _parser.parse_args(argv)
+    home_dir = os.path.dirname(os.path.abspath(__file__))
+
+    try:
+        areas = fnc_areas(arguments.areas, arguments.distance)
+        if arguments.interval != 'auto' and float(arguments.interval) < 0:
+            raise ValueError(f'invalid interval {arguments.interval}')
+    except ValueError as e:
+        _parser.error(str(e))
+
+    api_key = arguments.api_key or fnc_apiKey(home_dir)
+    if api_key is None:
+        _parser.error(f'no API key; use --api-key, or set {API_KEY_VARIABLE}')
+
+    import lib.air_now_quota as ANQ
+    _config_folder_path = os.path.join(home_dir, CONFIG_FOLDER)
+    if not os.path.isdir(_config_folder_path):
+        os.mkdir(_config_folder_path)
+    _limiter = ANQ.configureLimiter(path=os.path.join(_config_folder_path, ANQ.QUOTA_FILE))
+    if arguments.quota:
+        print(json.dumps(_limiter.remaining(api_key)))
+        return 0
+
+    if arguments.store:
+        import lib.air_now_store as ANST
+        ANST.configureStore(os.path.join(_config_folder_path, ANST.STORE_FILE))
+
+    if not (arguments.metrics_port is None):
+        import lib.air_now_metrics as ANM
+        ANM.serveMetrics(port=arguments.metrics_port)
+
+    _stop = threading.Event()
+    def _onSignal(signum, frame):
+        _stop.set()
+    signal.signal(signal.SIGTERM, _onSignal)
+    signal.signal(signal.SIGINT, _onSignal)
+
+    if arguments.output is None:
+        output = sys.stdout
+        _write_header = True
+    else:
+        _write_header = not (os.path.isfile(arguments.output) and os.path.getsize(arguments.output) > 0)
+        output = open(arguments.output, 'a', newline='')
+
+    exit_code = 0
+    _runs = 0
+    try:
+        while not _stop.is_set():
+            _records = fnc_fetch(api_key, areas, arguments)
+            fnc_write(output, _records, arguments.format, write_header=_write_header)
+            _write_header = False
+            exit_code = 0 if len(_records) > 0 else 1
+            _runs += 1
+            if arguments.verbose:
+                print(f'remaining budget: {json.dumps(_limiter.remaining(api_key))}', file=sys.stderr)
+
+            if (arguments.interval != 'auto' and float(arguments.interval) == 0) or\
+                    (arguments.count > 0 and _runs >= arguments.count):
+                break
+            _delay = fnc_delay(arguments.interval)
+            if arguments.verbose:
+                print(f'next run in {_delay:.0f} s', file=sys.stderr)
+            _stop.wait(_delay)
+    finally:
+        if not (output is sys.stdout):
+            output.close()
+
+    return exit_code
+    # end of function
+
+if __name__ == "__main__":
+    sys.exit(fnc_main())
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
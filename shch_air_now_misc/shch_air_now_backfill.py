@@ -0,0 +1,59 @@
+# backfills the local store of observations (shch_air_now_cfg/observations.sqlite3) with historical AirNow data.
+#   The progress is saved in shch_air_now_cfg/backfill.json, so an interrupted run resumes when it is started again
+#   with the same arguments.
+#
+# Usage:
+#   python shch_air_now_backfill.py API_KEY START END ZIP_CODE[:DISTANCE] [ZIP_CODE[:DISTANCE] ...]
+#   Example : python shch_air_now_backfill.py XXXX 2021-06-01 2021-08-31 20500:25 10001
+#   START and END are UTC dates (e.g. 2021-06-01) or hours (e.g. 2021-06-01T12); DISTANCE defaults to 25 miles.
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lib.zip_centroids as ZC
+import lib.air_now_store as ANST
+import lib.air_now_quota as ANQ
+from lib.air_now_backfill import Backfill
+
+DISTANCE_FROM = 25
+CHECKPOINT_FILE = 'backfill.json'
+
+if __name__ == "__main__":
+    if len(sys.argv) < 5:
+        print('Usage: python shch_air_now_backfill.py API_KEY START END ZIP_CODE[:DISTANCE] ...')
+        sys.exit(2)
+
+    api_key, start, end = sys.argv[1:4]
+    areas = list()
+    for each in sys.argv[4:]:
+        zip_code, _, distance_from = each.partition(':')
+        areas.append((zip_code, int(distance_from) if distance_from else DISTANCE_FROM))
+
+    if not os.path.isdir(ZC.INDEX_FOLDER):
+        os.mkdir(ZC.INDEX_FOLDER)
+    ANST.configureStore(os.path.join(ZC.INDEX_FOLDER, ANST.STORE_FILE))
+    ANQ.configureLimiter(path=os.path.join(ZC.INDEX_FOLDER, ANQ.QUOTA_FILE))
+
+    backfill = Backfill(api_key, areas, start, end, ON_SCREEN=1,\
+        checkpoint_path=os.path.join(ZC.INDEX_FOLDER, CHECKPOINT_FILE))
+    count = backfill.run()
+    print(f'{count} rows are appended to the store')
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
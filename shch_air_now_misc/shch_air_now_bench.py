@@ -0,0 +1,195 @@
+# the benchmark suite of the AQI pipeline's hot paths:
+#   aqi_category : AirQuality.getAqiCategory(...) per call,
+#   categorize_aqi_<N> : AirQuality.categorizeAqi(...) on N values at once,
+#   process_air_data_<N> : AirQuality.processAirData(...) on synthetic BBOX responses of N records (10 ... 100k),
+#   now_cast_sites_<N> : aqi_nowcast.nowCastSites(...) on a synthetic 12-hour window of N records,
+#   area_lat_lon_box, destination_point : LatLon.areaLatLonBox(...) and LatLon.destinationPoint(...) per call,
+#   area_lat_lon_boxes_<N> : LatLonBatch.areaLatLonBoxes(...) for N centers at once,
+#   get_air_data : AirQuality.getAirData(...) end to end, against the stand-in server (see shch_air_now_tserver.py).
+#   Each benchmark is repeated, and its median and minimum times (in seconds, per call) are reported.
+#
+# Usage:
+#   python shch_air_now_bench.py [--quick] [--only NAME ...] [--output results.json]
+#       [--baseline baseline.json] [--threshold 0.25]
+#   With --baseline, the exit code is 1 if the median of any benchmark is slower than
+#   baseline * (1 + threshold). Save a baseline with --output.
+
+import sys
+import json
+import time
+import datetime
+import random
+import argparse
+import platform
+import statistics
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import numpy as np
+import lib.air_quality as AQI
+import lib.aqi_nowcast as AQN
+import lib.lat_lon_round_earth as LLRE
+import shch_air_now_tserver as TS
+
+REPEATS = 7
+THRESHOLD = 0.25
+RECORD_COUNTS = (10, 100, 1000, 10000, 100000)
+PARAMETERS = ('OZONE', 'PM2.5', 'PM10', 'NO2', 'SO2', 'CO')
+
+#!
+# returns the median and minimum time (seconds per call) of fnc(), called 'calls' times per repeat.
+def fnc_time(fnc, calls=1, repeats=REPEATS):
+    _times = list()
+    for _ in range(repeats):
+        _t0 = time.perf_counter()
+        for _ in range(calls):
+            fnc()
+        _times.append((time.perf_counter() - _t0) / calls)
+    return {'median' : statistics.median(_times), 'min' : min(_times), 'calls' : calls, 'repeats' : repeats}
+    # end of function
+#!
+# returns a synthetic BBOX response of 'count' records around (38.9, -77.0), with 5% of values missing (-999).
+def fnc_records(count, seed=0):
+    _random = random.Random(seed)
+    return [{'Latitude' : 38.9 + _random.uniform(-0.5, 0.5), 'Longitude' : -77.0 + _random.uniform(-0.5, 0.5),\
+        'UTC' : '2021-09-29T14:00', 'Parameter' : PARAMETERS[_index % len(PARAMETERS)],\
+        'AQI' : -999 if (_random.random() < 0.05) else _random.randint(0, 300)} for _index in range(count)]
+    # end of function
+#!
+# returns the benchmarks : dict, name -> fnc(quick : bool) -> result (see fnc_time(...)).
+def fnc_benchmarks():
+    benchmarks = dict()
+    _air_quality = AQI.AirQuality('', '20500', 25, cache=None, store=None, zip_index=None, limiter=None)
+
+    def _aqiCategory(quick):
+        _values = [float(_each) for _each in range(0, 600, 3)]
+        def _run():
+            for _each in _values:
+                _air_quality.getAqiCategory(_each)
+        _result = fnc_time(_run, calls=5 if quick else 50)
+        return {_key : (_value / len(_values) if _key in ('median', 'min') else _value) for _key, _value in _result.items()}
+    benchmarks['aqi_category'] = _aqiCategory
+
+    def _categorizeAqi(quick):
+        _values = np.random.default_rng(0).uniform(-10., 600., 100000)
+        return fnc_time(lambda: AQI.AirQuality.categorizeAqi(_values), calls=3 if quick else 30)
+    benchmarks['categorize_aqi_100000'] = _categorizeAqi
+
+    for _count in RECORD_COUNTS:
+        def _processAirData(quick, _count=_count):
+            _records = fnc_records(_count)
+            return fnc_time(lambda: _air_quality.processAirData(_records),\
+                calls=max(1, (1000 if quick else 10000) // _count), repeats=3 if quick else REPEATS)
+        benchmarks[f'process_air_data_{_count}'] = _processAirData
+
+    def _nowCastSites(quick):
+        _random = random.Random(0)
+        _sites = [(38.9 + _random.uniform(-0.5, 0.5), -77.0 + _random.uniform(-0.5, 0.5)) for _ in range(800)]
+        _records = [{'Latitude' : _latitude, 'Longitude' : _longitude, 'UTC' : f'2021-09-29T{_hour:02d}:00',\
+            'Parameter' : _parameter, 'RawConcentration' : -999. if (_random.random() < 0.05) else _random.uniform(0., 80.)}\
+            for _latitude, _longitude in _sites for _parameter in AQN.PARAMETERS for _hour in range(3, 15)]
+        _end = datetime.datetime(2021, 9, 29, 14)
+        return fnc_time(lambda: AQN.nowCastSites(_records, _end), calls=1 if quick else 5, repeats=3 if quick else REPEATS)
+    benchmarks['now_cast_sites_28800'] = _nowCastSites
+
+    _point = LLRE.LatLon(38.9, -77.0)
+    _distance = LLRE.Dms.MilesToMeters(25)
+    benchmarks['area_lat_lon_box'] = lambda quick: fnc_time(lambda: _point.areaLatLonBox(_distance),\
+        calls=100 if quick else 1000)
+    benchmarks['destination_point'] = lambda quick: fnc_time(lambda: _point.destinationPoint(_distance, 45.),\
+        calls=100 if quick else 1000)
+
+    def _areaLatLonBoxes(quick):
+        _random = np.random.default_rng(0)
+        _lats = _random.uniform(25., 49., 10000)
+        _lons = _random.uniform(-124., -67., 10000)
+        return fnc_time(lambda: LLRE.LatLonBatch.areaLatLonBoxes(_lats, _lons, _distance), calls=3 if quick else 30)
+    benchmarks['area_lat_lon_boxes_10000'] = _areaLatLonBoxes
+
+    def _getAirData(quick):
+        _server = TS.startServer('127.0.0.1', 0, monitors=200)
+        _api_host = f'http://127.0.0.1:{_server.server_port}'
+        try:
+            def _run():
+                _each = AQI.AirQuality('', '20500', 25, API_HOST=_api_host, cache=None, store=None, zip_index=None, limiter=None)
+                _each.getAirData()
+                if not isinstance(_each.data_full, dict):
+                    raise RuntimeError('no data from the stand-in server')
+            _run() # warms up the connection pool
+            return fnc_time(_run, calls=3 if quick else 20, repeats=3 if quick else REPEATS)
+        finally:
+            _server.shutdown()
+            _server.server_close()
+    benchmarks['get_air_data'] = _getAirData
+
+    return benchmarks
+    # end of function
+#!
+# compares the results with the baseline.
+# Returns: list of tuple (name : str, ratio : float)
+#   The benchmarks whose median is slower than baseline * (1 + threshold); ratio = median / baseline median.
+def fnc_compare(results, baseline, threshold):
+    regressions = list()
+    for _name, _result in results.items():
+        if not (_name in baseline) or baseline[_name]['median'] <= 0:
+            continue
+        _ratio = _result['median'] / baseline[_name]['median']
+        if _ratio > 1. + threshold:
+            regressions.append((_name, _ratio))
+    return regressions
+    # end of function
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmarks the AQI pipeline.')
+    parser.add_argument('--quick', action='store_true', help='fewer calls and repeats')
+    parser.add_argument('--only', nargs='+', default=None, metavar='NAME', help='runs only these benchmarks')
+    parser.add_argument('--output', default=None, help='saves the results (JSON) to this file')
+    parser.add_argument('--baseline', default=None, help='compares with the results saved before')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD,\
+        help=f'the allowed slowdown against the baseline (default: {THRESHOLD})')
+    arguments = parser.parse_args()
+
+    benchmarks = fnc_benchmarks()
+    names = [_name for _name in benchmarks if (arguments.only is None) or (_name in arguments.only)]
+
+    results = dict()
+    for name in names:
+        results[name] = benchmarks[name](arguments.quick)
+        print(f"{name:28s} median {1e6 * results[name]['median']:12.2f} us   min {1e6 * results[name]['min']:12.2f} us",\
+            file=sys.stderr)
+
+    report = {'python' : platform.python_version(), 'numpy' : np.__version__, 'quick' : arguments.quick,\
+        'results' : results}
+    if arguments.output is None:
+        print(json.dumps(report, indent=2))
+    else:
+        with open(arguments.output, 'w') as _file:
+            json.dump(report, _file, indent=2)
+
+    if not (arguments.baseline is None):
+        with open(arguments.baseline, 'r') as _file:
+            baseline = json.load(_file)['results']
+        regressions = fnc_compare(results, baseline, arguments.threshold)
+        for name, ratio in regressions:
+            print(f'REGRESSION {name}: {ratio:.2f}x the baseline', file=sys.stderr)
+        if len(regressions) > 0:
+            sys.exit(1)
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
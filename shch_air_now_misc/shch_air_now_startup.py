@@ -0,0 +1,147 @@
+# measures the startup of the GUI (shch_air_now.py), so that regressions are caught:
+#   import_ms : the time to import shch_air_now (and everything it imports at module level),
+#   first_paint_ms : the time from the start of the import until the window is visible,
+#   process_ms : the time from spawning the interpreter until the window is visible,
+#   heavy_modules : the modules of the data stack (requests, numpy, ...) imported by the import of shch_air_now.
+#   stale_data : whether the first paint shows AQI values, i.e. the snapshot of the last good data of the configured
+#       area (see fnc_loadSnapshot(...) in shch_air_now.py), rather than the "fetching" warning.
+#   Each run is a fresh interpreter; the medians are reported. No network request is made (GET_AIR_DATA = False).
+#   Each run uses a temporary config folder (see fnc_configFolder(...)) with a dummy API key, so that neither
+#   the API key dialog nor the user's config is involved, and the files created on the first fetch (the cache,
+#   the store, the budget of the API key, the zip code index) are removed afterwards. A display is required.
+#
+# Usage:
+#   python shch_air_now_startup.py [--runs 5] [--max-first-paint-ms MS] [--no-snapshot] [--json]
+#   With --no-snapshot, there is no snapshot of the last good data (as on the very first start).
+#   With --max-first-paint-ms, the exit code is 1 if the median first_paint_ms exceeds MS,
+#   or if any heavy module is imported by the import of shch_air_now.
+
+import os
+import sys
+import json
+import time
+import shutil
+import getpass
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+HOME_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_FOLDER = 'shch_air_now_cfg'
+ICO_FILE = 'shch_071821_121644.ico'
+CONFIG = {'ICO_FILE' : ICO_FILE, 'API_KEY' : 'STARTUP-BENCHMARK-DUMMY-KEY', 'ZIP_CODE' : '20500', 'DISTANCE_FROM' : 30,\
+    'WIDGET_FONT_SIZE_INDEX' : 7}
+SNAPSHOT = {'ZIP_CODE' : '20500', 'DISTANCE_FROM' : 30, 'data_time' : '2021-09-29 : 14',\
+    'data_full' : {'OZONE' : [16.5, 'Good', 1, '#000', '#00E400'], 'PM2.5' : [8.5, 'Good', 1, '#000', '#00E400']}}
+RUNS = 5
+HEAVY_MODULES = ('requests', 'urllib3', 'charset_normalizer', 'idna', 'numpy', 'PIL', 'sqlite3')
+
+# runs in the child interpreter; argv[1] is HOME_DIR, argv[3] the config folder
+CHILD_CODE = """
+import sys, time, json
+_t0 = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import shch_air_now as G
+_t1 = time.perf_counter()
+_heavy = sorted(_each for _each in json.loads(sys.argv[2]) if _each in sys.modules)
+G.GET_AIR_DATA = False
+G.CONFIG_FOLDER = sys.argv[3] # absolute, so os.path.join(HOME_DIR, CONFIG_FOLDER) is this folder
+_tk_window = G.tk.Tk()
+G.fnc_start(_tk_window)
+_tk_window.wait_visibility()
+_t2 = time.perf_counter()
+print(json.dumps({'import_ms' : 1000. * (_t1 - _t0), 'first_paint_ms' : 1000. * (_t2 - _t0),
+    'painted_at' : time.time(), 'heavy_modules' : _heavy,
+    'stale_data' : not (G.PAINTED_LAYOUT in (None, ('warning',)))}), flush=True)
+G.FETCH_WORKER.shutdown()
+_tk_window.destroy()
+"""
+
+#!
+# creates a temporary config folder with the icon, the config of the current user (with a dummy API key), and,
+#   if snapshot is True, the snapshot of the last good data of the configured area.
+# Returns: folder_path : str
+def fnc_configFolder(snapshot=True):
+    folder_path = tempfile.mkdtemp(prefix='shch_air_now_startup_')
+    _user = getpass.getuser()
+    try:
+        shutil.copy(os.path.join(HOME_DIR, CONFIG_FOLDER, ICO_FILE), folder_path)
+    except OSError:
+        pass
+    with open(os.path.join(folder_path, f'{_user}.cfg'), 'w') as _file:
+        json.dump(CONFIG, _file)
+    if snapshot:
+        with open(os.path.join(folder_path, f'{_user}.air_data.json'), 'w') as _file:
+            json.dump(SNAPSHOT, _file)
+    return folder_path
+    # end of function
+#!
+# runs the GUI once in a fresh interpreter, with a temporary config folder, and returns its measurements (dict).
+def fnc_run(snapshot=True):
+    _config_folder_path = fnc_configFolder(snapshot=snapshot)
+    _started_at = time.time()
+    try:
+        _result = subprocess.run([sys.executable, '-c', CHILD_CODE, HOME_DIR, json.dumps(HEAVY_MODULES), _config_folder_path],\
+            capture_output=True, text=True, timeout=60)
+    finally:
+        shutil.rmtree(_config_folder_path, ignore_errors=True)
+    if _result.returncode != 0:
+        raise RuntimeError(_result.stderr.strip().splitlines()[-1] if _result.stderr.strip() else 'failed')
+    measurement = json.loads(_result.stdout.strip().splitlines()[-1])
+    measurement['process_ms'] = 1000. * (measurement.pop('painted_at') - _started_at)
+    return measurement
+    # end of function
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measures the startup of shch_air_now.py.')
+    parser.add_argument('--runs', type=int, default=RUNS)
+    parser.add_argument('--max-first-paint-ms', type=float, default=None)
+    parser.add_argument('--no-snapshot', action='store_true', help='starts without the snapshot of the last good data')
+    parser.add_argument('--json', action='store_true', help='prints the report as JSON')
+    arguments = parser.parse_args()
+
+    try:
+        measurements = [fnc_run(snapshot=not arguments.no_snapshot) for _ in range(max(1, arguments.runs))]
+    except Exception as e:
+        print(f'Unable to start the GUI: {e}', file=sys.stderr)
+        sys.exit(2)
+
+    report = {_key : statistics.median(_each[_key] for _each in measurements)\
+        for _key in ('import_ms', 'first_paint_ms', 'process_ms')}
+    report['runs'] = len(measurements)
+    report['heavy_modules'] = sorted({_module for _each in measurements for _module in _each['heavy_modules']})
+    report['stale_data'] = all(_each['stale_data'] for _each in measurements)
+
+    if arguments.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"import:        {report['import_ms']:8.1f} ms")
+        print(f"first paint:   {report['first_paint_ms']:8.1f} ms")
+        print(f"process start: {report['process_ms']:8.1f} ms (interpreter start to first paint)")
+        print(f"heavy modules imported: {', '.join(report['heavy_modules']) or 'none'}")
+        print(f"first paint shows the last known data: {'yes' if report['stale_data'] else 'no'}")
+
+    if not (arguments.max_first_paint_ms is None):
+        if (report['first_paint_ms'] > arguments.max_first_paint_ms) or (len(report['heavy_modules']) > 0):
+            print('FAILED', file=sys.stderr)
+            sys.exit(1)
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -1,25 +1,71 @@
-# import requests
+# a client of the AirNow stand-in (see shch_air_now_tserver.py).
+#   With --clients N, it runs N AirQuality clients concurrently (each for its own zip code), as a load test,
+#   and reports the throughput and the latency of getAirData(...). The clients do not use the budget of the API key
+#   (limiter=None), so that the server is measured, not the budget.
 #
-# AQI_Timeout = 30
-# self_request_URL = "http://localhost:8080/"+\
-#     "?format=application/json"+\
-#     f"&zipCode=20500"+\
-#     f"&distance=25"+\
-#     f"&API_KEY=shch"
-#
-# data = requests.get(self_request_URL, timeout=AQI_Timeout)
-# data_status_code = data.status_code
-#
-# print(f"STATUS CODE: { data_status_code}")
-# print(f"DATA: {data.json()}")
-# print('\n')
-# print(data.json()[0])
+# Usage:
+#   python shch_air_now_tclient.py [--host http://localhost:8080] [--clients 1] [--rounds 1]
 
 import sys
+import time
+import argparse
+import statistics
+import concurrent.futures
 import os.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import lib.air_quality as AQI
 
-air_quality = AQI.AirQuality("", "20500", int("25"), ON_SCREEN=1)
-air_quality.getAirData()
-air_quality.printAirData()
+API_HOST = "http://localhost:8080"
+
+#!
+# gets the data for the zip code once, and returns (seconds : float, is_okay : bool).
+def fnc_client(api_host, zip_code):
+    _t0 = time.perf_counter()
+    air_quality = AQI.AirQuality("", zip_code, int("25"), API_HOST=api_host, cache=None, store=None, limiter=None)
+    air_quality.getAirData()
+    return (time.perf_counter() - _t0, isinstance(air_quality.data_full, dict))
+    # end of function
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='A client of the AirNow stand-in.')
+    parser.add_argument('--host', default=API_HOST)
+    parser.add_argument('--clients', type=int, default=1)
+    parser.add_argument('--rounds', type=int, default=1)
+    arguments = parser.parse_args()
+
+    if arguments.clients <= 1 and arguments.rounds <= 1:
+        air_quality = AQI.AirQuality("", "20500", int("25"), ON_SCREEN=1, API_HOST=arguments.host, limiter=None)
+        air_quality.getAirData()
+        air_quality.printAirData()
+        sys.exit(0)
+
+    zip_codes = ['{:05d}'.format(20500 + _index) for _index in range(arguments.clients)] * max(1, arguments.rounds)
+    _t0 = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=arguments.clients) as executor:
+        results = list(executor.map(lambda zip_code: fnc_client(arguments.host, zip_code), zip_codes))
+    elapsed = time.perf_counter() - _t0
+
+    latencies = sorted(_seconds for _seconds, _ in results)
+    print(f'{len(results)} fetches in {elapsed:.2f} s ({len(results) / elapsed:.1f} per second), '
+        f'{sum(1 for _, _is_okay in results if not _is_okay)} failed')
+    print(f'latency: median {1000. * statistics.median(latencies):.1f} ms, '
+        f'p95 {1000. * latencies[int(0.95 * (len(latencies) - 1))]:.1f} ms, max {1000. * latencies[-1]:.1f} ms')
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering
@@ -1,49 +1,258 @@
-from http.server import HTTPServer, BaseHTTPRequestHandler
+# a stand-in for the AirNow API, for load and latency testing without network.
+#   It serves both endpoints used by AirQuality: the current data by zip code (/aq/observation/zipCode/current/),
+#   and the BBOX data (/aq/data/, also for date ranges). The responses are either synthetic (N monitors placed
+#   in any requested BBOX, the same for the same request), or pre-loaded once from the files req-res-1.txt
+#   and req-res-2.txt (the response being the 2nd non-empty line of each file). Each request is handled on its
+#   own thread (keep-alive connections are supported), after an optional latency, and may fail on purpose
+#   with 500, or 429 (with Retry-After).
+#
+# Usage:
+#   python shch_air_now_tserver.py [--port 8080] [--monitors 50] [--latency-ms 0] [--jitter-ms 0]
+#       [--error-rate 0] [--rate-429 0] [--retry-after 1] [--files DIR] [--verbose]
+#   GET /stats returns the counts of requests and responses as JSON.
+#   See also shch_air_now_tclient.py.
+
+import os
 import json
+import time
+import random
+import hashlib
+import argparse
+import datetime
+import functools
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 
 HOST_NAME = "localhost"
 SERVER_PORT = 8080
+MONITORS = 50
+MAX_HOURS = 24 * 31 # the longest date range served
+PARAMETERS = ('OZONE', 'PM2.5', 'PM10', 'NO2', 'SO2', 'CO')
+UNITS = {'OZONE' : 'PPB', 'PM2.5' : 'UG/M3', 'PM10' : 'UG/M3', 'NO2' : 'PPB', 'SO2' : 'PPB', 'CO' : 'PPM'}
+CATEGORIES = ((50, 'Good'), (100, 'Moderate'), (150, 'Unhealthy for Sensitive Groups'), (200, 'Unhealthy'),\
+    (300, 'Very Unhealthy'), (500, 'Hazardous'))
+MISSING_RATE = 0.05 # the share of synthetic values reported as -999
+SCALES = {'OZONE' : 0.7, 'PM2.5' : 0.35, 'PM10' : 1.5, 'NO2' : 1., 'SO2' : 0.7, 'CO' : 0.09} # concentration per AQI
 
 def filter_EmptyStr(arg_Str):
     return len(arg_Str) > 0
 
+#!
+# returns the category number and name of aqi.
+def fnc_category(aqi):
+    if aqi < 0:
+        return (len(CATEGORIES) + 2, 'Unavailable')
+    for _number, (_limit, _name) in enumerate(CATEGORIES):
+        if aqi <= _limit:
+            return (_number + 1, _name)
+    return (len(CATEGORIES), CATEGORIES[-1][1])
+    # end of function
+#!
+# returns a random.Random seeded by the arguments, so that the same request gets the same data.
+def fnc_random(*args):
+    return random.Random(hashlib.sha1(repr(args).encode('utf-8')).hexdigest())
+    # end of function
+#!
+# returns the synthetic current data (list) for the zip code: one record at a location derived from the zip code.
+@functools.lru_cache(maxsize=4096)
+def fnc_syntheticCurrent(zip_code, date, hour):
+    _random = fnc_random('current', zip_code, date, hour)
+    _aqi = _random.randint(0, 200)
+    _number, _name = fnc_category(_aqi)
+    return json.dumps([{
+        'DateObserved' : f'{date} ', 'HourObserved' : hour, 'LocalTimeZone' : 'UTC',\
+        'ReportingArea' : f'Area {zip_code}', 'StateCode' : 'ZZ',\
+        'Latitude' : round(_random.uniform(25., 49.), 4), 'Longitude' : round(_random.uniform(-124., -67.), 4),\
+        'ParameterName' : 'O3', 'AQI' : _aqi, 'Category' : {'Number' : _number, 'Name' : _name}}]).encode('utf-8')
+    # end of function
+#!
+# returns the synthetic BBOX data (list): monitors placed in the BBOX, one record per monitor and hour.
+#   The monitors depend only on the BBOX; their values depend on the hour too.
+#   With raw_concentrations, each record also has 'RawConcentration' (and 'Value').
+@functools.lru_cache(maxsize=1024)
+def fnc_syntheticBBOX(BBOX, start, end, monitors, raw_concentrations=False):
+    _lon_min, _lat_min, _lon_max, _lat_max = [float(_each) for _each in BBOX.split(',')]
+    _random = fnc_random('bbox', BBOX)
+    _sites = [(round(_random.uniform(_lat_min, _lat_max), 4), round(_random.uniform(_lon_min, _lon_max), 4),\
+        PARAMETERS[_index % len(PARAMETERS)]) for _index in range(monitors)]
+
+    _records = list()
+    _hour = start
+    while _hour <= end:
+        _utc = _hour.strftime('%Y-%m-%dT%H:00')
+        _random = fnc_random('values', BBOX, _utc)
+        for _latitude, _longitude, _parameter in _sites:
+            _aqi = -999 if (_random.random() < MISSING_RATE) else _random.randint(0, 200)
+            _record = {'Latitude' : _latitude, 'Longitude' : _longitude, 'UTC' : _utc,\
+                'Parameter' : _parameter, 'Unit' : UNITS[_parameter], 'AQI' : _aqi,\
+                'Category' : fnc_category(_aqi)[0]}
+            if raw_concentrations:
+                # roughly the concentration of the AQI (ppb, or ug/m3)
+                _record['RawConcentration'] = -999. if (_aqi < 0) else round(_aqi * SCALES[_parameter], 1)
+                _record['Value'] = _record['RawConcentration']
+            _records.append(_record)
+        _hour += datetime.timedelta(hours=1)
+    return json.dumps(_records).encode('utf-8')
+    # end of function
+#!
+# returns the date and hour (datetime) of startDate or endDate, e.g. 2021-09-29T14.
+def fnc_parseHour(value):
+    _date, _, _hour = value.strip().partition('T')
+    return datetime.datetime.strptime(_date, '%Y-%m-%d') + datetime.timedelta(hours=int(_hour or 0))
+    # end of function
+
 class AirNowServer(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1' # keep-alive
+    disable_nagle_algorithm = True # the headers and the body are written separately
+    # the options, set by newServer(...)
+    monitors = MONITORS
+    latency = 0.
+    jitter = 0.
+    error_rate = 0.
+    rate_429 = 0.
+    retry_after = 1
+    files = None # (current : bytes, bbox : bytes), if the responses are pre-loaded
+    verbose = False
+    stats = None
+    stats_lock = threading.Lock()
+
     def do_GET(self):
-        print('command=', self.command)
-        print('path=', self.path)
+        _url = urllib.parse.urlparse(self.path)
+        _query = {_key : _values[0] for _key, _values in urllib.parse.parse_qs(_url.query).items()}
+        if self.verbose:
+            print('path=', self.path)
 
-        case=0;
-        if ('zipCode' in self.path) and ('distance' in self.path):
-            case=1
-        if ('startDate' in self.path) and ('endDate' in self.path) and ('BBOX' in self.path):
-            case=2
+        if _url.path.rstrip('/') == '/stats':
+            with AirNowServer.stats_lock:
+                _body = json.dumps(self.stats).encode('utf-8')
+            self.respond(200, _body, count=False)
+            return
+
+        case = 0
+        if ('zipCode' in _query) and ('distance' in _query):
+            case = 1
+        if ('startDate' in _query) and ('endDate' in _query) and ('BBOX' in _query):
+            case = 2
 
         if case == 0:
-            print('Unknown request')
-            self.send_response(400)
-            self.end_headers()
+            self.respond(400, b'{"error": "Unknown request"}')
+            return
+
+        _delay = self.latency + (random.uniform(-self.jitter, self.jitter) if self.jitter > 0 else 0.)
+        if _delay > 0:
+            time.sleep(_delay)
+
+        _draw = random.random()
+        if _draw < self.rate_429:
+            self.respond(429, b'{"error": "Too Many Requests"}', headers={'Retry-After' : str(self.retry_after)})
+            return
+        if _draw < self.rate_429 + self.error_rate:
+            self.respond(500, b'{"error": "Internal Server Error"}')
             return
 
-        self.send_response(200)
+        try:
+            if not (self.files is None):
+                _body = self.files[case - 1]
+            elif case == 1:
+                _now = datetime.datetime.now(datetime.timezone.utc)
+                _body = fnc_syntheticCurrent(_query['zipCode'], _now.strftime('%Y-%m-%d'), _now.hour)
+            else:
+                _start = fnc_parseHour(_query['startDate'])
+                _end = min(fnc_parseHour(_query['endDate']), _start + datetime.timedelta(hours=MAX_HOURS - 1))
+                _body = fnc_syntheticBBOX(_query['BBOX'], _start, _end, self.monitors,\
+                    _query.get('includerawconcentrations', '0') == '1')
+        except ValueError as e:
+            self.respond(400, json.dumps({'error' : str(e)}).encode('utf-8'))
+            return
+
+        self.respond(200, _body)
+
+    def respond(self, status, body, headers=None, count=True):
+        self.send_response(status)
         self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for _key, _value in (headers or dict()).items():
+            self.send_header(_key, _value)
         self.end_headers()
+        self.wfile.write(body)
+        if count:
+            with AirNowServer.stats_lock:
+                self.stats['requests'] += 1
+                self.stats['status'][str(status)] = self.stats['status'].get(str(status), 0) + 1
 
-        if case == 1:
-            _file = open('req-res-1.txt', 'r')
-        if case == 2:
-            _file = open('req-res-2.txt', 'r')
+    def log_message(self, format, *args):
+        if self.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
 
-        _content = _file.read()
-        _result = list(filter(filter_EmptyStr, _content.split('\n')))[1]
-        self.wfile.write(bytes(_result, "utf-8"))
-        if case == 1:
-            print('Date Observed:', json.loads(_result)[0]['DateObserved'])
-            print('Latitude:', json.loads(_result)[0]['Latitude'])
-            print('Longitude:', json.loads(_result)[0]['Longitude'])
+#!
+# returns the pre-loaded responses (current : bytes, bbox : bytes) from req-res-1.txt and req-res-2.txt in folder.
+def fnc_loadFiles(folder):
+    files = list()
+    for _name in ('req-res-1.txt', 'req-res-2.txt'):
+        with open(os.path.join(folder, _name), 'r') as _file:
+            _content = _file.read()
+        files.append(bytes(list(filter(filter_EmptyStr, _content.split('\n')))[1], "utf-8"))
+    return tuple(files)
+    # end of function
+#!
+# returns a new (not yet started) server. Port 0 picks a free port (see server.server_port).
+# Args:
+#   host : str
+#   port : int
+#   kwargs: typical keyword arguments
+#       'monitors' : int, 'latency' : float (seconds), 'jitter' : float (seconds), 'error_rate' : float (0...1),
+#       'rate_429' : float (0...1), 'retry_after' : int (seconds), 'files' : str (the folder of the response files),
+#       'verbose' : bool
+# Returns: server : ThreadingHTTPServer
+def newServer(host=HOST_NAME, port=SERVER_PORT, **kwargs):
+    _options = {
+        'monitors' : int(kwargs.get('monitors', MONITORS)),
+        'latency' : float(kwargs.get('latency', 0.)),
+        'jitter' : float(kwargs.get('jitter', 0.)),
+        'error_rate' : float(kwargs.get('error_rate', 0.)),
+        'rate_429' : float(kwargs.get('rate_429', 0.)),
+        'retry_after' : int(kwargs.get('retry_after', 1)),
+        'files' : None if (kwargs.get('files') is None) else fnc_loadFiles(kwargs['files']),
+        'verbose' : bool(kwargs.get('verbose', False)),
+        'stats' : {'requests' : 0, 'status' : dict()},
+        }
+    # each server gets its own handler class, so that several servers can run in one process
+    _handler = type('AirNowServer', (AirNowServer,), _options)
+    server = ThreadingHTTPServer((host, port), _handler)
+    server.daemon_threads = True
+    server.request_queue_size = 1024
+    return server
+    # end of function
+#!
+# starts a new server (see newServer(...)) on a daemon thread.
+# Returns: server : ThreadingHTTPServer
+#   Its URL is f'http://{host}:{server.server_port}'; server.shutdown() stops it.
+def startServer(host=HOST_NAME, port=0, **kwargs):
+    server = newServer(host, port, **kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+    # end of function
 
 if __name__ == "__main__":
-    air_now_server = HTTPServer((HOST_NAME, SERVER_PORT), AirNowServer)
-    print(f"Air Now Test Server started at http://{HOST_NAME}:{SERVER_PORT}")
+    parser = argparse.ArgumentParser(description='A stand-in for the AirNow API.')
+    parser.add_argument('--host', default=HOST_NAME)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--monitors', type=int, default=MONITORS, help='monitors per BBOX (synthetic data)')
+    parser.add_argument('--latency-ms', type=float, default=0., help='the latency added to each response')
+    parser.add_argument('--jitter-ms', type=float, default=0., help='the latency varies by up to this much')
+    parser.add_argument('--error-rate', type=float, default=0., help='the share of 500 responses')
+    parser.add_argument('--rate-429', type=float, default=0., help='the share of 429 responses')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After of 429 responses, in seconds')
+    parser.add_argument('--files', default=None, help='the folder with req-res-1.txt and req-res-2.txt')
+    parser.add_argument('--verbose', action='store_true')
+    arguments = parser.parse_args()
+
+    air_now_server = newServer(arguments.host, arguments.port, monitors=arguments.monitors,\
+        latency=arguments.latency_ms / 1000., jitter=arguments.jitter_ms / 1000.,\
+        error_rate=arguments.error_rate, rate_429=arguments.rate_429, retry_after=arguments.retry_after,\
+        files=arguments.files, verbose=arguments.verbose)
+    print(f"Air Now Test Server started at http://{arguments.host}:{air_now_server.server_port}")
 
     try:
         air_now_server.serve_forever()
@@ -51,7 +260,7 @@ if __name__ == "__main__":
         pass
 
     air_now_server.server_close()
-    print("Air Now Test Server is closed")
+    print(f"Air Now Test Server is closed: {json.dumps(air_now_server.RequestHandlerClass.stats)}")
 
 # screen centering
 #:-)
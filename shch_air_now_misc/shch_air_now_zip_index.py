@@ -0,0 +1,45 @@
+# builds the offline zip code centroid index (shch_air_now_cfg/zip_centroids.bin) used by AirQuality
+#   to skip the first AirNow round trip. The source is the Census Bureau's ZCTA gazetteer file, e.g.
+#   https://www2.census.gov/geo/docs/maps-data/data/gazetteer/2020_Gazetteer/2020_Gaz_zcta_national.zip
+#   (unzipped), or any CSV file with the columns zip, latitude, longitude.
+#
+# Usage:
+#   python shch_air_now_zip_index.py 2020_Gaz_zcta_national.txt [index_path]
+
+import sys
+import os.path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import lib.zip_centroids as ZC
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print('Usage: python shch_air_now_zip_index.py source_path [index_path]')
+        sys.exit(2)
+
+    source_path = sys.argv[1]
+    index_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(ZC.INDEX_FOLDER, ZC.INDEX_FILE)
+
+    count = ZC.buildIndex(source_path, index_path)
+    print(f'{count} zip codes are written to {index_path}')
+
+    index = ZC.ZipCentroids(index_path)
+    print('20500 ->', index.lookup('20500'))
+
+# screen centering
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-)
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+#:-]
+# end of screen centering